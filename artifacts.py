@@ -0,0 +1,189 @@
+"""
+中间结果存储 - 大结果只落盘一份，步骤间传递轻量句柄，按需加载
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+# 句柄标记字段，JSON往返（检查点、任务队列）后仍可识别
+HANDLE_KEY = '$artifact'
+
+
+class ArtifactHandle(dict):
+    """中间结果句柄（dict子类，可直接JSON序列化）
+
+    JSON往返后句柄变回普通dict，加载内容统一使用 resolve()。
+    """
+
+    def __init__(self, artifact_id: str, size: int, kind: str):
+        super().__init__({HANDLE_KEY: artifact_id, 'size': size, 'type': kind})
+
+    @property
+    def artifact_id(self) -> str:
+        return self[HANDLE_KEY]
+
+
+def is_handle(value: Any) -> bool:
+    """是否为中间结果句柄"""
+    return isinstance(value, dict) and HANDLE_KEY in value
+
+
+class ArtifactStore:
+    """基于文件的内容寻址中间结果存储
+
+    相同内容只存一份；文件位于共享目录下，worker进程之间可直接读取，
+    多进程读同一文件时由操作系统页缓存共享。
+    超过ARTIFACT_MAX_AGE_SECONDS未写入的文件由 sweep() 清理，重复写入相同内容会刷新修改时间。
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        min_bytes: Optional[int] = None,
+        cache_items: Optional[int] = None,
+        max_age_seconds: Optional[float] = None
+    ):
+        """初始化存储"""
+        self.root = Path(root or config.ARTIFACT_PATH)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.min_bytes = config.ARTIFACT_MIN_BYTES if min_bytes is None else min_bytes
+        self.cache_items = config.ARTIFACT_CACHE_ITEMS if cache_items is None else cache_items
+        self.max_age_seconds = config.ARTIFACT_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        self._cache: OrderedDict = OrderedDict()
+        self._last_sweep = 0.0
+
+    def _path(self, artifact_id: str) -> Path:
+        return self.root / artifact_id[:2] / f"{artifact_id}.json"
+
+    def put(self, value: Any) -> ArtifactHandle:
+        """保存内容，返回句柄"""
+        data = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        return self._write(data, type(value).__name__)
+
+    def _write(self, data: bytes, kind: str) -> ArtifactHandle:
+        artifact_id = hashlib.sha256(data).hexdigest()
+        path = self._path(artifact_id)
+
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再改名，并发写同一内容也不会读到半截文件
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        else:
+            # 内容仍在使用，推迟清理
+            path.touch()
+
+        return ArtifactHandle(artifact_id, len(data), kind)
+
+    def maybe_put(self, value: Any) -> Any:
+        """内容超过阈值时保存并返回句柄，否则原样返回"""
+        if value is None or is_handle(value) or isinstance(value, (bool, int, float)):
+            return value
+
+        data = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        if len(data) < self.min_bytes:
+            return value
+        return self._write(data, type(value).__name__)
+
+    def get(self, handle: Dict[str, Any]) -> Any:
+        """按句柄加载内容（带LRU缓存）"""
+        artifact_id = handle[HANDLE_KEY]
+        if artifact_id in self._cache:
+            self._cache.move_to_end(artifact_id)
+            return self._cache[artifact_id]
+
+        try:
+            value = json.loads(self._path(artifact_id).read_bytes())
+        except FileNotFoundError:
+            raise KeyError(f"中间结果不存在: {artifact_id}")
+
+        if self.cache_items:
+            self._cache[artifact_id] = value
+            if len(self._cache) > self.cache_items:
+                self._cache.popitem(last=False)
+        return value
+
+    def resolve(self, value: Any) -> Any:
+        """递归展开嵌套结构中的句柄"""
+        if is_handle(value):
+            return self.resolve(self.get(value))
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.resolve(item) for key, item in value.items()}
+        return value
+
+    def exists(self, handle: Dict[str, Any]) -> bool:
+        """句柄对应的内容是否仍在"""
+        return self._path(handle[HANDLE_KEY]).exists()
+
+    def delete(self, handle: Dict[str, Any]):
+        """删除内容"""
+        artifact_id = handle[HANDLE_KEY]
+        self._cache.pop(artifact_id, None)
+        self._path(artifact_id).unlink(missing_ok=True)
+
+    def sweep(self, max_age_seconds: Optional[float] = None) -> int:
+        """删除超过保留时间未写入的内容和残留的临时文件，返回删除的文件数"""
+        max_age_seconds = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        self._last_sweep = time.monotonic()
+        if not max_age_seconds:
+            return 0
+
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for path in self.root.glob('*/*'):
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            self._cache.pop(path.name.split('.', 1)[0], None)
+            removed += 1
+
+        if removed:
+            logger.info(f"清理过期中间结果: {removed} 个")
+        return removed
+
+    def maybe_sweep(self) -> int:
+        """距上次清理超过ARTIFACT_SWEEP_INTERVAL_SECONDS时执行清理"""
+        if time.monotonic() - self._last_sweep < config.ARTIFACT_SWEEP_INTERVAL_SECONDS:
+            return 0
+        return self.sweep()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计"""
+        files = list(self.root.glob('*/*.json'))
+        return {
+            'artifacts': len(files),
+            'bytes': sum(path.stat().st_size for path in files),
+            'cached': len(self._cache)
+        }
+
+
+_artifact_store_instance: Optional[ArtifactStore] = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """获取中间结果存储单例"""
+    global _artifact_store_instance
+    if _artifact_store_instance is None:
+        _artifact_store_instance = ArtifactStore()
+    return _artifact_store_instance
+
+
+def resolve(value: Any) -> Any:
+    """展开value中的句柄（含JSON往返后的普通dict句柄），非句柄原样返回"""
+    return get_artifact_store().resolve(value)
@@ -0,0 +1,159 @@
+"""
+BM25倒排索引 - 本地关键词检索（中文字符n-gram分词）
+"""
+
+import math
+import re
+import heapq
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# 连续的ASCII字母数字（允许 - _ 连接，如订单号、SKU）或连续的CJK字符
+_TOKEN_PATTERN = re.compile(
+    r'[a-z0-9]+(?:[-_][a-z0-9]+)*|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+'
+)
+
+
+def tokenize(text: str, ngram: int = 2) -> List[str]:
+    """分词：英文/数字按词切分，中文按字符n-gram切分"""
+    tokens = []
+
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+
+        if token.isascii():
+            tokens.append(token)
+            # 带连接符的编号同时索引各段，便于部分匹配
+            if '-' in token or '_' in token:
+                tokens.extend(part for part in re.split(r'[-_]', token) if part)
+        elif len(token) <= ngram:
+            tokens.append(token)
+        else:
+            tokens.extend(token[i:i + ngram] for i in range(len(token) - ngram + 1))
+
+    return tokens
+
+
+def bm25_idf(n_docs: int, doc_freq: int) -> float:
+    """BM25逆文档频率"""
+    return math.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_term_score(
+    tf: int,
+    idf: float,
+    doc_length: int,
+    avg_doc_length: float,
+    k1: float = 1.5,
+    b: float = 0.75
+) -> float:
+    """单个词项的BM25得分"""
+    norm = k1 * (1 - b + b * doc_length / (avg_doc_length or 1))
+    return idf * tf * (k1 + 1) / (tf + norm)
+
+
+class BM25Index:
+    """内存BM25倒排索引"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, ngram: int = 2):
+        """初始化索引"""
+        self.k1 = k1
+        self.b = b
+        self.ngram = ngram
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, text: str):
+        """添加文档（已存在则覆盖）"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        tokens = tokenize(text, self.ngram)
+        frequencies = Counter(tokens)
+
+        for term, tf in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+        self.doc_lengths[doc_id] = len(tokens)
+        self.doc_terms[doc_id] = tuple(frequencies)
+        self.total_length += len(tokens)
+
+    def add_many(self, doc_ids: List[str], texts: List[str]):
+        """批量添加文档（已存在则覆盖）"""
+        postings = self.postings
+        added_length = 0
+        for doc_id, text in zip(doc_ids, texts):
+            if doc_id in self.doc_lengths:
+                self.remove(doc_id)
+
+            tokens = tokenize(text, self.ngram)
+            frequencies = Counter(tokens)
+            for term, tf in frequencies.items():
+                posting = postings.get(term)
+                if posting is None:
+                    posting = postings[term] = {}
+                posting[doc_id] = tf
+
+            self.doc_lengths[doc_id] = len(tokens)
+            self.doc_terms[doc_id] = tuple(frequencies)
+            added_length += len(tokens)
+        self.total_length += added_length
+
+    def remove(self, doc_id: str):
+        """删除文档"""
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        predicate: Optional[Callable[[str], bool]] = None
+    ) -> List[Tuple[str, float]]:
+        """BM25检索，predicate在打分前过滤文档"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs or limit <= 0:
+            return []
+
+        avg_doc_length = self.total_length / n_docs
+        scores: Dict[str, float] = {}
+        allowed: Dict[str, bool] = {}
+
+        for term in set(tokenize(query, self.ngram)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+
+            idf = bm25_idf(n_docs, len(posting))
+            for doc_id, tf in posting.items():
+                if predicate is not None:
+                    ok = allowed.get(doc_id)
+                    if ok is None:
+                        ok = allowed[doc_id] = predicate(doc_id)
+                    if not ok:
+                        continue
+
+                scores[doc_id] = scores.get(doc_id, 0.0) + bm25_term_score(
+                    tf, idf, self.doc_lengths[doc_id], avg_doc_length, self.k1, self.b
+                )
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
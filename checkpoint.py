@@ -0,0 +1,118 @@
+"""
+工作流检查点 - 步骤结果持久化，支持断点续跑
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def step_fingerprint(
+    step: Dict[str, Any],
+    context: Optional[Dict[str, Any]],
+    dependency_fingerprints: List[str]
+) -> str:
+    """步骤输入指纹：步骤定义 + 上下文 + 上游指纹"""
+    payload = _dumps({
+        'step': {
+            key: step.get(key)
+            for key in ('id', 'name', 'agent', 'description', 'dependencies')
+        },
+        'context': context,
+        'upstream': dependency_fingerprints,
+    })
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CheckpointStore:
+    """基于SQLite的工作流检查点存储"""
+
+    def __init__(self, path: str):
+        """初始化存储"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS workflows (
+                workflow_id TEXT PRIMARY KEY,
+                steps TEXT NOT NULL,
+                context TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS step_results (
+                workflow_id TEXT NOT NULL,
+                step_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (workflow_id, step_id)
+            )"""
+        )
+        self.conn.commit()
+
+    def save_workflow(
+        self,
+        workflow_id: str,
+        steps: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]],
+        status: str = 'running'
+    ):
+        """保存工作流定义"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO workflows VALUES (?, ?, ?, ?, ?)',
+            (workflow_id, _dumps(steps), _dumps(context), status, time.time())
+        )
+        self.conn.commit()
+
+    def set_status(self, workflow_id: str, status: str):
+        """更新工作流状态"""
+        self.conn.execute(
+            'UPDATE workflows SET status = ?, updated_at = ? WHERE workflow_id = ?',
+            (status, time.time(), workflow_id)
+        )
+        self.conn.commit()
+
+    def load_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """读取工作流定义"""
+        row = self.conn.execute(
+            'SELECT steps, context, status FROM workflows WHERE workflow_id = ?',
+            (workflow_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'steps': json.loads(row[0]),
+            'context': json.loads(row[1]),
+            'status': row[2]
+        }
+
+    def save_result(self, workflow_id: str, step_id: str, fingerprint: str, result: Any):
+        """保存步骤结果"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO step_results VALUES (?, ?, ?, ?, ?)',
+            (workflow_id, step_id, fingerprint, _dumps(result), time.time())
+        )
+        self.conn.commit()
+
+    def load_results(self, workflow_id: str, fingerprints: Dict[str, str]) -> Dict[str, Any]:
+        """读取指纹仍匹配的步骤结果"""
+        rows = self.conn.execute(
+            'SELECT step_id, fingerprint, result FROM step_results WHERE workflow_id = ?',
+            (workflow_id,)
+        )
+        return {
+            step_id: json.loads(result)
+            for step_id, fingerprint, result in rows
+            if fingerprints.get(step_id) == fingerprint
+        }
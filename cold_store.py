@@ -0,0 +1,127 @@
+"""
+记忆冷存储层 - SQLite落盘，按需换入
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def _json_path(key: str) -> str:
+    return '$."' + key.replace('"', '\\"') + '"'
+
+
+class ColdMemoryTier:
+    """基于SQLite的冷记忆存储"""
+
+    def __init__(self, path: str):
+        """初始化冷存储"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS memories (
+                id TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                importance REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_memories_age ON memories (timestamp, importance)'
+        )
+        self.conn.commit()
+
+    def put_many(self, memories: List[Dict[str, Any]]):
+        """批量写入记忆"""
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO memories VALUES (?, ?, ?, ?, ?)',
+            [
+                (
+                    memory['id'],
+                    memory['content'],
+                    json.dumps(memory['metadata'], ensure_ascii=False, default=str),
+                    memory['timestamp'].timestamp(),
+                    memory['metadata'].get('importance', 0.5)
+                )
+                for memory in memories
+            ]
+        )
+        self.conn.commit()
+
+    def get(self, memory_id: str) -> Optional[Dict[str, Any]]:
+        """读取完整记忆"""
+        row = self.conn.execute(
+            'SELECT id, content, metadata, timestamp FROM memories WHERE id = ?',
+            (memory_id,)
+        ).fetchone()
+        return self._to_memory(row) if row else None
+
+    def get_metadata(self, memory_id: str) -> Optional[Dict[str, Any]]:
+        """只读取元数据（用于过滤，不换入内容）"""
+        row = self.conn.execute(
+            'SELECT metadata FROM memories WHERE id = ?', (memory_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, memory_id: str):
+        """删除记忆"""
+        self.conn.execute('DELETE FROM memories WHERE id = ?', (memory_id,))
+        self.conn.commit()
+
+    def find_expired(self, cutoff: datetime, min_importance: float) -> List[str]:
+        """查找早于cutoff且重要性低于阈值的记忆ID"""
+        rows = self.conn.execute(
+            'SELECT id FROM memories WHERE timestamp < ? AND importance < ?',
+            (cutoff.timestamp(), min_importance)
+        )
+        return [row[0] for row in rows]
+
+    def find_by_metadata(self, filters: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """按元数据等值条件检索（标量条件由SQLite过滤，不逐条解析JSON）"""
+        clauses = []
+        params: List[Any] = []
+        residual = {}
+        for key, value in filters.items():
+            if value is None or isinstance(value, (str, int, float, bool)):
+                # 缺失字段与null都按None匹配，和内存中 metadata.get(key) 的语义一致
+                clauses.append('json_extract(metadata, ?) IS ?')
+                params.extend([_json_path(key), value])
+            else:
+                residual[key] = value
+
+        query = 'SELECT id, content, metadata, timestamp FROM memories'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        for row in self.conn.execute(query, params):
+            memory = self._to_memory(row)
+            if all(memory['metadata'].get(key) == value for key, value in residual.items()):
+                yield memory
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        """遍历全部冷记忆"""
+        cursor = self.conn.execute(
+            'SELECT id, content, metadata, timestamp FROM memories'
+        )
+        for row in cursor:
+            yield self._to_memory(row)
+
+    def close(self):
+        """关闭连接"""
+        self.conn.close()
+
+    @staticmethod
+    def _to_memory(row) -> Dict[str, Any]:
+        memory_id, content, metadata, timestamp = row
+        return {
+            'id': memory_id,
+            'content': content,
+            'metadata': json.loads(metadata),
+            'timestamp': datetime.fromtimestamp(timestamp)
+        }
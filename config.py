@@ -31,6 +31,120 @@ class Config:
     CHROMA_HOST = os.getenv('CHROMA_HOST', 'localhost')
     CHROMA_PORT = int(os.getenv('CHROMA_PORT', '8000'))
 
+    # 记忆库分层存储配置（RAM预算为0表示不限，不启用冷存储）
+    MEMORY_RAM_BUDGET_MB = float(os.getenv('MEMORY_RAM_BUDGET_MB', '0'))
+    MEMORY_COLD_STORE_PATH = os.getenv('MEMORY_COLD_STORE_PATH', 'data/memory_cold.db')
+    MEMORY_DECAY_HALF_LIFE_HOURS = float(os.getenv('MEMORY_DECAY_HALF_LIFE_HOURS', '24'))
+
+    # 会话记忆配置
+    SESSION_RECENT_TURNS = int(os.getenv('SESSION_RECENT_TURNS', '8'))
+    SESSION_FOLD_BATCH = int(os.getenv('SESSION_FOLD_BATCH', '4'))
+    SESSION_SUMMARY_MAX_TOKENS = int(os.getenv('SESSION_SUMMARY_MAX_TOKENS', '500'))
+    SESSION_CONTEXT_BUDGET = int(os.getenv('SESSION_CONTEXT_BUDGET', '3000'))
+
+    # 工作流并发配置
+    WORKFLOW_MAX_CONCURRENCY = int(os.getenv('WORKFLOW_MAX_CONCURRENCY', '4'))
+    WORKFLOW_AGENT_CONCURRENCY = int(os.getenv('WORKFLOW_AGENT_CONCURRENCY', '2'))
+    WORKFLOW_LATENCY_PATH = os.getenv('WORKFLOW_LATENCY_PATH', 'data/step_latency.json')
+    WORKFLOW_LATENCY_ALPHA = float(os.getenv('WORKFLOW_LATENCY_ALPHA', '0.3'))
+    WORKFLOW_DEFAULT_STEP_SECONDS = float(os.getenv('WORKFLOW_DEFAULT_STEP_SECONDS', '10'))
+    WORKFLOW_CHECKPOINT_PATH = os.getenv('WORKFLOW_CHECKPOINT_PATH', 'data/workflow_checkpoints.db')
+
+    # 工作流执行后端配置（local: 进程内执行；queue: 提交任务队列由worker进程执行）
+    WORKFLOW_BACKEND = os.getenv('WORKFLOW_BACKEND', 'local')
+    JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', 'data/jobs.db')
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+    # 中间结果存储配置（超过阈值的步骤结果落盘，步骤间传递句柄）
+    ARTIFACT_PATH = os.getenv('ARTIFACT_PATH', 'data/artifacts')
+    ARTIFACT_MIN_BYTES = int(os.getenv('ARTIFACT_MIN_BYTES', '4096'))
+    ARTIFACT_CACHE_ITEMS = int(os.getenv('ARTIFACT_CACHE_ITEMS', '64'))
+    ARTIFACT_MAX_AGE_SECONDS = float(os.getenv('ARTIFACT_MAX_AGE_SECONDS', '604800'))  # 0表示不清理
+    ARTIFACT_SWEEP_INTERVAL_SECONDS = float(os.getenv('ARTIFACT_SWEEP_INTERVAL_SECONDS', '3600'))
+
+    # 工作流规划缓存配置
+    PLAN_CACHE_PATH = os.getenv('PLAN_CACHE_PATH', 'data/plan_cache.json')
+    PLAN_CACHE_MAX_ENTRIES = int(os.getenv('PLAN_CACHE_MAX_ENTRIES', '500'))
+    PLAN_CACHE_SIMILARITY = float(os.getenv('PLAN_CACHE_SIMILARITY', '0.75'))
+    PLAN_CACHE_SAVE_INTERVAL = float(os.getenv('PLAN_CACHE_SAVE_INTERVAL', '60'))
+
+    # 超时配置（秒，0表示不限）
+    REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT_SECONDS', '600'))
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '120'))
+    TOOL_TIMEOUT_SECONDS = float(os.getenv('TOOL_TIMEOUT_SECONDS', '30'))
+    # 可降级步骤在截止时间前预留的降级时间
+    DEADLINE_FALLBACK_MARGIN_SECONDS = float(os.getenv('DEADLINE_FALLBACK_MARGIN_SECONDS', '2'))
+
+    # 工具调用配置
+    TOOL_LOOP_MAX_STEPS = int(os.getenv('TOOL_LOOP_MAX_STEPS', '8'))
+    TOOL_HTTP_CONCURRENCY = int(os.getenv('TOOL_HTTP_CONCURRENCY', '32'))
+    TOOL_THREAD_WORKERS = int(os.getenv('TOOL_THREAD_WORKERS', '8'))
+    TOOL_PROCESS_WORKERS = int(os.getenv('TOOL_PROCESS_WORKERS', '2'))
+    TOOL_PROCESS_MAX_TASKS = int(os.getenv('TOOL_PROCESS_MAX_TASKS', '200'))
+    TOOL_PROCESS_MEMORY_MB = int(os.getenv('TOOL_PROCESS_MEMORY_MB', '1024'))
+
+    # 工具结果缓存配置（路径为空时只缓存在内存中）
+    TOOL_CACHE_PATH = os.getenv('TOOL_CACHE_PATH', 'data/tool_cache.db')
+    TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', '1024'))
+    TOOL_SEARCH_CACHE_TTL = float(os.getenv('TOOL_SEARCH_CACHE_TTL', '300'))
+    TOOL_HTTP_CACHE_TTL = float(os.getenv('TOOL_HTTP_CACHE_TTL', '60'))
+    TOOL_CACHE_PURGE_INTERVAL = float(os.getenv('TOOL_CACHE_PURGE_INTERVAL', '300'))
+
+    # HTTP客户端配置
+    HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+    HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '20'))
+    HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', '15'))
+    HTTP_MAX_RESPONSE_BYTES = int(os.getenv('HTTP_MAX_RESPONSE_BYTES', str(5 * 1024 * 1024)))
+    HTTP_CACHE_MAX_BYTES = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    # 允许访问的主机（逗号分隔，支持 *.example.com）；为空时允许所有解析到公网地址的主机
+    HTTP_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv('HTTP_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+    # 本地检索配置（SEARCH_BACKEND: local 或 mock）
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'local')
+    SEARCH_CORPUS_PATH = os.getenv('SEARCH_CORPUS_PATH', 'data/corpus')
+    SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', 'data/search_index')
+    SEARCH_REFRESH_SECONDS = float(os.getenv('SEARCH_REFRESH_SECONDS', '60'))
+
+    # 客服监控摄取配置
+    INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '1000'))
+    INGEST_CONCURRENCY = int(os.getenv('INGEST_CONCURRENCY', '8'))
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '16'))
+    INGEST_BATCH_WAIT_MS = float(os.getenv('INGEST_BATCH_WAIT_MS', '50'))
+    INGEST_REPORT_SECONDS = float(os.getenv('INGEST_REPORT_SECONDS', '10'))
+    INGEST_OUTPUT_PATH = os.getenv('INGEST_OUTPUT_PATH', 'data/monitor_output.jsonl')
+    INGEST_ALERT_FLUSH_SECONDS = float(os.getenv('INGEST_ALERT_FLUSH_SECONDS', '10'))
+
+    # 客服对话批量分析配置（多段对话打包进一次请求）
+    MONITOR_BATCH_MAX_ITEMS = int(os.getenv('MONITOR_BATCH_MAX_ITEMS', '20'))
+    MONITOR_BATCH_INPUT_TOKENS = int(os.getenv('MONITOR_BATCH_INPUT_TOKENS', '6000'))
+    MONITOR_BATCH_OUTPUT_TOKENS = int(os.getenv('MONITOR_BATCH_OUTPUT_TOKENS', '4000'))
+    MONITOR_ITEM_OUTPUT_TOKENS = int(os.getenv('MONITOR_ITEM_OUTPUT_TOKENS', '200'))
+
+    # 客服对话本地快速分类配置（置信度不低于阈值的常规对话不调用LLM）
+    MONITOR_FASTPATH_ENABLED = os.getenv('MONITOR_FASTPATH_ENABLED', 'true').lower() == 'true'
+    MONITOR_FASTPATH_THRESHOLD = float(os.getenv('MONITOR_FASTPATH_THRESHOLD', '0.9'))
+    MONITOR_FASTPATH_MIN_SAMPLES = int(os.getenv('MONITOR_FASTPATH_MIN_SAMPLES', '200'))
+    MONITOR_FASTPATH_RETRAIN_EVERY = int(os.getenv('MONITOR_FASTPATH_RETRAIN_EVERY', '500'))
+    MONITOR_FASTPATH_MAX_SAMPLES = int(os.getenv('MONITOR_FASTPATH_MAX_SAMPLES', '20000'))
+    MONITOR_FASTPATH_AUDIT_RATE = float(os.getenv('MONITOR_FASTPATH_AUDIT_RATE', '0.05'))
+    MONITOR_FASTPATH_SAMPLES_PATH = os.getenv('MONITOR_FASTPATH_SAMPLES_PATH', 'data/monitor_samples.jsonl')
+    MONITOR_FASTPATH_MODEL_PATH = os.getenv('MONITOR_FASTPATH_MODEL_PATH', 'data/monitor_fastpath.npz')
+
+    # 客服系统指标异常检测配置
+    MONITOR_ANOMALY_ALPHA = float(os.getenv('MONITOR_ANOMALY_ALPHA', '0.05'))
+    MONITOR_ANOMALY_WINDOW = int(os.getenv('MONITOR_ANOMALY_WINDOW', '500'))
+    MONITOR_ANOMALY_Z = float(os.getenv('MONITOR_ANOMALY_Z', '3.0'))
+    MONITOR_ANOMALY_QUANTILE = float(os.getenv('MONITOR_ANOMALY_QUANTILE', '0.99'))
+    MONITOR_ANOMALY_WARMUP = int(os.getenv('MONITOR_ANOMALY_WARMUP', '30'))
+
+    # 客服相似对话聚类配置
+    MONITOR_CLUSTER_ENABLED = os.getenv('MONITOR_CLUSTER_ENABLED', 'true').lower() == 'true'
+    MONITOR_CLUSTER_NUM_PERM = int(os.getenv('MONITOR_CLUSTER_NUM_PERM', '64'))
+    MONITOR_CLUSTER_BANDS = int(os.getenv('MONITOR_CLUSTER_BANDS', '16'))
+    MONITOR_CLUSTER_THRESHOLD = float(os.getenv('MONITOR_CLUSTER_THRESHOLD', '0.6'))
+    MONITOR_CLUSTER_WINDOW_SECONDS = float(os.getenv('MONITOR_CLUSTER_WINDOW_SECONDS', '300'))
+
     # 日志配置
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
@@ -0,0 +1,98 @@
+"""
+工作流DAG - 依赖计数就绪跟踪与环检测
+"""
+
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+
+class WorkflowValidationError(ValueError):
+    """工作流定义非法（重复ID、未知依赖、循环依赖）"""
+
+
+class WorkflowDAG:
+    """工作流依赖图，就绪跟踪总代价O(V+E)"""
+
+    def __init__(self, steps: List[Dict[str, Any]]):
+        """构建依赖图并校验"""
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        for step in steps:
+            if step['id'] in self.steps:
+                raise WorkflowValidationError(f"步骤ID重复: {step['id']}")
+            self.steps[step['id']] = step
+
+        self.dependents: Dict[str, List[str]] = {step_id: [] for step_id in self.steps}
+        self.pending_deps: Dict[str, int] = {}
+
+        for step_id, step in self.steps.items():
+            dependencies = set(step.get('dependencies') or [])
+            for dep in dependencies:
+                if dep not in self.steps:
+                    raise WorkflowValidationError(f"步骤 {step_id} 依赖不存在的步骤: {dep}")
+                self.dependents[dep].append(step_id)
+            self.pending_deps[step_id] = len(dependencies)
+
+        self.order = self._topological_order()
+        self.position = {step_id: index for index, step_id in enumerate(self.order)}
+
+    def _topological_order(self) -> List[str]:
+        """Kahn算法拓扑排序，存在环时报错"""
+        indegree = dict(self.pending_deps)
+        queue = deque(step_id for step_id, count in indegree.items() if count == 0)
+        order = []
+
+        while queue:
+            step_id = queue.popleft()
+            order.append(step_id)
+            for dependent in self.dependents[step_id]:
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    queue.append(dependent)
+
+        if len(order) != len(self.steps):
+            cyclic = sorted(step_id for step_id, count in indegree.items() if count > 0)
+            raise WorkflowValidationError(f"工作流存在循环依赖: {', '.join(cyclic)}")
+
+        return order
+
+    def critical_path(self, durations: Dict[str, float]) -> Dict[str, float]:
+        """各步骤到终点的最长剩余路径（含自身耗时）"""
+        remaining: Dict[str, float] = {}
+        for step_id in reversed(self.order):
+            downstream = max(
+                (remaining[dependent] for dependent in self.dependents[step_id]),
+                default=0.0
+            )
+            remaining[step_id] = durations[step_id] + downstream
+        return remaining
+
+    def ready(self) -> List[str]:
+        """初始就绪的步骤"""
+        return [step_id for step_id in self.order if self.pending_deps[step_id] == 0]
+
+    def complete(self, step_id: str) -> List[str]:
+        """标记步骤完成，返回新就绪的步骤"""
+        newly_ready = []
+        for dependent in self.dependents[step_id]:
+            self.pending_deps[dependent] -= 1
+            if self.pending_deps[dependent] == 0:
+                newly_ready.append(dependent)
+        return newly_ready
+
+    def fail(self, step_id: str, completed: Optional[Set[str]] = None) -> Set[str]:
+        """标记步骤失败，返回因此无法执行的全部下游步骤
+
+        completed中的步骤（如从检查点恢复的）已有结果，不受影响，也不经由它们向下传播。
+        """
+        completed = completed or set()
+        skipped: Set[str] = set()
+        queue = deque(self.dependents[step_id])
+
+        while queue:
+            dependent = queue.popleft()
+            if dependent in skipped or dependent in completed:
+                continue
+            skipped.add(dependent)
+            queue.extend(self.dependents[dependent])
+
+        return skipped
@@ -0,0 +1,116 @@
+"""
+请求级截止时间 - 基于contextvar在工作流、Agent、LLM调用和工具间传递
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Iterator, Optional
+
+
+# 截止时间（time.monotonic()时刻），None表示不限
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """已超过请求截止时间"""
+
+
+def current_deadline() -> Optional[float]:
+    """当前截止时间"""
+    return _deadline.get()
+
+
+def resolve_deadline(timeout: Optional[float] = None) -> Optional[float]:
+    """计算timeout与外层截止时间中较早的一个
+
+    timeout为None表示不另设时限；不大于0表示时间已耗尽，抛出DeadlineExceeded。
+    """
+    current = _deadline.get()
+    if timeout is None:
+        return current
+    if timeout <= 0:
+        raise DeadlineExceeded("剩余时间已耗尽")
+
+    deadline = time.monotonic() + timeout
+    return deadline if current is None else min(deadline, current)
+
+
+def remaining() -> Optional[float]:
+    """剩余时间（秒），None表示不限"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline():
+    """截止时间已过则抛出DeadlineExceeded"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("请求已超过截止时间")
+
+
+def _discard(awaitable: Awaitable[Any]):
+    # 未执行的协程需要关闭，避免"never awaited"警告
+    if asyncio.iscoroutine(awaitable):
+        awaitable.close()
+
+
+@contextmanager
+def deadline_scope(
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None
+) -> Iterator[Optional[float]]:
+    """设置截止时间作用域（只收紧，不放宽外层截止时间）"""
+    if deadline is None:
+        deadline = resolve_deadline(timeout)
+    else:
+        current = _deadline.get()
+        if current is not None:
+            deadline = min(deadline, current)
+
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def reserve(margin: float) -> Iterator[Optional[float]]:
+    """把作用域内的截止时间提前margin秒
+
+    用于可降级的步骤：步骤内的调用先于外层截止时间到期，留出时间执行降级逻辑并返回，
+    不会与外层的超时取消同时触发。
+    """
+    current = _deadline.get()
+    token = _deadline.set(None if current is None else current - margin)
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+async def run_with_deadline(awaitable: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """在截止时间内等待，超时取消并抛出DeadlineExceeded"""
+    if timeout is not None and timeout <= 0:
+        _discard(awaitable)
+        raise DeadlineExceeded("剩余时间已耗尽")
+
+    with deadline_scope(timeout):
+        left = remaining()
+        if left is None:
+            return await awaitable
+
+        if left <= 0:
+            _discard(awaitable)
+            raise DeadlineExceeded("请求已超过截止时间")
+
+        try:
+            return await asyncio.wait_for(awaitable, left)
+        except asyncio.TimeoutError as e:
+            if isinstance(e, DeadlineExceeded):
+                raise
+            raise DeadlineExceeded(f"等待超时（{left:.1f}s）") from e
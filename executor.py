@@ -0,0 +1,319 @@
+"""
+工具执行器 - 内联/线程池/进程池三种执行模式，硬超时、内存上限、worker回收与事件循环延迟监控
+"""
+
+import asyncio
+import inspect
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from agent.core.deadline import DeadlineExceeded, deadline_scope, run_with_deadline
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+# resource仅在类Unix系统可用，缺失时不设置内存上限
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+logger = Logger(__name__)
+
+EXECUTION_MODES = ('inline', 'thread', 'process')
+
+
+def _call_sync(handler: Callable, arguments: Dict[str, Any]) -> Any:
+    """在非事件循环线程/进程中调用处理函数（协程函数用独立事件循环执行）"""
+    result = handler(arguments)
+    if inspect.isawaitable(result):
+        return asyncio.run(_await(result))
+    return result
+
+
+async def _await(awaitable: Any) -> Any:
+    return await awaitable
+
+
+def _worker_main(conn, memory_mb: int):
+    """进程池worker：设置内存上限后循环执行任务"""
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        handler, arguments = task
+        try:
+            conn.send(('ok', _call_sync(handler, arguments)))
+        except MemoryError:
+            conn.send(('error', f"超出内存上限（{memory_mb}MB）"))
+        except BaseException as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class _ProcessWorker:
+    """单个worker进程及其通信管道"""
+
+    def __init__(self, context, memory_mb: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    async def call(self, handler: Callable, arguments: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def on_readable():
+            loop.remove_reader(self.conn.fileno())
+            if future.done():
+                return
+            try:
+                future.set_result(self.conn.recv())
+            except (EOFError, OSError):
+                future.set_exception(RuntimeError(f"worker进程异常退出（exitcode={self.process.exitcode}）"))
+
+        self.conn.send((handler, arguments))
+        self.tasks += 1
+        loop.add_reader(self.conn.fileno(), on_readable)
+        try:
+            status, value = await future
+        finally:
+            # 被取消时也要注销，否则fd被新worker复用后监听失效
+            loop.remove_reader(self.conn.fileno())
+
+        if status == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def stop(self):
+        """正常退出"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+
+    def kill(self):
+        """强制终止（超时或状态未知时）"""
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ProcessWorkerPool:
+    """可强制终止的进程池：超时直接杀掉worker，执行满max_tasks个任务后回收"""
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = None,
+        memory_mb: Optional[int] = None
+    ):
+        """初始化进程池（worker按需启动）"""
+        self.size = size or config.TOOL_PROCESS_WORKERS
+        self.max_tasks_per_child = max_tasks_per_child or config.TOOL_PROCESS_MAX_TASKS
+        self.memory_mb = config.TOOL_PROCESS_MEMORY_MB if memory_mb is None else memory_mb
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: List[_ProcessWorker] = []
+        self._started = 0
+        self._available: Optional[asyncio.Semaphore] = None
+        self.stats = {'killed': 0, 'recycled': 0}
+
+    async def run(
+        self,
+        handler: Callable,
+        arguments: Dict[str, Any],
+        timeout: Optional[float] = None,
+        on_start: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """在worker进程中执行（handler须可pickle），超时或被取消则终止该worker"""
+        if self._available is None:
+            self._available = asyncio.Semaphore(self.size)
+
+        async with self._available:
+            worker = self._idle.pop() if self._idle else self._spawn()
+            if on_start is not None:
+                on_start()
+            try:
+                result = await run_with_deadline(worker.call(handler, arguments), timeout)
+            except (asyncio.CancelledError, DeadlineExceeded):
+                # 任务仍在执行，worker状态未知，直接终止
+                worker.kill()
+                self.stats['killed'] += 1
+                raise
+            except RuntimeError:
+                if not worker.process.is_alive():
+                    worker.kill()
+                    self.stats['killed'] += 1
+                else:
+                    self._release(worker)
+                raise
+
+            self._release(worker)
+            return result
+
+    def _spawn(self) -> _ProcessWorker:
+        self._started += 1
+        return _ProcessWorker(self._context, self.memory_mb)
+
+    def _release(self, worker: _ProcessWorker):
+        if worker.tasks >= self.max_tasks_per_child:
+            worker.stop()
+            self.stats['recycled'] += 1
+        else:
+            self._idle.append(worker)
+
+    def shutdown(self):
+        """关闭所有空闲worker"""
+        while self._idle:
+            self._idle.pop().stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'started': self._started, 'idle': len(self._idle)}
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控：定期休眠，测量实际唤醒时间相对预期的滞后"""
+
+    def __init__(self, interval: float = 0.05, window: int = 1200):
+        """初始化监控器"""
+        self.interval = interval
+        self.samples: deque = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self):
+        """在当前事件循环中启动监控（已启动则跳过）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def get_stats(self) -> Dict[str, float]:
+        if not self.samples:
+            return {'samples': 0, 'mean_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(self.samples)
+        return {
+            'samples': len(ordered),
+            'mean_ms': sum(ordered) / len(ordered) * 1000,
+            'p99_ms': ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)] * 1000,
+            'max_ms': self.max_lag * 1000
+        }
+
+
+class ToolExecutor:
+    """按工具执行模式分发调用并统计排队与执行情况"""
+
+    def __init__(self):
+        """初始化执行器（线程池和进程池按需创建）"""
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessWorkerPool] = None
+        self.lag = LoopLagMonitor()
+        self.stats = {
+            mode: {
+                'calls': 0, 'queued': 0, 'running': 0, 'timeouts': 0,
+                'queue_wait_total': 0.0, 'queue_wait_max': 0.0
+            }
+            for mode in EXECUTION_MODES
+        }
+        # 线程模式下开始执行的统计在工作线程中更新
+        self._lock = threading.Lock()
+
+    @property
+    def processes(self) -> ProcessWorkerPool:
+        if self._processes is None:
+            self._processes = ProcessWorkerPool()
+        return self._processes
+
+    async def run(self, tool: Dict[str, Any], arguments: Dict[str, Any]) -> Any:
+        """在工具声明的执行模式下调用处理函数（受工具超时和请求截止时间约束）"""
+        self.lag.ensure_started()
+        mode = tool.get('mode', 'inline')
+        stats = self.stats[mode]
+        with self._lock:
+            stats['calls'] += 1
+            stats['queued'] += 1
+
+        timeout = tool['timeout'] or config.TOOL_TIMEOUT_SECONDS or None
+        with deadline_scope(timeout):
+            submitted = time.monotonic()
+            phase = {'value': 'queued'}
+
+            def mark_started():
+                wait = time.monotonic() - submitted
+                with self._lock:
+                    # 调用方已超时返回后线程才开始执行的，不再计入
+                    if phase['value'] != 'queued':
+                        return
+                    phase['value'] = 'running'
+                    stats['queued'] -= 1
+                    stats['running'] += 1
+                    stats['queue_wait_total'] += wait
+                    stats['queue_wait_max'] = max(stats['queue_wait_max'], wait)
+
+            try:
+                if mode == 'process':
+                    return await self._run_process(tool['handler'], arguments, mark_started)
+                if mode == 'thread':
+                    return await self._run_thread(tool['handler'], arguments, mark_started)
+
+                mark_started()
+                result = tool['handler'](arguments)
+                if inspect.isawaitable(result):
+                    result = await run_with_deadline(result)
+                return result
+            except DeadlineExceeded:
+                stats['timeouts'] += 1
+                raise
+            finally:
+                with self._lock:
+                    stats[phase['value']] -= 1
+                    phase['value'] = 'done'
+
+    async def _run_thread(self, handler: Callable, arguments: Dict[str, Any], mark_started: Callable) -> Any:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=config.TOOL_THREAD_WORKERS, thread_name_prefix='tool'
+            )
+
+        def call():
+            mark_started()
+            return _call_sync(handler, arguments)
+
+        # 线程无法强制终止：超时后调用方立即返回，线程在后台执行完毕
+        future = asyncio.get_running_loop().run_in_executor(self._threads, call)
+        return await run_with_deadline(future)
+
+    async def _run_process(self, handler: Callable, arguments: Dict[str, Any], mark_started: Callable) -> Any:
+        # 排队时间同样计入截止时间；超时时正在执行的worker被终止
+        return await run_with_deadline(self.processes.run(handler, arguments, on_start=mark_started))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """执行模式统计、进程池状态和事件循环延迟"""
+        return {
+            'modes': {mode: dict(stats) for mode, stats in self.stats.items()},
+            'process_pool': self._processes.get_stats() if self._processes else None,
+            'loop_lag': self.lag.get_stats()
+        }
@@ -0,0 +1,329 @@
+"""
+安全表达式引擎 - AST白名单编译、编译缓存、变量绑定与NumPy向量化批量求值
+"""
+
+import ast
+import math
+import operator
+import time
+from functools import lru_cache, reduce
+from typing import Any, Dict, List, Optional
+
+# NumPy导入（可选依赖，缺失时批量求值逐行计算）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+
+MAX_EXPRESSION_LENGTH = 1000
+MAX_NODES = 200
+MAX_POWER_EXPONENT = 1000
+MAX_INTEGER_BITS = 100_000
+MAX_BATCH_ROWS = 1_000_000
+# float64能精确表示的整数范围，超出时批量求值逐行计算
+MAX_EXACT_FLOAT_INTEGER = 2 ** 53
+
+
+class ExpressionError(ValueError):
+    """表达式非法或求值失败"""
+
+
+_CONSTANTS = {'pi': math.pi, 'e': math.e, 'inf': math.inf}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub, ast.Not)
+_COMPARE_OPERATORS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+def _inexact_integer(value: Any) -> bool:
+    """是否为float64无法精确表示的整数"""
+    return isinstance(value, int) and abs(value) >= MAX_EXACT_FLOAT_INTEGER
+
+
+def _pow(base: Any, exponent: Any) -> Any:
+    """幂运算，限制指数大小防止超大整数耗尽CPU和内存"""
+    if NUMPY_AVAILABLE and isinstance(exponent, np.ndarray):
+        if exponent.size and np.abs(exponent).max() > MAX_POWER_EXPONENT:
+            raise ExpressionError(f"指数超出上限: {MAX_POWER_EXPONENT}")
+    elif abs(exponent) > MAX_POWER_EXPONENT:
+        raise ExpressionError(f"指数超出上限: {MAX_POWER_EXPONENT}")
+    elif isinstance(base, int) and isinstance(exponent, int) and base.bit_length() * exponent > MAX_INTEGER_BITS:
+        raise ExpressionError("整数幂运算结果过大")
+    return operator.pow(base, exponent)
+
+
+def _mul(left: Any, right: Any) -> Any:
+    """乘法，限制整数结果位数（乘法链是标量求值中唯一能持续放大整数的运算）"""
+    if (isinstance(left, int) and isinstance(right, int)
+            and left.bit_length() + right.bit_length() > MAX_INTEGER_BITS):
+        raise ExpressionError("整数乘法结果过大")
+    return operator.mul(left, right)
+
+
+# 标量函数
+_SCALAR_FUNCTIONS = {
+    'abs': abs, 'round': round, 'min': min, 'max': max,
+    'sqrt': math.sqrt, 'log': math.log, 'log10': math.log10, 'exp': math.exp,
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'floor': math.floor, 'ceil': math.ceil,
+    '_pow': _pow, '_mul': _mul,
+}
+
+# 向量函数（逻辑运算、条件表达式改写为逐元素函数）
+if NUMPY_AVAILABLE:
+    _VECTOR_FUNCTIONS = {
+        'abs': np.abs, 'round': np.round,
+        'min': lambda *args: reduce(np.minimum, args),
+        'max': lambda *args: reduce(np.maximum, args),
+        'sqrt': np.sqrt, 'log': np.log, 'log10': np.log10, 'exp': np.exp,
+        'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+        'floor': np.floor, 'ceil': np.ceil,
+        '_pow': _pow, '_mul': _mul,
+        '_and': lambda *args: reduce(np.logical_and, args),
+        '_or': lambda *args: reduce(np.logical_or, args),
+        '_not': np.logical_not,
+        '_where': np.where,
+    }
+
+
+def _validate(tree: ast.Expression) -> List[str]:
+    """校验AST只包含白名单节点，返回引用的变量名"""
+    names = []
+    count = 0
+
+    for node in ast.walk(tree):
+        count += 1
+        if count > MAX_NODES:
+            raise ExpressionError(f"表达式过于复杂（超过{MAX_NODES}个节点）")
+
+        if isinstance(node, (ast.Expression, ast.Load, ast.IfExp, ast.BoolOp, ast.And, ast.Or)):
+            continue
+        if isinstance(node, ast.BinOp):
+            if not isinstance(node.op, _BINARY_OPERATORS):
+                raise ExpressionError(f"不支持的运算符: {type(node.op).__name__}")
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, _UNARY_OPERATORS):
+                raise ExpressionError(f"不支持的运算符: {type(node.op).__name__}")
+        elif isinstance(node, ast.Compare):
+            for op in node.ops:
+                if not isinstance(op, _COMPARE_OPERATORS):
+                    raise ExpressionError(f"不支持的比较: {type(op).__name__}")
+        elif isinstance(node, ast.Constant):
+            if type(node.value) not in (int, float, bool):
+                raise ExpressionError(f"不支持的常量: {node.value!r}")
+        elif isinstance(node, ast.Call):
+            if (not isinstance(node.func, ast.Name) or node.func.id.startswith('_')
+                    or node.func.id not in _SCALAR_FUNCTIONS or node.keywords):
+                raise ExpressionError(f"不支持的函数调用: {ast.unparse(node.func)}")
+        elif isinstance(node, ast.Name):
+            if node.id.startswith('_'):
+                raise ExpressionError(f"非法变量名: {node.id}")
+            if node.id not in _SCALAR_FUNCTIONS and node.id not in _CONSTANTS:
+                names.append(node.id)
+        elif isinstance(node, (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+                               ast.UAdd, ast.USub, ast.Not) + _COMPARE_OPERATORS):
+            continue
+        else:
+            raise ExpressionError(f"不支持的语法: {type(node).__name__}")
+
+    return sorted(set(names))
+
+
+def _call(name: str, args: List[ast.expr]) -> ast.Call:
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+
+class _GuardPower(ast.NodeTransformer):
+    """a ** b、a * b 改写为 _pow(a, b)、_mul(a, b)"""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return _call('_pow', [node.left, node.right])
+        if isinstance(node.op, ast.Mult):
+            return _call('_mul', [node.left, node.right])
+        return node
+
+
+class _Vectorize(_GuardPower):
+    """逻辑运算、链式比较和条件表达式改写为逐元素函数"""
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.AST:
+        self.generic_visit(node)
+        return _call('_and' if isinstance(node.op, ast.And) else '_or', node.values)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _call('_not', [node.operand])
+        return node
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        operands = [node.left] + node.comparators
+        pairs = [
+            ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+            for i, op in enumerate(node.ops)
+        ]
+        return _call('_and', pairs)
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.AST:
+        self.generic_visit(node)
+        return _call('_where', [node.test, node.body, node.orelse])
+
+
+def _compile(tree: ast.Expression, transformer: ast.NodeTransformer) -> Any:
+    tree = ast.fix_missing_locations(transformer.visit(tree))
+    return compile(tree, '<expression>', 'eval')
+
+
+class CompiledExpression:
+    """编译后的表达式"""
+
+    def __init__(self, source: str):
+        """解析、校验并编译表达式"""
+        if len(source) > MAX_EXPRESSION_LENGTH:
+            raise ExpressionError(f"表达式过长（超过{MAX_EXPRESSION_LENGTH}个字符）")
+        try:
+            tree = ast.parse(source.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ExpressionError(f"表达式语法错误: {e.msg}")
+
+        self.source = source
+        self.variables = _validate(tree)
+        self._scalar = _compile(tree, _GuardPower())
+        self._vector = _compile(ast.parse(source.strip(), mode='eval'), _Vectorize()) if NUMPY_AVAILABLE else None
+
+    def evaluate(self, variables: Optional[Dict[str, Any]] = None) -> Any:
+        """标量求值（变量只能是int/float/bool，整数运算结果位数受限）"""
+        namespace = self._namespace(_SCALAR_FUNCTIONS, variables or {})
+        try:
+            return eval(self._scalar, {'__builtins__': {}}, namespace)
+        except ExpressionError:
+            raise
+        except Exception as e:
+            raise ExpressionError(f"求值失败: {type(e).__name__}: {e}")
+
+    def evaluate_batch(
+        self,
+        columns: Dict[str, List[Any]],
+        variables: Optional[Dict[str, Any]] = None,
+        time_limit: Optional[float] = None
+    ) -> List[Any]:
+        """批量求值：columns为 变量名 -> 值列表，variables为所有行共享的标量
+
+        向量化求值遇到除零、定义域错误或溢出时改为逐行求值，结果与标量求值一致
+        （条件表达式只计算选中的分支，未被条件排除的错误照常报错）。
+        整数列按float64计算，结果类型按首行的标量求值结果还原为整数；
+        超出float64精确整数范围时逐行求值。
+        """
+        for name, values in columns.items():
+            if not isinstance(values, (list, tuple)):
+                raise ExpressionError(f"批量变量 {name} 必须是列表")
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ExpressionError("批量变量的长度不一致")
+        rows = lengths.pop() if lengths else 1
+        if rows > MAX_BATCH_ROWS:
+            raise ExpressionError(f"批量行数超出上限: {MAX_BATCH_ROWS}")
+
+        if self._vector is not None:
+            try:
+                arrays = {name: self._array(values) for name, values in columns.items()}
+                namespace = self._namespace(_VECTOR_FUNCTIONS, variables or {}, arrays)
+                if any(_inexact_integer(value) for value in (variables or {}).values()):
+                    raise FloatingPointError("整数超出float64精确范围")
+                # NumPy默认返回inf/nan，而标量求值会报错；出现浮点异常时回退到逐行求值
+                with np.errstate(divide='raise', over='raise', invalid='raise', under='ignore'):
+                    result = eval(self._vector, {'__builtins__': {}}, namespace)
+                result = np.broadcast_to(result, (rows,))
+                if result.dtype.kind != 'f' or not rows or not self._integral_result(columns, variables or {}):
+                    return result.tolist()
+                # 结果超出精确范围或含非整数值时逐行求值
+                if np.all(np.abs(result) < MAX_EXACT_FLOAT_INTEGER) and np.all(result == np.trunc(result)):
+                    return result.astype(np.int64).tolist()
+            except ExpressionError:
+                raise
+            except (FloatingPointError, ZeroDivisionError):
+                pass
+            except Exception as e:
+                raise ExpressionError(f"批量求值失败: {type(e).__name__}: {e}")
+
+        # 无NumPy或向量化求值出现浮点异常时逐行求值，按时间上限中止
+        started = time.monotonic()
+        results = []
+        for index in range(rows):
+            if time_limit and time.monotonic() - started > time_limit:
+                raise ExpressionError(f"批量求值超时（{time_limit}s，已完成{index}行）")
+            row = {name: values[index] for name, values in columns.items()}
+            results.append(self.evaluate({**(variables or {}), **row}))
+        return results
+
+    def _integral_result(self, columns: Dict[str, List[Any]], variables: Dict[str, Any]) -> bool:
+        """首行的标量求值结果是否为整数（整数输入经+、-、*、//等运算仍为整数）"""
+        row = {name: values[0] for name, values in columns.items()}
+        result = self.evaluate({**variables, **row})
+        return isinstance(result, int) and not isinstance(result, bool)
+
+    @staticmethod
+    def _array(values: List[Any]) -> Any:
+        # 整数列转为float64，避免int64溢出后静默回绕；超出精确范围的整数交给逐行求值
+        array = np.asarray(values)
+        if array.ndim != 1:
+            raise ExpressionError("批量变量必须是一维数值列表")
+        if array.dtype.kind == 'O' and all(isinstance(value, int) for value in values):
+            raise FloatingPointError("整数超出float64精确范围")
+        if array.dtype.kind in 'iu':
+            if array.size and np.abs(array).max() >= MAX_EXACT_FLOAT_INTEGER:
+                raise FloatingPointError("整数超出float64精确范围")
+            return array.astype(np.float64)
+        if array.dtype.kind not in 'fb':
+            raise ExpressionError("批量变量必须是数值或布尔值")
+        return array
+
+    def _namespace(
+        self,
+        functions: Dict[str, Any],
+        variables: Dict[str, Any],
+        arrays: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        # 标量变量只接受int/float/bool：列表、字符串等支持*运算，可被用来构造超大对象
+        arrays = arrays or {}
+        missing = [name for name in self.variables if name not in variables and name not in arrays]
+        if missing:
+            raise ExpressionError(f"缺少变量: {', '.join(missing)}")
+        for name in arrays:
+            if name.startswith('_'):
+                raise ExpressionError(f"非法变量名: {name}")
+        for name, value in variables.items():
+            if name.startswith('_'):
+                raise ExpressionError(f"非法变量名: {name}")
+            if not isinstance(value, (int, float)):
+                raise ExpressionError(f"变量 {name} 不是数值")
+            if isinstance(value, int) and value.bit_length() > MAX_INTEGER_BITS:
+                raise ExpressionError(f"变量 {name} 超出整数位数上限")
+        return {**functions, **_CONSTANTS, **variables, **arrays}
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(source: str) -> CompiledExpression:
+    """编译表达式（按原文缓存）"""
+    return CompiledExpression(source)
+
+
+def calculate(args: Dict[str, Any]) -> Dict[str, Any]:
+    """calculate工具处理函数（模块级函数，可在进程池中执行）"""
+    expression = args.get('expression', '')
+    try:
+        compiled = compile_expression(expression)
+        if args.get('batch'):
+            results = compiled.evaluate_batch(args['batch'], args.get('variables'))
+            return {'expression': expression, 'results': results, 'count': len(results)}
+        return {'expression': expression, 'result': compiled.evaluate(args.get('variables'))}
+    except ExpressionError as e:
+        return {'expression': expression, 'error': str(e)}
@@ -0,0 +1,272 @@
+"""
+HTTP客户端 - 共享连接池、流式读取限制响应大小、ETag/Last-Modified条件请求缓存、目标主机校验
+"""
+
+import asyncio
+import ipaddress
+import json
+import socket
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import httpx
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+# 返回给调用方的响应头
+_RESPONSE_HEADERS = ('content-type', 'content-length', 'etag', 'last-modified', 'cache-control', 'location')
+
+# 条件请求头由缓存自身添加，不计入缓存键
+_CONDITIONAL_HEADERS = ('if-none-match', 'if-modified-since')
+
+
+class BlockedHostError(ValueError):
+    """目标主机不在允许访问的范围内"""
+
+
+def _host_allowed(host: str, allowed: List[str]) -> bool:
+    host = host.lower().rstrip('.')
+    for pattern in allowed:
+        if pattern.startswith('*.') and host.endswith(pattern[1:]):
+            return True
+        if host == pattern:
+            return True
+    return False
+
+
+async def check_host(url: httpx.URL):
+    """校验请求目标：配置了HTTP_ALLOWED_HOSTS时只允许名单内的主机，否则只允许解析到公网地址的主机"""
+    host = url.host
+    if config.HTTP_ALLOWED_HOSTS:
+        if not _host_allowed(host, config.HTTP_ALLOWED_HOSTS):
+            raise BlockedHostError(f"主机不在允许列表中: {host}")
+        return
+
+    port = url.port or (443 if url.scheme == 'https' else 80)
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        # 解析失败时由连接阶段报错
+        return
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if not address.is_global:
+            raise BlockedHostError(f"禁止访问内网地址: {host} ({address})")
+
+
+def cache_key(url: str, headers: Dict[str, str]) -> str:
+    """缓存键：URL加上影响响应内容的请求头（Accept、Authorization等，覆盖Vary可能引用的任何请求头）"""
+    varying = sorted(
+        (key.lower(), str(value)) for key, value in headers.items() if key.lower() not in _CONDITIONAL_HEADERS
+    )
+    return f"{url}\n{json.dumps(varying, ensure_ascii=False)}" if varying else url
+
+
+class ResponseCache:
+    """按URL和请求头缓存带校验器（ETag/Last-Modified）的GET响应，按总字节数LRU淘汰"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """初始化缓存"""
+        self.max_bytes = max_bytes or config.HTTP_CACHE_MAX_BYTES
+        self._entries: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.stats = {'revalidated': 0, 'modified': 0, 'stored': 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        self.discard(key)
+        if entry['size'] > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.bytes += entry['size']
+        self.stats['stored'] += 1
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted['size']
+
+    def discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry['size']
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'entries': len(self._entries), 'bytes': self.bytes}
+
+
+class HttpClient:
+    """基于httpx的共享异步HTTP客户端"""
+
+    def __init__(self, cache: Optional[ResponseCache] = None):
+        """初始化客户端（连接池在首次请求时按事件循环创建）"""
+        self.cache = cache or ResponseCache()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # 连接池绑定事件循环，循环变化时关闭旧连接池后重建
+        if self._client is not None and self._loop is not loop:
+            await self._close_stale(self._client, self._loop)
+            self._client = None
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.HTTP_MAX_KEEPALIVE
+                ),
+                timeout=config.HTTP_TIMEOUT_SECONDS,
+                follow_redirects=True,
+                # 每次请求（含重定向）发出前校验目标主机
+                event_hooks={'request': [self._check_request]}
+            )
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    async def _check_request(request: httpx.Request):
+        await check_host(request.url)
+
+    @staticmethod
+    async def _close_stale(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """关闭属于其他事件循环的连接池：该循环仍在其他线程运行时交给它关闭，否则在当前循环中关闭"""
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            else:
+                await client.aclose()
+        except Exception as e:
+            logger.debug(f"关闭旧连接池失败: {e}")
+
+    async def request(
+        self,
+        url: str,
+        method: str = 'GET',
+        headers: Optional[Dict[str, str]] = None,
+        body: Any = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """发送请求，响应体超过max_bytes（不超过HTTP_MAX_RESPONSE_BYTES）时截断"""
+        method = method.upper()
+        headers = dict(headers or {})
+        limit = config.HTTP_MAX_RESPONSE_BYTES
+        max_bytes = min(max_bytes, limit) if max_bytes and max_bytes > 0 else limit
+
+        key = cache_key(url, headers)
+        cached = self.cache.get(key) if method == 'GET' else None
+        if cached is not None:
+            if cached['etag']:
+                headers.setdefault('If-None-Match', cached['etag'])
+            if cached['last_modified']:
+                headers.setdefault('If-Modified-Since', cached['last_modified'])
+
+        started = time.monotonic()
+        client = await self._get_client()
+        async with client.stream(
+            method, url,
+            headers=headers,
+            json=body if body is not None and method not in ('GET', 'HEAD') else None,
+            timeout=timeout or config.HTTP_TIMEOUT_SECONDS
+        ) as response:
+            if response.status_code == 304 and cached is not None:
+                self.cache.stats['revalidated'] += 1
+                return self._result(cached['status'], cached['headers'], cached['content'],
+                                    False, started, revalidated=True)
+
+            content, truncated = await self._read(response, max_bytes)
+            response_headers = {
+                key: response.headers[key] for key in _RESPONSE_HEADERS if key in response.headers
+            }
+
+        if cached is not None:
+            self.cache.stats['modified'] += 1
+        if method == 'GET':
+            self._store(key, response, response_headers, content, truncated)
+
+        return self._result(response.status_code, response_headers, content, truncated, started)
+
+    @staticmethod
+    async def _read(response: httpx.Response, max_bytes: int) -> tuple:
+        """流式读取响应体，超过上限时停止读取"""
+        declared = response.headers.get('content-length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            logger.warning(f"响应体过大（{declared}字节），只读取前{max_bytes}字节")
+
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                return b''.join(chunks)[:max_bytes], True
+        return b''.join(chunks), False
+
+    def _store(self, key: str, response: httpx.Response, headers: Dict[str, str], content: bytes, truncated: bool):
+        etag = response.headers.get('etag')
+        last_modified = response.headers.get('last-modified')
+        cache_control = response.headers.get('cache-control', '').lower()
+
+        if (response.status_code != 200 or truncated or not (etag or last_modified)
+                or 'no-store' in cache_control or response.headers.get('vary', '').strip() == '*'):
+            self.cache.discard(key)
+            return
+
+        self.cache.put(key, {
+            'status': response.status_code,
+            'headers': headers,
+            'content': content,
+            'etag': etag,
+            'last_modified': last_modified,
+            'size': len(content)
+        })
+
+    @staticmethod
+    def _result(
+        status: int,
+        headers: Dict[str, str],
+        content: bytes,
+        truncated: bool,
+        started: float,
+        revalidated: bool = False
+    ) -> Dict[str, Any]:
+        content_type = headers.get('content-type', '')
+        data: Any = content.decode('utf-8', errors='replace')
+        if 'json' in content_type and not truncated:
+            try:
+                data = json.loads(data)
+            except ValueError:
+                pass
+
+        return {
+            'status': status,
+            'headers': headers,
+            'data': data,
+            'truncated': truncated,
+            'revalidated': revalidated,
+            'elapsed_ms': (time.monotonic() - started) * 1000
+        }
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_http_client_instance: Optional[HttpClient] = None
+
+
+def get_http_client() -> HttpClient:
+    """获取共享HTTP客户端"""
+    global _http_client_instance
+    if _http_client_instance is None:
+        _http_client_instance = HttpClient()
+    return _http_client_instance
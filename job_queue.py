@@ -0,0 +1,290 @@
+"""
+本地任务队列 - 工作流步骤以任务形式分发给worker进程（租约、重试、结果回收）
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from agent.core.deadline import DeadlineExceeded, remaining
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+
+class JobQueue(ABC):
+    """任务队列接口"""
+
+    @abstractmethod
+    def enqueue(self, kind: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> str:
+        """提交任务，返回任务ID"""
+
+    @abstractmethod
+    def lease(self, worker_id: str, lease_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """领取一个任务（含租约过期且未用完重试次数的任务），无任务返回None"""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: Optional[float] = None) -> bool:
+        """续约，租约已失效返回False"""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str, result: Any) -> bool:
+        """提交任务结果"""
+
+    @abstractmethod
+    def fail(
+        self,
+        job_id: str,
+        worker_id: str,
+        error: str,
+        retryable: bool = True,
+        error_type: Optional[str] = None
+    ) -> bool:
+        """任务失败，未超过重试次数时重新排队；error_type记录异常类型供调度端区分超时"""
+
+    @abstractmethod
+    def cancel(self, job_id: str):
+        """取消任务"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """基于SQLite的任务队列
+
+    单机多进程直接共享数据库文件；多机部署时将文件放在共享存储上
+    （需支持文件锁），或实现JobQueue接口接入其他队列。
+    方法是同步阻塞的，在事件循环中应通过asyncio.to_thread调用；连接由锁串行化。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """初始化队列"""
+        self.path = path or config.JOB_QUEUE_PATH
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                error_type TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, available_at)'
+        )
+        # 旧版本创建的数据库补充error_type列
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')}
+        if 'error_type' not in columns:
+            self.conn.execute('ALTER TABLE jobs ADD COLUMN error_type TEXT')
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> str:
+        job_id = f"job_{uuid.uuid4().hex}"
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """INSERT INTO jobs (id, kind, payload, status, max_attempts, available_at, created_at, updated_at)
+                   VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)""",
+                (
+                    job_id, kind,
+                    json.dumps(payload, ensure_ascii=False, default=str),
+                    max_attempts or config.JOB_MAX_ATTEMPTS,
+                    now, now, now
+                )
+            )
+        return job_id
+
+    def lease(self, worker_id: str, lease_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+
+        # IMMEDIATE事务保证多个worker不会领到同一个任务
+        with self._lock, self._immediate():
+            # 租约过期且已用完重试次数的任务（如反复导致worker崩溃）直接标记失败，不再分发
+            self.conn.execute(
+                """UPDATE jobs SET status = 'failed', lease_owner = NULL, updated_at = ?,
+                   error = '租约过期且已达最大重试次数' || COALESCE(': ' || error, '')
+                   WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts""",
+                (now, now)
+            )
+            row = self.conn.execute(
+                """SELECT id, kind, payload, attempts FROM jobs
+                   WHERE (status = 'queued' AND available_at <= ?)
+                      OR (status = 'leased' AND lease_expires < ?)
+                   ORDER BY created_at LIMIT 1""",
+                (now, now)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            job_id, kind, payload, attempts = row
+            self.conn.execute(
+                """UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                   attempts = attempts + 1, updated_at = ? WHERE id = ?""",
+                (worker_id, now + lease_seconds, now, job_id)
+            )
+
+        return {'id': job_id, 'kind': kind, 'payload': json.loads(payload), 'attempt': attempts + 1}
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: Optional[float] = None) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                """UPDATE jobs SET lease_expires = ?, updated_at = ?
+                   WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (time.time() + (lease_seconds or config.JOB_LEASE_SECONDS), time.time(), job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Any) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                """UPDATE jobs SET status = 'done', result = ?, lease_owner = NULL, updated_at = ?
+                   WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def fail(
+        self,
+        job_id: str,
+        worker_id: str,
+        error: str,
+        retryable: bool = True,
+        error_type: Optional[str] = None
+    ) -> bool:
+        # 读取重试次数和更新状态在同一IMMEDIATE事务中，避免与其他worker的lease交错
+        with self._lock, self._immediate():
+            row = self.conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+
+            attempts, max_attempts = row
+            now = time.time()
+            if retryable and attempts < max_attempts:
+                # 指数退避后重新排队
+                self.conn.execute(
+                    """UPDATE jobs SET status = 'queued', error = ?, error_type = ?, lease_owner = NULL,
+                       available_at = ?, updated_at = ? WHERE id = ?""",
+                    (error, error_type, now + min(2 ** attempts, 60), now, job_id)
+                )
+            else:
+                self.conn.execute(
+                    """UPDATE jobs SET status = 'failed', error = ?, error_type = ?, lease_owner = NULL,
+                       updated_at = ? WHERE id = ?""",
+                    (error, error_type, now, job_id)
+                )
+        return True
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            self.conn.execute(
+                """UPDATE jobs SET status = 'cancelled', lease_owner = NULL, updated_at = ?
+                   WHERE id = ? AND status IN ('queued', 'leased')""",
+                (time.time(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT status, attempts, result, error, error_type FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        status, attempts, result, error, error_type = row
+        return {
+            'id': job_id,
+            'status': status,
+            'attempts': attempts,
+            'result': json.loads(result) if result is not None else None,
+            'error': error,
+            'error_type': error_type
+        }
+
+    def get_stats(self) -> Dict[str, int]:
+        """按状态统计任务数"""
+        with self._lock:
+            return dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    @contextmanager
+    def _immediate(self) -> Iterator[None]:
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+
+class QueueBackend:
+    """工作流执行后端：步骤作为任务提交到队列，由worker进程执行"""
+
+    def __init__(self, queue: Optional[JobQueue] = None, poll_interval: float = 0.05):
+        """初始化后端"""
+        self.queue = queue or SQLiteJobQueue()
+        self.poll_interval = poll_interval
+
+    async def run(self, step: Dict[str, Any], context: Optional[Dict[str, Any]]) -> Any:
+        """提交步骤并等待结果，调用方取消时同时取消任务
+
+        已超过截止时间时直接抛出DeadlineExceeded，不再提交任务；截止时间以绝对时间戳
+        （time.time()）随任务下发，worker按领取时的剩余时间执行，排队等待也计入时限。
+        worker因超时失败的任务在调度端同样抛出DeadlineExceeded。
+        队列操作是阻塞的数据库调用，放到线程中执行以免阻塞事件循环。
+        """
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded("请求已超过截止时间")
+
+        job_id = await asyncio.to_thread(self.queue.enqueue, 'agent_step', {
+            'agent': step['agent'],
+            'description': step.get('description', ''),
+            'context': context,
+            'deadline': None if left is None else time.time() + left,
+            'step_id': step['id']
+        })
+
+        interval = self.poll_interval
+        try:
+            while True:
+                job = await asyncio.to_thread(self.queue.get, job_id)
+                if job['status'] == 'done':
+                    return job['result']
+                if job['status'] == 'failed' and job['error_type'] == DeadlineExceeded.__name__:
+                    raise DeadlineExceeded(f"任务超时: {job['error']}")
+                if job['status'] in ('failed', 'cancelled'):
+                    raise RuntimeError(f"任务{job['status']}: {job['error']}")
+
+                await asyncio.sleep(interval)
+                interval = min(interval * 1.5, 0.5)
+        except asyncio.CancelledError:
+            await asyncio.shield(asyncio.to_thread(self.queue.cancel, job_id))
+            raise
@@ -0,0 +1,74 @@
+"""
+步骤耗时估计 - 按Agent和步骤类型维护EWMA，本地持久化
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+
+def step_type(step: Dict[str, Any]) -> str:
+    """步骤类型：优先使用type字段，否则使用步骤名"""
+    return step.get('type') or step.get('name') or step['id']
+
+
+class LatencyEstimator:
+    """步骤耗时EWMA估计器"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        alpha: Optional[float] = None,
+        default: Optional[float] = None
+    ):
+        """初始化估计器并加载历史数据"""
+        self.path = Path(path or config.WORKFLOW_LATENCY_PATH)
+        self.alpha = config.WORKFLOW_LATENCY_ALPHA if alpha is None else alpha
+        self.default = config.WORKFLOW_DEFAULT_STEP_SECONDS if default is None else default
+        self.estimates: Dict[str, float] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            self.estimates = json.loads(self.path.read_text(encoding='utf-8'))
+        except Exception as e:
+            logger.warning(f"耗时估计加载失败: {e}")
+
+    def save(self):
+        """持久化估计值"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(
+                json.dumps(self.estimates, ensure_ascii=False, indent=2),
+                encoding='utf-8'
+            )
+        except Exception as e:
+            logger.warning(f"耗时估计保存失败: {e}")
+
+    @staticmethod
+    def _keys(step: Dict[str, Any]):
+        agent_key = f"agent:{step['agent']}"
+        return f"step:{step['agent']}:{step_type(step)}", agent_key
+
+    def estimate(self, step: Dict[str, Any]) -> float:
+        """预估步骤耗时（秒）：步骤类型 > Agent > 默认值"""
+        step_key, agent_key = self._keys(step)
+        if step_key in self.estimates:
+            return self.estimates[step_key]
+        return self.estimates.get(agent_key, self.default)
+
+    def observe(self, step: Dict[str, Any], seconds: float):
+        """记录一次实际耗时"""
+        for key in self._keys(step):
+            previous = self.estimates.get(key)
+            if previous is None:
+                self.estimates[key] = seconds
+            else:
+                self.estimates[key] = previous + self.alpha * (seconds - previous)
@@ -3,8 +3,11 @@
 """
 
 import asyncio
+import json
+import time
 from typing import Dict, List, Optional, Any
 from openai import AsyncOpenAI
+from agent.core.deadline import run_with_deadline
 from agent.utils.config import config
 from agent.utils.logger import Logger
 
@@ -35,21 +38,127 @@ class CoreLLMEngine:
         top_p: Optional[float] = None,
         **kwargs
     ) -> str:
-        """生成文本响应"""
+        """生成文本响应（受请求截止时间和单次调用超时约束）"""
         try:
-            response = await self.client.chat.completions.create(
+            message = await self._complete(messages, temperature, max_tokens, top_p, **kwargs)
+            return message.content or ""
+        except Exception as e:
+            logger.error(f"LLM生成失败: {e}")
+            raise
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """调用补全接口，返回响应消息"""
+        response = await run_with_deadline(
+            self.client.chat.completions.create(
                 model=self.api_config['model'],
                 messages=messages,
                 temperature=temperature or config.DEFAULT_TEMPERATURE,
                 max_tokens=max_tokens or config.DEFAULT_MAX_TOKENS,
                 top_p=top_p or config.DEFAULT_TOP_P,
                 **kwargs
+            ),
+            config.LLM_TIMEOUT_SECONDS or None
+        )
+        return response.choices[0].message
+
+    async def generate_with_tools(
+        self,
+        messages: List[Dict[str, Any]],
+        registry: Optional[Any] = None,
+        max_steps: Optional[int] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """工具调用循环：模型返回tool_calls时并发执行工具并回填结果，直到给出最终回答"""
+        if registry is None:
+            from agent.tools.registry import get_tool_registry
+            registry = get_tool_registry()
+
+        max_steps = max_steps or config.TOOL_LOOP_MAX_STEPS
+        messages = list(messages)
+        tools = registry.get_definitions()
+        iterations = []
+        started = time.monotonic()
+
+        for step in range(max_steps + 1):
+            # 达到步数上限后禁止继续调用工具，要求模型直接回答
+            tool_choice = 'auto' if step < max_steps else 'none'
+
+            llm_started = time.monotonic()
+            try:
+                message = await self._complete(messages, tools=tools, tool_choice=tool_choice, **kwargs)
+            except Exception as e:
+                logger.error(f"工具调用循环失败: {e}")
+                raise
+            llm_seconds = time.monotonic() - llm_started
+
+            if not message.tool_calls:
+                iterations.append({'iteration': step + 1, 'llm_seconds': llm_seconds,
+                                   'tool_seconds': 0.0, 'tool_calls': []})
+                break
+
+            messages.append({
+                'role': 'assistant',
+                'content': message.content,
+                'tool_calls': [
+                    {
+                        'id': call.id,
+                        'type': 'function',
+                        'function': {'name': call.function.name, 'arguments': call.function.arguments}
+                    }
+                    for call in message.tool_calls
+                ]
+            })
+
+            tool_started = time.monotonic()
+            calls = await asyncio.gather(
+                *(self._call_tool(registry, call) for call in message.tool_calls)
             )
+            tool_seconds = time.monotonic() - tool_started
+
+            for call, record in zip(message.tool_calls, calls):
+                messages.append({'role': 'tool', 'tool_call_id': call.id, 'content': record.pop('content')})
+
+            iterations.append({'iteration': step + 1, 'llm_seconds': llm_seconds,
+                               'tool_seconds': tool_seconds, 'tool_calls': calls})
+            logger.debug(f"工具调用第{step + 1}轮: {len(calls)}个工具, "
+                         f"LLM {llm_seconds:.2f}s, 工具 {tool_seconds:.2f}s")
+
+        return {
+            'content': message.content or "",
+            'messages': messages,
+            'iterations': iterations,
+            'total_seconds': time.monotonic() - started
+        }
+
+    @staticmethod
+    async def _call_tool(registry: Any, call: Any) -> Dict[str, Any]:
+        """执行单个tool_call，错误以文本回填给模型而不是中断循环"""
+        name = call.function.name
+        started = time.monotonic()
+        error = None
 
-            return response.choices[0].message.content or ""
+        try:
+            arguments = json.loads(call.function.arguments or '{}')
+            result = await registry.execute(name, arguments)
+            content = json.dumps(result, ensure_ascii=False, default=str)
+        except json.JSONDecodeError as e:
+            error = f"参数不是合法的JSON: {e}"
+        except asyncio.TimeoutError:
+            error = "工具执行超时"
         except Exception as e:
-            logger.error(f"LLM生成失败: {e}")
-            raise
+            error = str(e)
+
+        if error is not None:
+            content = json.dumps({'error': error}, ensure_ascii=False)
+
+        return {'name': name, 'seconds': time.monotonic() - started, 'error': error, 'content': content}
 
     async def generate_structured(
         self,
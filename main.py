@@ -13,6 +13,7 @@ from dotenv import load_dotenv
 # 加载环境变量
 load_dotenv()
 
+from agent.core.deadline import deadline_scope
 from agent.core.llm import CoreLLMEngine, core_llm
 from agent.core.memory import MemoryStore, memory_store
 from agent.agents.monitor import CustomerMonitorAgent
@@ -247,24 +248,26 @@ async def main():
     """主函数"""
     system = SuiAgentSystem()
 
-    # 检查命令行参数
-    import sys
-    if len(sys.argv) > 1:
-        task = sys.argv[1]
-        await system.initialize()
-
-        if task == 'task1':
-            await system.demo_level1()
-        elif task == 'task2':
-            await system.demo_level2()
-        elif task == 'task3':
-            await system.demo_level3()
+    # 请求级截止时间，向下传递到所有Agent、LLM调用和工具
+    with deadline_scope(config.REQUEST_TIMEOUT_SECONDS or None):
+        # 检查命令行参数
+        import sys
+        if len(sys.argv) > 1:
+            task = sys.argv[1]
+            await system.initialize()
+
+            if task == 'task1':
+                await system.demo_level1()
+            elif task == 'task2':
+                await system.demo_level2()
+            elif task == 'task3':
+                await system.demo_level3()
+            else:
+                logger.error(f"未知任务: {task}")
+                logger.info("用法: python main.py [task1|task2|task3]")
         else:
-            logger.error(f"未知任务: {task}")
-            logger.info("用法: python main.py [task1|task2|task3]")
-    else:
-        # 运行所有演示
-        await system.run_all_demos()
+            # 运行所有演示
+            await system.run_all_demos()
 
 
 if __name__ == "__main__":
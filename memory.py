@@ -3,8 +3,14 @@
 """
 
 import asyncio
+import heapq
+import math
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+from agent.core.bm25 import BM25Index
+from agent.core.cold_store import ColdMemoryTier
+from agent.core.memory_stats import MemoryStats, memory_size
 from agent.utils.config import config
 from agent.utils.logger import Logger
 
@@ -20,6 +26,12 @@ except ImportError:
 
 logger = Logger(__name__)
 
+# 倒数排名融合（RRF）的平滑常数
+RRF_K = 60
+
+# 超出RAM预算时淘汰到预算的该比例，避免频繁淘汰
+EVICTION_TARGET_RATIO = 0.9
+
 
 class MemoryStore:
     """持久化记忆库"""
@@ -28,13 +40,50 @@ class MemoryStore:
         """初始化记忆库"""
         self.chroma_client = None
         self.collection = None
-        self.relational_memory: Dict[str, Dict[str, Any]] = {}
+        self.relational_memory: Dict[str, Dict[str, Any]] = {}  # 热数据
+        self.keyword_index = BM25Index()
+        self.stats = MemoryStats()
+
+        # 分层存储：热数据常驻内存，超出预算的冷数据落盘
+        self.ram_budget = int(config.MEMORY_RAM_BUDGET_MB * 1024 * 1024)
+        self.cold_tier: Optional[ColdMemoryTier] = None
+        self.cold_ids = set()
+        self.hot_bytes = 0
+        self._hot_sizes: Dict[str, int] = {}
+        # 淘汰优先级（越小越先淘汰）与按优先级排序的小顶堆，堆中过期条目在弹出时跳过
+        self._priority: Dict[str, float] = {}
+        self._eviction_heap: List[tuple] = []
+        # 冷存储在首次读写记忆时才打开，导入模块不触碰磁盘
+        self._cold_pending = self.ram_budget > 0
 
         if CHROMA_AVAILABLE:
             self._init_chroma()
         else:
             logger.warning("ChromaDB不可用，将使用纯内存模式")
 
+    def _ensure_cold_tier(self):
+        if self._cold_pending:
+            self._cold_pending = False
+            self._init_cold_tier()
+
+    def _init_cold_tier(self):
+        """初始化冷存储并恢复索引（内容不载入内存）"""
+        try:
+            self.cold_tier = ColdMemoryTier(config.MEMORY_COLD_STORE_PATH)
+        except Exception as e:
+            logger.warning(f"冷存储初始化失败，将不限制内存: {e}")
+            return
+
+        for memory in self.cold_tier.iter_all():
+            self.cold_ids.add(memory['id'])
+            self.keyword_index.add(memory['id'], memory['content'])
+            self.stats.record_add(memory)
+
+        logger.info(
+            f"冷存储初始化成功: 预算 {config.MEMORY_RAM_BUDGET_MB}MB, "
+            f"恢复 {len(self.cold_ids)} 条记忆"
+        )
+
     def _init_chroma(self):
         """初始化ChromaDB客户端"""
         try:
@@ -58,6 +107,7 @@ class MemoryStore:
         importance: float = 0.5
     ) -> str:
         """添加记忆"""
+        self._ensure_cold_tier()
         memory_id = f"mem_{datetime.now().timestamp()}_{hash(content)}"
 
         memory = {
@@ -72,7 +122,10 @@ class MemoryStore:
         }
 
         # 存储到关系型记忆
-        self.relational_memory[memory_id] = memory
+        size = memory_size(memory)
+        self._admit(memory, size)
+        self.keyword_index.add(memory_id, content)
+        self.stats.record_add(memory, size)
 
         # 存储到向量数据库
         if self.collection:
@@ -88,65 +141,217 @@ class MemoryStore:
         logger.debug(f"记忆已添加: {memory_id}")
         return memory_id
 
+    async def add_many(self, records: List[Dict[str, Any]]) -> List[str]:
+        """批量添加记忆（整批一次写入向量库）
+
+        每条记录包含content，可选id、metadata、importance、timestamp、embedding。
+        """
+        return await self.add_columns(
+            [record['content'] for record in records],
+            ids=[record.get('id') for record in records],
+            metadatas=[record.get('metadata') for record in records],
+            importances=[record.get('importance') for record in records],
+            timestamps=[record.get('timestamp') for record in records],
+            embeddings=[record.get('embedding') for record in records]
+        )
+
+    async def add_columns(
+        self,
+        contents: List[str],
+        ids: Optional[List[Optional[str]]] = None,
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+        importances: Optional[List[Optional[float]]] = None,
+        timestamps: Optional[List[Optional[datetime]]] = None,
+        embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[str]:
+        """按列批量添加记忆：关键词索引、统计和向量库整批更新
+
+        除contents外各列可省略或含None（取默认值）；同一批内ID重复时保留最后一条。
+        """
+        self._ensure_cold_tier()
+        now = datetime.now()
+        count = len(contents)
+        ids = ids or [None] * count
+        metadatas = metadatas or [None] * count
+        importances = importances or [None] * count
+        timestamps = timestamps or [None] * count
+        embeddings = embeddings or [None] * count
+
+        memories = []
+        for content, memory_id, metadata, importance, timestamp in zip(
+            contents, ids, metadatas, importances, timestamps
+        ):
+            if importance is None:
+                importance = 0.5
+            timestamp = timestamp or now
+            memories.append({
+                'id': memory_id or f"mem_{timestamp.timestamp()}_{hash(content)}",
+                'content': content,
+                'metadata': {
+                    **(metadata or {}),
+                    'importance': importance,
+                    'timestamp': timestamp.isoformat()
+                },
+                'timestamp': timestamp
+            })
+
+        positions = {memory['id']: position for position, memory in enumerate(memories)}
+        if len(positions) < count:
+            kept = sorted(positions.values())
+            memories = [memories[position] for position in kept]
+            embeddings = [embeddings[position] for position in kept]
+
+        # 相同ID视为覆盖
+        for memory_id in positions:
+            if memory_id in self.relational_memory or memory_id in self.cold_ids:
+                self._remove(memory_id)
+
+        sizes = [memory_size(memory) for memory in memories]
+        for memory, size in zip(memories, sizes):
+            self._admit(memory, size)
+        self.keyword_index.add_many([memory['id'] for memory in memories], [memory['content'] for memory in memories])
+        self.stats.record_add_many(memories, sizes)
+
+        if self.collection and memories:
+            vector_args = {
+                'ids': [memory['id'] for memory in memories],
+                'documents': [memory['content'] for memory in memories],
+                'metadatas': [memory['metadata'] for memory in memories]
+            }
+            if all(embedding is not None for embedding in embeddings):
+                vector_args['embeddings'] = embeddings
+
+            try:
+                self.collection.add(**vector_args)
+            except Exception as e:
+                logger.warning(f"向量批量存储失败: {e}")
+
+        logger.debug(f"批量添加记忆: {len(memories)} 条")
+        return [memory['id'] for memory in memories]
+
+    def iter_memories(self) -> Iterator[Dict[str, Any]]:
+        """遍历全部记忆（冷数据不换入）"""
+        self._ensure_cold_tier()
+        yield from list(self.relational_memory.values())
+
+        if self.cold_tier:
+            for memory in self.cold_tier.iter_all():
+                if memory['id'] not in self.relational_memory:
+                    yield memory
+
     async def semantic_search(
         self,
         query: str,
         limit: int = 10,
-        min_importance: float = 0.0
+        min_importance: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
-        """语义检索"""
+        """混合检索：BM25关键词 + 向量语义，RRF融合"""
+        self._ensure_cold_tier()
+
+        def predicate(memory_id: str) -> bool:
+            metadata = self._peek_metadata(memory_id)
+            return metadata is not None and self._match_filters(
+                metadata, min_importance, filters
+            )
+
+        # 关键词检索（过滤条件在打分前生效）
+        keyword_ids = [
+            memory_id for memory_id, _ in
+            self.keyword_index.search(query, limit, predicate)
+        ]
+
+        # 向量检索（过滤条件下推到索引查询）
+        vector_ids = [
+            memory_id for memory_id in
+            self._vector_search(query, limit, min_importance, filters)
+            if predicate(memory_id)
+        ]
+
+        ranked_ids = _reciprocal_rank_fusion([vector_ids, keyword_ids])
+
+        memories = [self._load(memory_id) for memory_id in ranked_ids[:limit]]
+
+        logger.debug(
+            f"语义检索完成，找到 {len(memories)} 条记忆 "
+            f"(向量 {len(vector_ids)}, 关键词 {len(keyword_ids)})"
+        )
+        return memories
+
+    def _vector_search(
+        self,
+        query: str,
+        limit: int,
+        min_importance: float,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[str]:
+        """向量检索，返回按相似度排序的记忆ID"""
         if not self.collection:
             return []
 
+        query_args = {'query_texts': [query], 'n_results': limit}
+        where = _build_where(min_importance, filters)
+        if where:
+            query_args['where'] = where
+
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=limit * 2  # 获取更多候选，然后过滤
-            )
+            results = self.collection.query(**query_args)
         except Exception as e:
             logger.error(f"语义检索失败: {e}")
             return []
 
-        memories = []
-        if results['ids'] and results['ids'][0]:
-            for i in range(len(results['ids'][0])):
-                memory_id = results['ids'][0][i]
-                metadata = results['metadatas'][0][i]
+        if not results['ids'] or not results['ids'][0]:
+            return []
+        return list(results['ids'][0])
 
-                # 检查重要性阈值
-                if metadata.get('importance', 0) < min_importance:
-                    continue
+    @staticmethod
+    def _match_filters(
+        metadata: Dict[str, Any],
+        min_importance: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """检查元数据是否满足重要性阈值和过滤条件"""
+        if metadata.get('importance', 0) < min_importance:
+            return False
 
-                memory = self.relational_memory.get(memory_id)
-                if memory:
-                    memories.append(memory)
+        for key, value in (filters or {}).items():
+            if metadata.get(key) != value:
+                return False
 
-        logger.debug(f"语义检索完成，找到 {len(memories)} 条记忆")
-        return memories[:limit]
+        return True
 
     async def search_by_metadata(
         self,
         filters: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
         """按元数据检索"""
+        self._ensure_cold_tier()
         results = []
 
         for memory in self.relational_memory.values():
-            match = True
-            for key, value in filters.items():
-                if memory['metadata'].get(key) != value:
-                    match = False
-                    break
-
-            if match:
+            if self._match_filters(memory['metadata'], filters=filters):
                 results.append(memory)
 
+        if self.cold_tier:
+            for memory in self.cold_tier.find_by_metadata(filters):
+                if memory['id'] not in self.relational_memory:
+                    results.append(memory)
+
         logger.debug(f"元数据检索完成，找到 {len(results)} 条记忆")
         return results
 
     async def get(self, memory_id: str) -> Optional[Dict[str, Any]]:
-        """获取记忆"""
-        return self.relational_memory.get(memory_id)
+        """获取记忆（冷数据自动换入）"""
+        self._ensure_cold_tier()
+        return self._load(memory_id)
+
+    async def delete(self, memory_id: str) -> bool:
+        """删除记忆"""
+        self._ensure_cold_tier()
+        deleted = self._remove(memory_id)
+        if deleted:
+            logger.debug(f"记忆已删除: {memory_id}")
+        return deleted
 
     async def cleanup_old_memories(
         self,
@@ -154,6 +359,7 @@ class MemoryStore:
         min_importance: float = 0.3
     ) -> int:
         """清理旧记忆"""
+        self._ensure_cold_tier()
         cutoff = datetime.now() - timedelta(days=days)
         deleted_count = 0
 
@@ -162,32 +368,179 @@ class MemoryStore:
                 memory['timestamp'] < cutoff and
                 memory['metadata'].get('importance', 0) < min_importance
             ):
-                del self.relational_memory[memory_id]
-
-                if self.collection:
-                    try:
-                        self.collection.delete(ids=[memory_id])
-                    except Exception as e:
-                        logger.warning(f"向量删除失败: {e}")
-
+                self._remove(memory_id)
                 deleted_count += 1
 
+        if self.cold_tier:
+            for memory_id in self.cold_tier.find_expired(cutoff, min_importance):
+                if self._remove(memory_id):
+                    deleted_count += 1
+
         logger.info(f"清理旧记忆完成，删除 {deleted_count} 条")
         return deleted_count
 
-    def get_stats(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        by_importance = {}
+    def _remove(self, memory_id: str) -> bool:
+        """从各级存储和索引中移除记忆"""
+        memory = self.relational_memory.pop(memory_id, None)
+        if memory is not None:
+            self.hot_bytes -= self._hot_sizes.pop(memory_id)
+            self._priority.pop(memory_id, None)
 
-        for memory in self.relational_memory.values():
-            importance = memory['metadata'].get('importance', 0.5)
-            key = f"{importance:.1f}"
-            by_importance[key] = by_importance.get(key, 0) + 1
+        if memory_id in self.cold_ids:
+            if memory is None:
+                memory = self.cold_tier.get(memory_id)
+            self.cold_tier.delete(memory_id)
+            self.cold_ids.discard(memory_id)
+
+        if memory is None:
+            return False
+
+        self.keyword_index.remove(memory_id)
+        self.stats.record_remove(memory)
+
+        if self.collection:
+            try:
+                self.collection.delete(ids=[memory_id])
+            except Exception as e:
+                logger.warning(f"向量删除失败: {e}")
+
+        return True
 
-        return {
-            'total': len(self.relational_memory),
-            'by_importance': by_importance
+    def _admit(self, memory: Dict[str, Any], size: Optional[int] = None):
+        """放入热数据层，超出预算时淘汰"""
+        memory_id = memory['id']
+        if memory_id not in self.relational_memory:
+            if size is None:
+                size = memory_size(memory)
+            self._hot_sizes[memory_id] = size
+            self.hot_bytes += size
+
+        self.relational_memory[memory_id] = memory
+        self._touch(memory_id)
+
+        if self.cold_tier and self.hot_bytes > self.ram_budget:
+            self._evict()
+
+    def _touch(self, memory_id: str):
+        """记录访问，更新淘汰优先级
+
+        得分 importance * 0.5^(idle/half_life) 取对数后为
+        log(importance) + last_access*ln2/half_life 减去与记忆无关的常数，
+        因此优先级只需在访问时计算一次，相对顺序不随时间变化。
+        """
+        if self.ram_budget <= 0:
+            return
+        importance = self.relational_memory[memory_id]['metadata'].get('importance', 0.5)
+        half_life = config.MEMORY_DECAY_HALF_LIFE_HOURS * 3600
+        priority = math.log(max(importance, 1e-9)) + time.time() * math.log(2) / half_life
+        self._priority[memory_id] = priority
+        heapq.heappush(self._eviction_heap, (priority, memory_id))
+
+        # 过期条目过多时重建堆
+        if len(self._eviction_heap) > 2 * len(self._priority) + 1024:
+            self._eviction_heap = [(value, key) for key, value in self._priority.items()]
+            heapq.heapify(self._eviction_heap)
+
+    def _evict(self):
+        """按LRU+重要性衰减得分淘汰热数据到冷存储"""
+        target = self.ram_budget * EVICTION_TARGET_RATIO
+        victims = []
+        while self.hot_bytes > target and self._eviction_heap:
+            priority, memory_id = heapq.heappop(self._eviction_heap)
+            if self._priority.get(memory_id) != priority:
+                continue
+            del self._priority[memory_id]
+            victims.append(memory_id)
+            self.hot_bytes -= self._hot_sizes[memory_id]
+
+        # 记忆内容不可变，已在冷存储中的无需重复写入
+        self.cold_tier.put_many([
+            self.relational_memory[memory_id]
+            for memory_id in victims if memory_id not in self.cold_ids
+        ])
+
+        for memory_id in victims:
+            self.cold_ids.add(memory_id)
+            del self.relational_memory[memory_id]
+            del self._hot_sizes[memory_id]
+
+        logger.debug(f"淘汰 {len(victims)} 条记忆到冷存储")
+
+    def _load(self, memory_id: str) -> Optional[Dict[str, Any]]:
+        """读取记忆，冷数据换入热数据层"""
+        memory = self.relational_memory.get(memory_id)
+        if memory is not None:
+            self._touch(memory_id)
+            return memory
+
+        if memory_id not in self.cold_ids:
+            return None
+
+        memory = self.cold_tier.get(memory_id)
+        if memory is not None:
+            self._admit(memory)
+        return memory
+
+    def _peek_metadata(self, memory_id: str) -> Optional[Dict[str, Any]]:
+        """读取元数据，不换入冷数据"""
+        memory = self.relational_memory.get(memory_id)
+        if memory is not None:
+            return memory['metadata']
+        if memory_id in self.cold_ids:
+            return self.cold_tier.get_metadata(memory_id)
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息（增量维护，O(1)）"""
+        self._ensure_cold_tier()
+        stats = self.stats.snapshot()
+        stats['tiers'] = {
+            'hot': len(self.relational_memory),
+            'cold': stats['total'] - len(self.relational_memory),
+            'hot_bytes': self.hot_bytes,
+            'ram_budget_bytes': self.ram_budget,
         }
+        return stats
+
+    def subscribe_stats(self, maxsize: int = 1000) -> asyncio.Queue:
+        """订阅统计增量推送"""
+        return self.stats.subscribe(maxsize)
+
+    def unsubscribe_stats(self, queue: asyncio.Queue):
+        """取消统计订阅"""
+        self.stats.unsubscribe(queue)
+
+
+def _build_where(
+    min_importance: float,
+    filters: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """构建ChromaDB的where过滤条件（仅下推标量等值条件）"""
+    clauses = []
+
+    if min_importance > 0:
+        clauses.append({'importance': {'$gte': min_importance}})
+
+    for key, value in (filters or {}).items():
+        if isinstance(value, (str, int, float, bool)):
+            clauses.append({key: {'$eq': value}})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {'$and': clauses}
+
+
+def _reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """倒数排名融合多路检索结果"""
+    scores: Dict[str, float] = {}
+
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+
+    return sorted(scores, key=scores.get, reverse=True)
 
 
 # 全局实例
@@ -0,0 +1,207 @@
+"""
+记忆库列式导入导出 - Arrow/Parquet分块流式处理
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from agent.core.memory import MemoryStore, memory_store
+from agent.utils.logger import Logger
+
+# PyArrow导入（可选依赖）
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    pa = None
+    pc = None
+    pa_ipc = None
+    pq = None
+
+
+logger = Logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# 固定列；其余列导入时并入metadata
+_RESERVED_COLUMNS = {'id', 'content', 'metadata', 'importance', 'timestamp', 'embedding'}
+
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ImportError("列式导入导出需要安装pyarrow: pip install pyarrow")
+
+
+def _is_ipc(path: str) -> bool:
+    return Path(path).suffix.lower() in ('.arrow', '.feather', '.ipc')
+
+
+def _schema(include_embeddings: bool):
+    fields = [
+        pa.field('id', pa.string()),
+        pa.field('content', pa.string()),
+        pa.field('metadata', pa.string()),
+        pa.field('importance', pa.float64()),
+        pa.field('timestamp', pa.timestamp('us')),
+    ]
+    if include_embeddings:
+        fields.append(pa.field('embedding', pa.list_(pa.float32())))
+    return pa.schema(fields)
+
+
+def _chunks(memories: Iterator[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for memory in memories:
+        chunk.append(memory)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _fetch_embeddings(store: MemoryStore, ids: List[str]) -> List[Optional[List[float]]]:
+    """从向量库批量读取向量"""
+    if not store.collection:
+        return [None] * len(ids)
+
+    try:
+        result = store.collection.get(ids=ids, include=['embeddings'])
+    except Exception as e:
+        logger.warning(f"向量读取失败: {e}")
+        return [None] * len(ids)
+
+    by_id = dict(zip(result['ids'], result['embeddings']))
+    return [
+        list(by_id[memory_id]) if by_id.get(memory_id) is not None else None
+        for memory_id in ids
+    ]
+
+
+async def export_memories(
+    path: str,
+    store: Optional[MemoryStore] = None,
+    include_embeddings: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """导出记忆到Parquet（或按扩展名导出Arrow IPC），返回导出条数"""
+    _require_pyarrow()
+    store = store or memory_store
+    schema = _schema(include_embeddings)
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if _is_ipc(path):
+        writer = pa_ipc.new_file(path, schema)
+    else:
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+
+    exported = 0
+    try:
+        for chunk in _chunks(store.iter_memories(), chunk_size):
+            ids = [memory['id'] for memory in chunk]
+            columns = {
+                'id': ids,
+                'content': [memory['content'] for memory in chunk],
+                'metadata': [
+                    json.dumps(memory['metadata'], ensure_ascii=False, default=str)
+                    for memory in chunk
+                ],
+                'importance': [memory['metadata'].get('importance', 0.5) for memory in chunk],
+                'timestamp': [memory['timestamp'] for memory in chunk],
+            }
+            if include_embeddings:
+                columns['embedding'] = _fetch_embeddings(store, ids)
+
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            exported += len(chunk)
+
+            # 每个分块让出事件循环
+            await asyncio.sleep(0)
+    finally:
+        writer.close()
+
+    logger.info(f"记忆导出完成: {exported} 条 -> {path}")
+    return exported
+
+
+def _iter_batches(path: str, chunk_size: int):
+    if _is_ipc(path):
+        reader = pa_ipc.open_file(path)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(offset, chunk_size)
+    else:
+        yield from pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+
+
+def _parse_metadata(column) -> List[Optional[Dict[str, Any]]]:
+    """metadata列转为字典列表（JSON字符串列整列拼成一个数组一次解析）"""
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        texts = pc.fill_null(column, 'null').to_pylist()
+        return json.loads('[' + ','.join(texts) + ']')
+    return column.to_pylist()
+
+
+def _batch_to_columns(batch) -> Dict[str, List[Any]]:
+    """按列转换一个批次为 MemoryStore.add_columns 的参数"""
+    names = batch.schema.names
+    if 'content' not in names:
+        raise ValueError("导入数据缺少content列")
+
+    columns: Dict[str, List[Any]] = {'contents': batch.column('content').to_pylist()}
+    if 'id' in names:
+        columns['ids'] = batch.column('id').to_pylist()
+    if 'importance' in names:
+        columns['importances'] = batch.column('importance').cast(pa.float64()).to_pylist()
+    if 'timestamp' in names:
+        timestamps = batch.column('timestamp')
+        if not pa.types.is_timestamp(timestamps.type):
+            # ISO 8601字符串由Arrow整列解析
+            timestamps = timestamps.cast(pa.timestamp('us'))
+        columns['timestamps'] = timestamps.to_pylist()
+    if 'embedding' in names:
+        columns['embeddings'] = batch.column('embedding').to_pylist()
+
+    metadatas = _parse_metadata(batch.column('metadata')) if 'metadata' in names else None
+
+    # 额外列作为元数据字段（非空值覆盖metadata列中的同名字段）
+    extra = [name for name in names if name not in _RESERVED_COLUMNS]
+    if extra:
+        rows = batch.select(extra).to_pylist()
+        if metadatas is None:
+            metadatas = [{key: value for key, value in row.items() if value is not None} for row in rows]
+        else:
+            metadatas = [
+                {**(metadata or {}), **{key: value for key, value in row.items() if value is not None}}
+                for metadata, row in zip(metadatas, rows)
+            ]
+    if metadatas is not None:
+        columns['metadatas'] = metadatas
+
+    return columns
+
+
+async def import_memories(
+    path: str,
+    store: Optional[MemoryStore] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """从Parquet/Arrow文件分块批量导入记忆，返回导入条数"""
+    _require_pyarrow()
+    store = store or memory_store
+
+    imported = 0
+    for batch in _iter_batches(path, chunk_size):
+        imported += len(await store.add_columns(**_batch_to_columns(batch)))
+        logger.debug(f"记忆导入进度: {imported} 条")
+
+        await asyncio.sleep(0)
+
+    logger.info(f"记忆导入完成: {imported} 条 <- {path}")
+    return imported
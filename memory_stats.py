@@ -0,0 +1,212 @@
+"""
+记忆库增量统计 - 增删时维护计数器，支持增量推送
+"""
+
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 年龄分桶（上界，单位：小时）
+AGE_BUCKETS: List[Tuple[str, float]] = [
+    ('<1h', 1),
+    ('<1d', 24),
+    ('<7d', 24 * 7),
+    ('<30d', 24 * 30),
+    ('>=30d', float('inf')),
+]
+
+# 不统计基数的元数据字段（每条记忆都不同）
+_CARDINALITY_EXCLUDED = {'timestamp'}
+
+
+def _hour_of(timestamp: datetime) -> int:
+    return int(timestamp.timestamp() // 3600)
+
+
+def _age_bucket(age_hours: int) -> str:
+    for name, upper in AGE_BUCKETS:
+        if age_hours < upper:
+            return name
+    return AGE_BUCKETS[-1][0]
+
+
+def _value_key(value: Any) -> Any:
+    """元数据取值转为可哈希的键"""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+_metadata_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def memory_size(memory: Dict[str, Any]) -> int:
+    """估算单条记忆的字节数（内容+元数据）"""
+    metadata = _metadata_encoder.encode(memory['metadata'])
+    return len(memory['content'].encode('utf-8')) + len(metadata.encode('utf-8'))
+
+
+class MemoryStats:
+    """记忆库增量统计"""
+
+    def __init__(self):
+        """初始化计数器"""
+        self.total = 0
+        self.size_bytes = 0
+        self.by_importance: Dict[str, int] = {}
+        self.metadata_values: Dict[str, Dict[Any, int]] = {}
+        self.metadata_cardinality: Dict[str, int] = {}
+
+        # 按创建小时计数；年龄分桶在跨小时时重算一次
+        self.hour_counts: Dict[int, int] = {}
+        self.by_age: Dict[str, int] = {name: 0 for name, _ in AGE_BUCKETS}
+        self._age_hour = _hour_of(datetime.now())
+
+        self._subscribers: List[asyncio.Queue] = []
+
+    def record_add(self, memory: Dict[str, Any], size: Optional[int] = None):
+        """记录新增记忆"""
+        if size is None:
+            size = memory_size(memory)
+        self._apply(memory, 1, size)
+        self._publish('add', memory, size)
+
+    def record_add_many(self, memories: List[Dict[str, Any]], sizes: List[int]):
+        """批量记录新增记忆：先按批聚合计数，再一次合并进计数器"""
+        self._refresh_age_buckets()
+        importances: Counter = Counter()
+        values_by_key: Dict[str, Counter] = {}
+        hours: Counter = Counter()
+
+        for memory in memories:
+            metadata = memory['metadata']
+            importances[f"{metadata.get('importance', 0.5):.1f}"] += 1
+            for key, value in metadata.items():
+                if key in _CARDINALITY_EXCLUDED:
+                    continue
+                counts = values_by_key.get(key)
+                if counts is None:
+                    counts = values_by_key[key] = Counter()
+                counts[_value_key(value)] += 1
+            hours[_hour_of(memory['timestamp'])] += 1
+
+        self.total += len(memories)
+        self.size_bytes += sum(sizes)
+        for importance_key, count in importances.items():
+            self._bump(self.by_importance, importance_key, count)
+        for key, counts in values_by_key.items():
+            values = self.metadata_values.setdefault(key, {})
+            before = len(values)
+            for value_key, count in counts.items():
+                self._bump(values, value_key, count)
+            if len(values) != before:
+                self._bump(self.metadata_cardinality, key, len(values) - before)
+        for hour, count in hours.items():
+            self._bump(self.hour_counts, hour, count)
+            self._bump(self.by_age, _age_bucket(self._age_hour - hour), count, keep_zero=True)
+
+        if self._subscribers:
+            for memory, size in zip(memories, sizes):
+                self._publish('add', memory, size)
+
+    def record_remove(self, memory: Dict[str, Any]):
+        """记录删除记忆"""
+        size = memory_size(memory)
+        self._apply(memory, -1, size)
+        self._publish('remove', memory, size)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取当前统计（与记忆数量无关）"""
+        self._refresh_age_buckets()
+
+        return {
+            'total': self.total,
+            'by_importance': dict(self.by_importance),
+            'size_bytes': self.size_bytes,
+            'metadata_cardinality': dict(self.metadata_cardinality),
+            'by_age': dict(self.by_age),
+        }
+
+    def subscribe(self, maxsize: int = 1000) -> asyncio.Queue:
+        """订阅统计增量，队列满时丢弃最旧的增量"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """取消订阅"""
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def _apply(self, memory: Dict[str, Any], sign: int, size: int):
+        """按符号更新全部计数器"""
+        self._refresh_age_buckets()
+        metadata = memory['metadata']
+
+        self.total += sign
+        self.size_bytes += sign * size
+
+        importance_key = f"{metadata.get('importance', 0.5):.1f}"
+        self._bump(self.by_importance, importance_key, sign)
+
+        for key, value in metadata.items():
+            if key in _CARDINALITY_EXCLUDED:
+                continue
+
+            values = self.metadata_values.setdefault(key, {})
+            value_key = _value_key(value)
+            before = len(values)
+            self._bump(values, value_key, sign)
+
+            if len(values) != before:
+                self._bump(self.metadata_cardinality, key, len(values) - before)
+            if not values:
+                del self.metadata_values[key]
+
+        hour = _hour_of(memory['timestamp'])
+        self._bump(self.hour_counts, hour, sign)
+        self._bump(self.by_age, _age_bucket(self._age_hour - hour), sign, keep_zero=True)
+
+    def _refresh_age_buckets(self):
+        """跨小时后重算年龄分桶（每小时至多一次）"""
+        current_hour = _hour_of(datetime.now())
+        if current_hour == self._age_hour:
+            return
+
+        self._age_hour = current_hour
+        self.by_age = {name: 0 for name, _ in AGE_BUCKETS}
+        for hour, count in self.hour_counts.items():
+            self.by_age[_age_bucket(current_hour - hour)] += count
+
+    def _publish(self, op: str, memory: Dict[str, Any], size: int):
+        """向订阅者推送增量"""
+        if not self._subscribers:
+            return
+
+        delta = {
+            'op': op,
+            'memory_id': memory['id'],
+            'importance': f"{memory['metadata'].get('importance', 0.5):.1f}",
+            'size_bytes': size,
+            'total': self.total,
+            'total_size_bytes': self.size_bytes,
+            'timestamp': datetime.now().isoformat(),
+        }
+
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(delta)
+
+    @staticmethod
+    def _bump(counter: Dict[Any, int], key: Any, delta: int, keep_zero: bool = False):
+        value = counter.get(key, 0) + delta
+        if value or keep_zero:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
@@ -2,13 +2,78 @@
 Level 1: 智能客服监控Agent
 """
 
+import asyncio
+import copy
 import json
+from typing import Any, Dict, List, Optional
+from agent.core.deadline import check_deadline
 from agent.core.llm import core_llm
+from agent.agents.monitor_anomaly import AnomalyDetector
+from agent.agents.monitor_classifier import FastPathClassifier
+from agent.agents.monitor_cluster import ComplaintClusterer
+from agent.tools.schema import CompiledSchema, ToolArgumentError
+from agent.utils.config import config
 from agent.utils.logger import Logger
+from agent.utils.tokens import estimate_tokens
 
 
 logger = Logger(__name__)
 
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string"},
+        "sentiment": {"type": "string", "enum": ["positive", "neutral", "negative"]},
+        "category": {"type": "string"},
+        "status": {"type": "string", "enum": ["in_progress", "resolved", "escalated"]},
+        "confidence": {"type": "number"},
+        "alert_reason": {"type": "string"},
+        "recommendedActions": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["intent", "sentiment", "category", "status", "confidence"]
+}
+
+BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                **ANALYSIS_SCHEMA,
+                "properties": {"id": {"type": "string"}, **ANALYSIS_SCHEMA["properties"]},
+                "required": ["id"] + ANALYSIS_SCHEMA["required"]
+            }
+        }
+    },
+    "required": ["results"]
+}
+
+_ANALYSIS_DIMENSIONS = """请从以下维度进行分析：
+1. 用户意图识别（intent类别）
+2. 情绪分析（positive/neutral/negative）
+3. 问题分类（category）
+4. 解决状态判断（in_progress/resolved/escalated）
+5. 如果给出了检测到的指标异常，结合对话说明可能的原因（alert_reason，无异常时留空）
+6. 推荐的应对措施（recommendedActions数组）"""
+
+# 批量请求中每段对话的格式开销（编号、分隔符）
+_ITEM_OVERHEAD_TOKENS = 12
+
+
+def format_conversation(user_query: str, ai_response: str, system_state: dict, anomalies: str = '') -> str:
+    """对话与系统状态的提示词片段"""
+    anomaly_section = f"\n\n检测到的指标异常：{anomalies}" if anomalies else ''
+    return f"""用户查询：{user_query}
+
+AI回答：{ai_response}
+
+系统状态向量：
+- 延迟：{system_state['latency']}ms
+- 错误率：{system_state['error_rate']*100}%
+- 知识库命中率：{system_state['knowledge_base_hit_rate']*100}%
+- 活跃对话数：{system_state['active_conversations']}
+- 平均响应时间：{system_state['average_response_time']}ms{anomaly_section}"""
+
 
 class CustomerMonitorAgent:
     """智能客服监控Agent"""
@@ -32,63 +97,324 @@ class CustomerMonitorAgent:
 - 预警及时：在问题升级前主动触发告警
 - 持续优化：将每次对话转化为知识库资产"""
 
+        self._item_validator = CompiledSchema('analysis', BATCH_SCHEMA['properties']['results']['items'])
+        # 每条分析结果的输出token数估计，按实际结果指数平滑更新
+        self.item_output_tokens = float(config.MONITOR_ITEM_OUTPUT_TOKENS)
+        self.batch_stats = {'requests': 0, 'packed_items': 0, 'retried_items': 0}
+
+        # 本地快速分类：高置信度的常规对话不调用LLM
+        self.fast_path = FastPathClassifier() if config.MONITOR_FASTPATH_ENABLED else None
+        # 指标流异常检测：告警由检测结果和对话情绪按规则确定，LLM只负责解释
+        self.detector = AnomalyDetector()
+        # 相似查询聚类：同一簇只分析代表对话，结果传播给簇内其他对话
+        self.clusters = ComplaintClusterer() if config.MONITOR_CLUSTER_ENABLED else None
+        self._background: set = set()
+
     async def analyze_conversation(
         self,
         user_query: str,
         ai_response: str,
         system_state: dict
     ) -> dict:
-        """分析单次对话"""
-        prompt = f"""请分析以下客服对话和系统状态，返回结构化分析结果：
+        """分析单次对话（高置信度且未触发告警的常规对话由本地分类器直接给出结果，
+        与近期已分析对话相似的复用其结果）"""
+        assessment = self._assess(user_query, system_state)
+        if assessment['fast_path']:
+            return self._fast_path_result(user_query, ai_response, system_state, assessment)
+        if assessment['follower']:
+            return await self._follow(user_query, ai_response, system_state, assessment)
 
-用户查询：{user_query}
+        analysis: Any = None
+        try:
+            analysis = await self._analyze_with_llm(user_query, ai_response, system_state, assessment)
+            return analysis
+        except Exception as e:
+            analysis = e
+            raise
+        finally:
+            self._publish(assessment, analysis)
 
-AI回答：{ai_response}
+    def _assess(self, user_query: str, system_state: dict) -> Dict[str, Any]:
+        """更新指标异常检测并做本地分类，判断能否走快速路径；不能时为查询分配相似簇"""
+        signals = self.detector.observe(system_state)
+        prediction = self.fast_path.classify(user_query, system_state) if self.fast_path else None
+        fast_path = (prediction is not None and prediction['fast_path']
+                     and not self.detector.fuse(signals, prediction['labels']))
 
-系统状态向量：
-- 延迟：{system_state['latency']}ms
-- 错误率：{system_state['error_rate']*100}%
-- 知识库命中率：{system_state['knowledge_base_hit_rate']*100}%
-- 活跃对话数：{system_state['active_conversations']}
-- 平均响应时间：{system_state['average_response_time']}ms
+        cluster, follower = None, False
+        if not fast_path and self.clusters is not None:
+            cluster, created = self.clusters.assign(user_query)
+            follower = not created
+        return {'signals': signals, 'prediction': prediction, 'fast_path': fast_path,
+                'cluster': cluster, 'follower': follower}
 
-请从以下维度进行分析：
-1. 用户意图识别（intent类别）
-2. 情绪分析（positive/neutral/negative）
-3. 问题分类（category）
-4. 解决状态判断（in_progress/resolved/escalated）
-5. 判断是否需要触发预警（alert_triggered: boolean）
-6. 如果需要预警，说明原因（alert_reason）
-7. 推荐的应对措施（recommendedActions数组）"""
-
-        schema = {
-            "type": "object",
-            "properties": {
-                "intent": {"type": "string"},
-                "sentiment": {"type": "string", "enum": ["positive", "neutral", "negative"]},
-                "category": {"type": "string"},
-                "status": {"type": "string", "enum": ["in_progress", "resolved", "escalated"]},
-                "confidence": {"type": "number"},
-                "alert_triggered": {"type": "boolean"},
-                "alert_reason": {"type": "string"},
-                "recommendedActions": {"type": "array", "items": {"type": "string"}}
-            },
-            "required": ["intent", "sentiment", "category", "status", "confidence", "alert_triggered"]
+    async def _follow(self, user_query: str, ai_response: str, system_state: dict,
+                      assessment: Dict[str, Any]) -> Dict[str, Any]:
+        """簇内成员：复用代表对话的分析结果，告警按自身的指标信号重新判定"""
+        cluster = assessment['cluster']
+        try:
+            template = await cluster.wait()
+        except Exception as e:
+            logger.warning(f"簇 {cluster.id} 代表对话分析失败，单独分析: {e}")
+            return await self._analyze_with_llm(user_query, ai_response, system_state, assessment)
+
+        analysis = {
+            key: copy.deepcopy(value) for key, value in template.items()
+            if key not in ('alert_triggered', 'alert_rules', 'alert_reason')
         }
+        analysis['source'] = 'cluster'
+        analysis['cluster_id'] = cluster.id
+        return self._apply_alerts(analysis, assessment['signals'])
+
+    @staticmethod
+    def _publish(assessment: Dict[str, Any], analysis: Any):
+        """代表对话分析结束后把结果（或失败）发布给簇内成员"""
+        cluster = assessment['cluster']
+        if cluster is None or assessment['follower']:
+            return
+        if analysis is None:
+            analysis = RuntimeError("代表对话未完成分析")
+        elif isinstance(analysis, dict):
+            analysis['cluster_id'] = cluster.id
+        cluster.resolve(analysis)
+
+    def _fast_path_result(self, user_query: str, ai_response: str, system_state: dict,
+                          assessment: Dict[str, Any]) -> Dict[str, Any]:
+        # 抽样交给LLM复核，统计快速路径与LLM结果的一致率
+        if self.fast_path.should_audit():
+            self._spawn(self._analyze_with_llm(user_query, ai_response, system_state, assessment, source='audit'))
+        return self._apply_alerts(self.fast_path.to_analysis(assessment['prediction']), assessment['signals'])
+
+    def _apply_alerts(self, analysis: Dict[str, Any], signals: Dict[str, Dict[str, Any]],
+                      record: bool = True) -> Dict[str, Any]:
+        """按融合规则确定告警；触发时告警原因为规则说明、异常指标和LLM给出的解释"""
+        fired = self.detector.fuse(signals, analysis)
+        if record:
+            self.detector.record(fired)
+
+        explanation = analysis.get('alert_reason') or ''
+        analysis['alert_triggered'] = bool(fired)
+        analysis['alert_rules'] = [alert['rule'] for alert in fired]
+        analysis['alert_reason'] = ''
+        if fired:
+            anomalies = self.detector.describe(signals)
+            analysis['alert_reason'] = (
+                '；'.join(alert['description'] for alert in fired)
+                + (f"（{anomalies}）" if anomalies else '')
+                + (f"：{explanation}" if explanation else '')
+            )
+        return analysis
+
+    async def _analyze_with_llm(
+        self,
+        user_query: str,
+        ai_response: str,
+        system_state: dict,
+        assessment: Dict[str, Any],
+        source: str = 'escalated'
+    ) -> dict:
+        anomalies = self.detector.describe(assessment['signals'])
+        prompt = f"""请分析以下客服对话和系统状态，返回结构化分析结果：
+
+{format_conversation(user_query, ai_response, system_state, anomalies)}
+
+{_ANALYSIS_DIMENSIONS}"""
 
         messages = [
             {'role': 'system', 'content': self.system_prompt},
             {'role': 'user', 'content': prompt}
         ]
 
-        analysis = await core_llm.generate_structured(messages, schema)
+        analysis = await core_llm.generate_structured(messages, ANALYSIS_SCHEMA)
 
-        logger.info(f"对话分析完成: {analysis['category']}, 情绪: {analysis['sentiment']}")
+        self._apply_alerts(analysis, assessment['signals'], record=source != 'audit')
+        logger.info(f"对话分析完成: {analysis['category']}, 情绪: {analysis['sentiment']}, "
+                    f"告警: {analysis['alert_rules'] or '无'}")
 
+        self._learn(user_query, system_state, analysis, assessment['prediction'], source)
         return analysis
 
+    def _learn(self, user_query: str, system_state: dict, analysis: Dict[str, Any],
+               prediction: Optional[Dict[str, Any]], source: str = 'escalated'):
+        """LLM分析结果作为快速分类器的训练样本，样本在后台线程批量落盘，积累到一定数量后在后台线程重训"""
+        if self.fast_path is None:
+            return
+        if prediction is not None:
+            self.fast_path.compare(source, prediction['labels'], analysis)
+        if self.fast_path.observe(user_query, system_state, analysis):
+            self._spawn(asyncio.to_thread(self.fast_path.train))
+        if self.fast_path.flush_due():
+            self._spawn(asyncio.to_thread(self.fast_path.flush))
+
+    def _spawn(self, awaitable: Any):
+        task = asyncio.ensure_future(awaitable)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def analyze_conversations(
+        self,
+        conversations: List[Dict[str, Any]],
+        return_exceptions: bool = False
+    ) -> List[Any]:
+        """批量分析对话：多段对话打包进一次结构化请求，结果按编号对应回输入
+
+        conversations每项包含 user_query、ai_response、system_state，返回与输入顺序一致的分析结果。
+        每批条数按输入/输出token预算自适应；缺失或不合法的结果逐条重试，return_exceptions为True时
+        重试仍失败的项以异常对象返回，否则抛出第一个异常。
+        与近期对话相似的项等待所在簇的代表对话分析完成后复用其结果。
+        """
+        results: List[Any] = [None] * len(conversations)
+        assessments: List[Dict[str, Any]] = []
+        pending = []
+        followers = []
+        for index, conversation in enumerate(conversations):
+            assessment = self._assess(conversation['user_query'], conversation['system_state'])
+            assessments.append(assessment)
+            if assessment['fast_path']:
+                results[index] = self._fast_path_result(
+                    conversation['user_query'], conversation.get('ai_response', ''),
+                    conversation['system_state'], assessment
+                )
+            elif assessment['follower']:
+                followers.append(index)
+            else:
+                pending.append(index)
+
+        await asyncio.gather(
+            *(self._analyze_representatives(conversations, batch, results, assessments)
+              for batch in self._plan_batches(conversations, pending)),
+            *(self._analyze_single(conversations, index, results, assessments) for index in followers)
+        )
+
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        return results
+
+    def _plan_batches(self, conversations: List[Dict[str, Any]], indices: List[int]) -> List[List[int]]:
+        """按token预算将indices指定的对话贪心分批，返回每批的输入下标"""
+        fixed = (estimate_tokens(self.system_prompt) + estimate_tokens(str(BATCH_SCHEMA))
+                 + estimate_tokens(_ANALYSIS_DIMENSIONS) + 100)
+        input_budget = config.MONITOR_BATCH_INPUT_TOKENS - fixed
+        max_items = max(1, min(
+            config.MONITOR_BATCH_MAX_ITEMS,
+            int(config.MONITOR_BATCH_OUTPUT_TOKENS // self.item_output_tokens)
+        ))
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for index in indices:
+            cost = estimate_tokens(self._format(conversations[index])) + _ITEM_OVERHEAD_TOKENS
+            if current and (len(current) >= max_items or used + cost > input_budget):
+                batches.append(current)
+                current, used = [], 0
+            current.append(index)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _format(conversation: Dict[str, Any], anomalies: str = '') -> str:
+        return format_conversation(
+            conversation['user_query'], conversation.get('ai_response', ''), conversation['system_state'], anomalies
+        )
+
+    async def _analyze_representatives(self, conversations: List[Dict[str, Any]], batch: List[int],
+                                       results: List[Any], assessments: List[Dict[str, Any]]):
+        try:
+            await self._analyze_packed(conversations, batch, results, assessments)
+        finally:
+            for index in batch:
+                self._publish(assessments[index], results[index])
+
+    async def _analyze_packed(self, conversations: List[Dict[str, Any]], batch: List[int],
+                              results: List[Any], assessments: List[Dict[str, Any]]):
+        if len(batch) == 1:
+            await self._analyze_single(conversations, batch[0], results, assessments)
+            return
+
+        sections = '\n\n'.join(
+            f"### 对话 {position}\n"
+            f"{self._format(conversations[index], self.detector.describe(assessments[index]['signals']))}"
+            for position, index in enumerate(batch, 1)
+        )
+        prompt = f"""请逐段分析以下{len(batch)}段客服对话和各自的系统状态，每段对话返回一条结构化分析结果：
+
+{sections}
+
+{_ANALYSIS_DIMENSIONS}
+
+以 {{"results": [...]}} 返回，results中每条结果的id为对应的对话编号（"1"到"{len(batch)}"）。"""
+
+        messages = [
+            {'role': 'system', 'content': self.system_prompt},
+            {'role': 'user', 'content': prompt}
+        ]
+        max_tokens = min(config.MONITOR_BATCH_OUTPUT_TOKENS, int(len(batch) * self.item_output_tokens * 1.5) + 100)
+
+        items: Any = []
+        try:
+            response = await core_llm.generate_structured(messages, BATCH_SCHEMA, max_tokens=max_tokens)
+            items = response.get('results', []) if isinstance(response, dict) else []
+        except ValueError as e:
+            # 输出不是合法JSON（多为超长截断），逐条重试
+            logger.warning(f"批量分析结果解析失败，逐条重试: {e}")
+        except Exception as e:
+            # 调用本身失败（连接、限流等）时逐条重试只会放大请求量
+            logger.error(f"批量分析失败: {e}")
+            for index in batch:
+                results[index] = e
+            return
+
+        matched: Dict[str, Dict[str, Any]] = {}
+        for item in items if isinstance(items, list) else []:
+            try:
+                item = self._item_validator.validate(item)
+            except ToolArgumentError:
+                continue
+            matched.setdefault(item.pop('id').strip(), item)
+
+        retry = []
+        for position, index in enumerate(batch, 1):
+            analysis = matched.get(str(position))
+            if analysis is None:
+                retry.append(index)
+            else:
+                results[index] = self._apply_alerts(analysis, assessments[index]['signals'])
+                conversation = conversations[index]
+                self._learn(conversation['user_query'], conversation['system_state'], analysis,
+                            assessments[index]['prediction'])
+
+        if len(retry) < len(batch):
+            answered = [results[index] for index in batch if index not in retry]
+            measured = estimate_tokens(json.dumps(answered, ensure_ascii=False)) / len(answered)
+            self.item_output_tokens = 0.8 * self.item_output_tokens + 0.2 * measured
+
+        self.batch_stats['requests'] += 1
+        self.batch_stats['packed_items'] += len(batch)
+        self.batch_stats['retried_items'] += len(retry)
+        logger.info(f"批量分析完成: {len(batch) - len(retry)}/{len(batch)} 条, 逐条重试 {len(retry)} 条")
+
+        await asyncio.gather(*(self._analyze_single(conversations, index, results, assessments) for index in retry))
+
+    async def _analyze_single(self, conversations: List[Dict[str, Any]], index: int,
+                              results: List[Any], assessments: List[Dict[str, Any]]):
+        conversation = conversations[index]
+        analyze = self._follow if assessments[index]['follower'] else self._analyze_with_llm
+        try:
+            results[index] = await analyze(
+                conversation['user_query'], conversation.get('ai_response', ''),
+                conversation['system_state'], assessments[index]
+            )
+        except Exception as e:
+            results[index] = e
+
     async def execute(self, input_data: str, context: dict = None) -> dict:
         """执行任务"""
+        check_deadline()
         if context and 'type' == 'single_conversation':
             return await self.analyze_conversation(
                 input_data,
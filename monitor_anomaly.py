@@ -0,0 +1,185 @@
+"""
+系统指标在线异常检测 - 逐指标EWMA/z分数与滑动窗口分位数，结合对话情绪的融合规则确定性地判定告警
+"""
+
+import bisect
+import math
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+# 指标 -> (异常方向, 名称, 单位)
+METRICS = {
+    'latency': ('high', '延迟', 'ms'),
+    'error_rate': ('high', '错误率', ''),
+    'knowledge_base_hit_rate': ('low', '知识库命中率', ''),
+    'average_response_time': ('high', '平均响应时间', 'ms'),
+}
+
+
+class MetricDetector:
+    """单指标检测器：EWMA均值/方差给出z分数，滑动窗口分位数给出经验阈值
+
+    每个新值先与更新前的基线比较再并入基线，异常值不会立刻抬高自身的判定阈值。
+    分位数取自有序窗口的精确值：插入/删除为O(log w)查找加O(w)内存移动，
+    默认窗口500时单次更新约3µs；流式分位数草图（如P²）是O(1)，但无法按窗口淘汰旧值。
+    """
+
+    def __init__(
+        self,
+        direction: str = 'high',
+        alpha: Optional[float] = None,
+        window: Optional[int] = None,
+        z_threshold: Optional[float] = None,
+        quantile: Optional[float] = None,
+        warmup: Optional[int] = None
+    ):
+        """初始化检测器"""
+        self.direction = direction
+        self.alpha = config.MONITOR_ANOMALY_ALPHA if alpha is None else alpha
+        self.z_threshold = config.MONITOR_ANOMALY_Z if z_threshold is None else z_threshold
+        self.quantile = config.MONITOR_ANOMALY_QUANTILE if quantile is None else quantile
+        self.warmup = config.MONITOR_ANOMALY_WARMUP if warmup is None else warmup
+        self.mean: Optional[float] = None
+        self.var = 0.0
+        self.count = 0
+        self._window: deque = deque(maxlen=config.MONITOR_ANOMALY_WINDOW if window is None else window)
+        self._sorted: List[float] = []
+
+    def update(self, value: float) -> Dict[str, Any]:
+        """评估一个新值并更新基线"""
+        signal = self.score(value)
+
+        if self.mean is None:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = self.alpha * diff
+            self.mean += increment
+            self.var = (1 - self.alpha) * (self.var + diff * increment)
+
+        if len(self._window) == self._window.maxlen:
+            oldest = self._window[0]
+            del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+        self._window.append(value)
+        bisect.insort(self._sorted, value)
+        self.count += 1
+        return signal
+
+    def score(self, value: float) -> Dict[str, Any]:
+        """按当前基线评估（不更新）"""
+        if self.mean is None:
+            return {'value': value, 'baseline': None, 'z': 0.0, 'limit': None, 'anomalous': False}
+
+        # 方差接近0的平稳序列用基线的1%作为最小波动，避免微小变化得到极大的z分数
+        std = max(math.sqrt(self.var), abs(self.mean) * 0.01, 1e-9)
+        z = (value - self.mean) / std
+        if self.direction == 'low':
+            z = -z
+
+        q = self.quantile if self.direction == 'high' else 1 - self.quantile
+        limit = self._sorted[min(int(q * len(self._sorted)), len(self._sorted) - 1)]
+        beyond = value > limit if self.direction == 'high' else value < limit
+
+        return {
+            'value': value,
+            'baseline': self.mean,
+            'z': z,
+            'limit': limit,
+            'anomalous': self.count >= self.warmup and z >= self.z_threshold and beyond
+        }
+
+
+def _anomalous(signals: Dict[str, Dict[str, Any]]) -> Set[str]:
+    return {metric for metric, signal in signals.items() if signal['anomalous']}
+
+
+# 融合规则：(名称, 说明, 判定函数(指标信号, 对话标签))
+FUSION_RULES: List[tuple] = [
+    ('kb_drop_negative', '用户情绪负面且知识库命中率骤降',
+     lambda signals, labels: labels.get('sentiment') == 'negative'
+     and 'knowledge_base_hit_rate' in _anomalous(signals)),
+    ('slow_negative', '用户情绪负面且响应延迟异常升高',
+     lambda signals, labels: labels.get('sentiment') == 'negative'
+     and bool({'latency', 'average_response_time'} & _anomalous(signals))),
+    ('error_spike', '错误率突增',
+     lambda signals, labels: 'error_rate' in _anomalous(signals)
+     and signals['error_rate']['z'] >= 2 * config.MONITOR_ANOMALY_Z),
+    ('multi_metric', '多项系统指标同时异常',
+     lambda signals, labels: len(_anomalous(signals)) >= 2),
+    ('negative_escalation', '负面情绪对话已升级',
+     lambda signals, labels: labels.get('sentiment') == 'negative' and labels.get('status') == 'escalated'),
+]
+
+
+class AnomalyDetector:
+    """客服系统状态流的在线异常检测与告警融合"""
+
+    def __init__(self, rules: Optional[List[tuple]] = None, **detector_options: Any):
+        """初始化各指标检测器"""
+        self.detectors = {
+            metric: MetricDetector(direction, **detector_options) for metric, (direction, _, _) in METRICS.items()
+        }
+        self.rules = rules or FUSION_RULES
+        self._last_state: Optional[tuple] = None
+        self._last_signals: Dict[str, Dict[str, Any]] = {}
+        self.stats = {
+            'snapshots': 0,
+            'anomalies': {metric: 0 for metric in METRICS},
+            'alerts': {name: 0 for name, _, _ in self.rules},
+        }
+
+    def observe(self, system_state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """并入一个系统状态快照，返回各指标的异常信号
+
+        与上一个快照完全相同时（如多段对话共享同一指标快照）不重复计入基线。
+        """
+        values = tuple(system_state.get(metric) for metric in METRICS)
+        if values == self._last_state:
+            return self._last_signals
+
+        signals = {}
+        for metric, value in zip(METRICS, values):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                signals[metric] = self.detectors[metric].update(float(value))
+                if signals[metric]['anomalous']:
+                    self.stats['anomalies'][metric] += 1
+
+        self.stats['snapshots'] += 1
+        self._last_state = values
+        self._last_signals = signals
+        return signals
+
+    def fuse(self, signals: Dict[str, Dict[str, Any]], labels: Dict[str, Any]) -> List[Dict[str, str]]:
+        """按融合规则判定告警，返回触发的规则"""
+        return [
+            {'rule': name, 'description': description}
+            for name, description, predicate in self.rules
+            if predicate(signals, labels)
+        ]
+
+    def record(self, fired: List[Dict[str, str]]):
+        for alert in fired:
+            self.stats['alerts'][alert['rule']] += 1
+
+    @staticmethod
+    def describe(signals: Dict[str, Dict[str, Any]]) -> str:
+        """异常指标的文字描述（用于提示词）"""
+        parts = []
+        for metric, signal in signals.items():
+            if not signal['anomalous']:
+                continue
+            _, name, unit = METRICS[metric]
+            parts.append(f"{name} {signal['value']:g}{unit}（基线 {signal['baseline']:.4g}{unit}，z={signal['z']:.1f}）")
+        return '；'.join(parts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快照数、各指标异常次数、各规则告警次数和当前基线"""
+        return {
+            **self.stats,
+            'baselines': {metric: detector.mean for metric, detector in self.detectors.items()}
+        }
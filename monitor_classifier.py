@@ -0,0 +1,402 @@
+"""
+客服对话快速分类 - 用历史LLM分析结果训练的字符n-gram逻辑回归（NumPy实现），
+高置信度的常规对话直接给出意图/情绪/分类/状态，其余交给LLM
+"""
+
+import bisect
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+FIELDS = ('intent', 'sentiment', 'category', 'status', 'alert_triggered')
+
+# 样本数不足的标签归入该类，预测为该类时不走快速路径
+OTHER_LABEL = '__other__'
+MIN_CLASS_COUNT = 5
+
+# 新样本先缓冲，攒够一批或间隔一段时间后在线程中写入样本文件
+FLUSH_BATCH = 64
+FLUSH_SECONDS = 5.0
+
+# 系统状态分桶边界（特征为 字段:桶号）
+_STATE_BINS = {
+    'latency': (300, 800, 1500, 3000),
+    'error_rate': (0.01, 0.03, 0.05, 0.1),
+    'knowledge_base_hit_rate': (0.4, 0.6, 0.8, 0.9),
+    'average_response_time': (300, 800, 1500, 3000),
+}
+
+
+def _label(field: str, value: Any) -> str:
+    if field == 'alert_triggered':
+        return 'true' if value else 'false'
+    return ' '.join(str(value).lower().split())
+
+
+def extract_features(text: str, system_state: Optional[Dict[str, Any]], dim: int) -> np.ndarray:
+    """字符1-3元组与系统状态分桶的哈希特征下标（去重、升序）"""
+    text = ' '.join(text.lower().split())
+    tokens = {text[i:i + n] for n in (1, 2, 3) for i in range(len(text) - n + 1)}
+    for field, bins in _STATE_BINS.items():
+        value = (system_state or {}).get(field)
+        if isinstance(value, (int, float)):
+            tokens.add(f"\x00{field}:{bisect.bisect_left(bins, value)}")
+    if not tokens:
+        tokens.add('\x00empty')
+    mask = dim - 1
+    return np.array(sorted({zlib.crc32(token.encode('utf-8')) & mask for token in tokens}), dtype=np.int64)
+
+
+class FastPathModel:
+    """多字段softmax逻辑回归（特征为L2归一化的二值哈希特征）
+
+    各字段的权重按列拼接为一个矩阵，预测时一次取行求和，再按字段分段做softmax。
+    """
+
+    def __init__(self, dim: int, classes: Dict[str, List[str]]):
+        """初始化零权重"""
+        self.dim = dim
+        self.classes = classes
+        bounds = np.cumsum([0] + [len(labels) for labels in classes.values()])
+        self.slices = {field: slice(bounds[i], bounds[i + 1]) for i, field in enumerate(classes)}
+        self.weights = np.zeros((dim, bounds[-1]), dtype=np.float32)
+        self.bias = np.zeros(bounds[-1], dtype=np.float32)
+        self.metrics: Dict[str, Any] = {}
+
+    def predict(self, features: np.ndarray) -> Dict[str, Tuple[str, float]]:
+        """返回 字段 -> (标签, 概率)"""
+        logits = (self.weights[features].sum(axis=0) / np.sqrt(len(features)) + self.bias).tolist()
+        # 每个字段只有几个到几十个类别，逐字段softmax用纯Python比NumPy小数组运算更快
+        result = {}
+        for field, columns in self.slices.items():
+            scores = logits[columns]
+            top = max(scores)
+            best = scores.index(top)
+            total = sum(math.exp(score - top) for score in scores)
+            result[field] = (self.classes[field][best], 1.0 / total)
+        return result
+
+    def fit(self, features: List[np.ndarray], labels: Dict[str, np.ndarray], epochs: int = 20,
+            learning_rate: float = 4.0, l2: float = 1e-6, batch_size: int = 128):
+        """小批量SGD训练（稀疏更新，L2每轮衰减一次）"""
+        count = len(features)
+        lengths = np.array([len(f) for f in features])
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        columns = np.concatenate(features)
+        values = np.repeat(1.0 / np.sqrt(lengths), lengths).astype(np.float32)
+        order = np.arange(count)
+        rng = np.random.default_rng(0)
+
+        for _ in range(epochs):
+            rng.shuffle(order)
+            for start in range(0, count, batch_size):
+                rows = order[start:start + batch_size]
+                entries = np.concatenate([np.arange(offsets[row], offsets[row + 1]) for row in rows])
+                cols = columns[entries]
+                vals = values[entries]
+                local = np.repeat(np.arange(len(rows)), lengths[rows])
+                segments = np.concatenate([[0], np.cumsum(lengths[rows])[:-1]])
+
+                logits = np.add.reduceat(self.weights[cols] * vals[:, None], segments, axis=0) + self.bias
+                grad = np.empty_like(logits)
+                for field, columns_slice in self.slices.items():
+                    scores = logits[:, columns_slice]
+                    probs = np.exp(scores - scores.max(axis=1, keepdims=True))
+                    probs /= probs.sum(axis=1, keepdims=True)
+                    probs[np.arange(len(rows)), labels[field][rows]] -= 1.0
+                    grad[:, columns_slice] = probs
+                grad /= len(rows)
+
+                np.add.at(self.weights, cols, -learning_rate * vals[:, None] * grad[local])
+                self.bias -= learning_rate * grad.sum(axis=0)
+
+            self.weights *= 1.0 - learning_rate * l2
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = json.dumps({'dim': self.dim, 'classes': self.classes, 'metrics': self.metrics}, ensure_ascii=False)
+        tmp = path.with_name(path.name + '.tmp.npz')
+        np.savez(tmp, meta=np.array(meta), weights=self.weights, bias=self.bias)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'FastPathModel':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            model = cls(meta['dim'], meta['classes'])
+            model.weights = data['weights']
+            model.bias = data['bias']
+        model.metrics = meta.get('metrics', {})
+        return model
+
+
+class FastPathClassifier:
+    """快速路径分类器：样本收集、定期重训、置信度判断与一致性统计"""
+
+    def __init__(
+        self,
+        samples_path: Optional[str] = None,
+        model_path: Optional[str] = None,
+        threshold: Optional[float] = None,
+        dim: int = 1 << 16
+    ):
+        """加载历史样本和已训练模型"""
+        self.samples_path = Path(samples_path or config.MONITOR_FASTPATH_SAMPLES_PATH)
+        self.model_path = Path(model_path or config.MONITOR_FASTPATH_MODEL_PATH)
+        self.threshold = config.MONITOR_FASTPATH_THRESHOLD if threshold is None else threshold
+        self.dim = dim
+        self.samples: deque = deque(maxlen=config.MONITOR_FASTPATH_MAX_SAMPLES)
+        self.model: Optional[FastPathModel] = None
+        self._new_samples = 0
+        self._training = False
+        # samples、待写入缓冲和各标志在事件循环与训练/写入线程间共享，统一由_lock保护
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._flushing = False
+        self._flushed_at = time.monotonic()
+        self._file_lines = 0
+
+        self.stats = {
+            'predictions': 0, 'fast_path': 0, 'predict_seconds': 0.0,
+            'escalated': {'untrained': 0, 'low_confidence': 0, 'alert_risk': 0},
+        }
+        # audit: 快速路径结果抽样交给LLM复核；escalated: 走LLM的对话上模型预测与LLM结果的对比
+        self.agreement = {
+            source: {field: {'compared': 0, 'agreed': 0} for field in FIELDS}
+            for source in ('audit', 'escalated')
+        }
+
+        if self.samples_path.exists():
+            with open(self.samples_path, encoding='utf-8') as f:
+                for line in f:
+                    self._file_lines += 1
+                    try:
+                        self.samples.append(json.loads(line))
+                    except ValueError:
+                        continue
+        if self.model_path.exists():
+            try:
+                self.model = FastPathModel.load(self.model_path)
+                logger.info(f"快速分类模型已加载: {self.model.metrics}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"快速分类模型加载失败，将重新训练: {e}")
+
+    def features(self, text: str, system_state: Optional[Dict[str, Any]]) -> np.ndarray:
+        return extract_features(text, system_state, self.dim)
+
+    def classify(self, user_query: str, system_state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """预测各字段，返回 {'labels', 'confidence', 'fast_path', 'reason'}"""
+        started = time.perf_counter()
+        model = self.model
+        self.stats['predictions'] += 1
+        if model is None:
+            self.stats['escalated']['untrained'] += 1
+            return {'labels': None, 'confidence': 0.0, 'fast_path': False, 'reason': 'untrained'}
+
+        predicted = model.predict(self.features(user_query, system_state))
+        labels = {field: label for field, (label, _) in predicted.items()}
+        confidence = min(prob for _, prob in predicted.values())
+
+        reason = None
+        if OTHER_LABEL in labels.values() or confidence < self.threshold:
+            reason = 'low_confidence'
+        elif (labels['alert_triggered'] == 'true' or labels['sentiment'] == 'negative'
+              or labels['status'] == 'escalated'):
+            # 可能需要告警的对话始终交给LLM
+            reason = 'alert_risk'
+
+        if reason is None:
+            self.stats['fast_path'] += 1
+        else:
+            self.stats['escalated'][reason] += 1
+        self.stats['predict_seconds'] += time.perf_counter() - started
+        return {'labels': labels, 'confidence': confidence, 'fast_path': reason is None, 'reason': reason}
+
+    def to_analysis(self, prediction: Dict[str, Any]) -> Dict[str, Any]:
+        """快速路径预测转为分析结果格式"""
+        labels = prediction['labels']
+        return {
+            'intent': labels['intent'],
+            'sentiment': labels['sentiment'],
+            'category': labels['category'],
+            'status': labels['status'],
+            'confidence': round(prediction['confidence'], 4),
+            'alert_triggered': False,
+            'alert_reason': '',
+            'recommendedActions': [],
+            'source': 'fast_path'
+        }
+
+    def should_audit(self) -> bool:
+        return random.random() < config.MONITOR_FASTPATH_AUDIT_RATE
+
+    def compare(self, source: str, labels: Optional[Dict[str, str]], analysis: Dict[str, Any]):
+        """记录模型预测与LLM结果的逐字段一致性"""
+        if labels is None:
+            return
+        for field in FIELDS:
+            if field in analysis:
+                stats = self.agreement[source][field]
+                stats['compared'] += 1
+                stats['agreed'] += int(labels[field] == _label(field, analysis[field]))
+
+    def observe(self, user_query: str, system_state: Optional[Dict[str, Any]], analysis: Dict[str, Any]) -> bool:
+        """记录一条LLM分析结果作为训练样本（只写内存缓冲，由flush落盘），返回是否到了重训时机"""
+        if any(field not in analysis for field in FIELDS):
+            return False
+        sample = {
+            'text': user_query,
+            'state': {field: (system_state or {}).get(field) for field in _STATE_BINS},
+            'labels': {field: _label(field, analysis[field]) for field in FIELDS}
+        }
+        line = json.dumps(sample, ensure_ascii=False) + '\n'
+        with self._lock:
+            self.samples.append(sample)
+            self._pending.append(line)
+            self._new_samples += 1
+            due = (not self._training and len(self.samples) >= config.MONITOR_FASTPATH_MIN_SAMPLES
+                   and (self.model is None or self._new_samples >= config.MONITOR_FASTPATH_RETRAIN_EVERY))
+            if due:
+                self._training = True
+        return due
+
+    def flush_due(self) -> bool:
+        """缓冲样本是否该写入文件（攒够一批或距上次写入超过FLUSH_SECONDS），是则标记为写入中"""
+        with self._lock:
+            due = bool(self._pending) and not self._flushing and (
+                len(self._pending) >= FLUSH_BATCH or time.monotonic() - self._flushed_at >= FLUSH_SECONDS
+            )
+            if due:
+                self._flushing = True
+        return due
+
+    def flush(self):
+        """把缓冲样本追加到样本文件（在线程中调用）
+
+        文件行数超过样本上限的两倍时，改为按内存中保留的样本重写文件，避免文件无限增长。
+        """
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                rewrite = self._file_lines + len(pending) > 2 * config.MONITOR_FASTPATH_MAX_SAMPLES
+                # 内存样本已包含本批缓冲，重写时不再单独追加
+                lines = [json.dumps(sample, ensure_ascii=False) + '\n' for sample in self.samples] if rewrite else pending
+            if not lines and not rewrite:
+                return
+
+            self.samples_path.parent.mkdir(parents=True, exist_ok=True)
+            if rewrite:
+                tmp = self.samples_path.with_name(self.samples_path.name + '.tmp')
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.writelines(lines)
+                os.replace(tmp, self.samples_path)
+                self._file_lines = len(lines)
+            else:
+                with open(self.samples_path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+                self._file_lines += len(lines)
+        finally:
+            with self._lock:
+                self._flushing = False
+                self._flushed_at = time.monotonic()
+
+    def train(self) -> Optional[Dict[str, Any]]:
+        """用当前样本训练新模型（留出10%评估），训练完成后替换旧模型"""
+        try:
+            # 在锁内取快照，避免与事件循环中的observe并发修改deque
+            with self._lock:
+                samples = list(self.samples)
+                if len(samples) < config.MONITOR_FASTPATH_MIN_SAMPLES:
+                    return None
+                self._new_samples = 0
+            started = time.monotonic()
+
+            classes = {}
+            for field in FIELDS:
+                counts: Dict[str, int] = {}
+                for sample in samples:
+                    counts[sample['labels'][field]] = counts.get(sample['labels'][field], 0) + 1
+                classes[field] = sorted(label for label, count in counts.items() if count >= MIN_CLASS_COUNT)
+                classes[field].append(OTHER_LABEL)
+
+            features = [self.features(sample['text'], sample['state']) for sample in samples]
+            labels = {
+                field: np.array([
+                    classes[field].index(sample['labels'][field]) if sample['labels'][field] in classes[field]
+                    else len(classes[field]) - 1
+                    for sample in samples
+                ])
+                for field in FIELDS
+            }
+
+            order = np.random.default_rng(1).permutation(len(samples))
+            holdout, train = order[:len(samples) // 10], order[len(samples) // 10:]
+            model = FastPathModel(self.dim, classes)
+            model.fit([features[i] for i in train], {field: values[train] for field, values in labels.items()})
+            model.metrics = self._evaluate(model, [features[i] for i in holdout],
+                                           {field: values[holdout] for field, values in labels.items()})
+            model.metrics['samples'] = len(samples)
+            model.metrics['train_seconds'] = round(time.monotonic() - started, 2)
+
+            model.save(self.model_path)
+            self.model = model
+            logger.info(f"快速分类模型训练完成: {model.metrics}")
+            return model.metrics
+        finally:
+            with self._lock:
+                self._training = False
+
+    def _evaluate(self, model: FastPathModel, features: List[np.ndarray], labels: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """留出集上的逐字段准确率，以及达到阈值的样本占比（覆盖率）和其全字段准确率"""
+        if not features:
+            return {}
+        correct = {field: 0 for field in FIELDS}
+        covered = covered_correct = 0
+        for index, feature in enumerate(features):
+            predicted = model.predict(feature)
+            exact = True
+            for field in FIELDS:
+                hit = predicted[field][0] == model.classes[field][labels[field][index]]
+                correct[field] += hit
+                exact = exact and hit
+            if min(prob for _, prob in predicted.values()) >= self.threshold:
+                covered += 1
+                covered_correct += exact
+        return {
+            'accuracy': {field: round(hits / len(features), 4) for field, hits in correct.items()},
+            'coverage': round(covered / len(features), 4),
+            'covered_accuracy': round(covered_correct / covered, 4) if covered else None
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快速路径命中率、单次预测耗时、与LLM结果的一致率"""
+        predictions = self.stats['predictions']
+        return {
+            'predictions': predictions,
+            'fast_path': self.stats['fast_path'],
+            'fast_path_rate': self.stats['fast_path'] / predictions if predictions else 0.0,
+            'escalated': dict(self.stats['escalated']),
+            'mean_predict_us': self.stats['predict_seconds'] / predictions * 1e6 if predictions else 0.0,
+            'agreement': {
+                source: {
+                    field: stats['agreed'] / stats['compared'] if stats['compared'] else None
+                    for field, stats in fields.items()
+                }
+                for source, fields in self.agreement.items()
+            },
+            'samples': len(self.samples),
+            'model': self.model.metrics if self.model else None
+        }
@@ -0,0 +1,192 @@
+"""
+相似投诉聚类 - 用户查询的字符n-gram MinHash签名与LSH分桶，在时间窗口内增量聚类，
+同一簇只分析代表对话，结果传播给簇内其他对话
+"""
+
+import asyncio
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+# Mersenne素数 2^61-1，系数取2^29以内保证 a*x+b 不超出uint64
+_PRIME = np.uint64((1 << 61) - 1)
+_COEFFICIENT_BOUND = 1 << 29
+
+# 订单号、手机号等数字不影响是否同类问题
+_DIGITS = re.compile(r'\d+')
+_NOISE = re.compile(r'[\s\W_]+')
+
+# 代表结果尚未发布
+_PENDING = object()
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    """归一化后的字符size元组（不足size个字符时取整段文本）"""
+    text = _NOISE.sub('', _DIGITS.sub('0', text.lower()))
+    if len(text) <= size:
+        return [text] if text else []
+    return [text[i:i + size] for i in range(len(text) - size + 1)]
+
+
+class MinHasher:
+    """MinHash签名：num_perm个 (a*x+b) mod p 哈希函数在n元组哈希上的最小值"""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        """生成哈希函数系数"""
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _COEFFICIENT_BOUND, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, _COEFFICIENT_BOUND, num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """文本的MinHash签名，文本归一化后为空时返回None"""
+        tokens = set(shingles(text))
+        if not tokens:
+            return None
+        hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens),
+                             dtype=np.uint64, count=len(tokens))
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1)
+
+
+class ComplaintCluster:
+    """一个相似查询簇：首个查询为代表，代表的分析结果通过wait()传播给成员
+
+    future在首个成员等待时才在其事件循环中创建，簇本身可以在事件循环之外创建和分配。
+    """
+
+    def __init__(self, cluster_id: str, representative: str, signature: np.ndarray, keys: List[Tuple[int, bytes]]):
+        """创建簇"""
+        self.id = cluster_id
+        self.representative = representative
+        self.signature = signature
+        self.keys = keys
+        self.size = 1
+        self.created = time.monotonic()
+        self.last_seen = self.created
+        self._outcome: Any = _PENDING
+        self._future: Optional[asyncio.Future] = None
+
+    @property
+    def done(self) -> bool:
+        """代表结果是否已发布"""
+        return self._outcome is not _PENDING
+
+    async def wait(self) -> Any:
+        """等待代表对话的分析结果，代表分析失败时抛出其异常"""
+        if self._outcome is _PENDING:
+            if self._future is None:
+                self._future = asyncio.get_running_loop().create_future()
+            # 成员被取消时不能连带取消共享的future
+            await asyncio.shield(self._future)
+        if isinstance(self._outcome, BaseException):
+            raise self._outcome
+        return self._outcome
+
+    def resolve(self, analysis: Any):
+        """发布代表对话的分析结果（异常表示代表分析失败）"""
+        if self._outcome is not _PENDING:
+            return
+        self._outcome = analysis
+        # 异常通过_outcome交给等待方，future只用于唤醒
+        if self._future is not None and not self._future.done():
+            self._future.set_result(None)
+
+
+class ComplaintClusterer:
+    """时间窗口内的在线查询聚类
+
+    签名按bands段切分，任一段完全相同的簇为候选，再用签名一致比例估计Jaccard相似度，
+    不低于threshold时并入最相似的簇，否则新建簇。簇创建超过window秒后不再接收成员，
+    新的相似查询会重新分析，避免长时间复用过期结论。
+    """
+
+    def __init__(
+        self,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        threshold: Optional[float] = None,
+        window: Optional[float] = None
+    ):
+        """初始化签名函数和LSH分桶"""
+        self.hasher = MinHasher(num_perm or config.MONITOR_CLUSTER_NUM_PERM)
+        self.bands = bands or config.MONITOR_CLUSTER_BANDS
+        if self.hasher.num_perm % self.bands:
+            raise ValueError(f"签名长度{self.hasher.num_perm}不能被分段数{self.bands}整除")
+        self.rows = self.hasher.num_perm // self.bands
+        self.threshold = config.MONITOR_CLUSTER_THRESHOLD if threshold is None else threshold
+        self.window = window or config.MONITOR_CLUSTER_WINDOW_SECONDS
+        self.clusters: 'OrderedDict[str, ComplaintCluster]' = OrderedDict()
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        self._next_id = 0
+        self.stats = {'assigned': 0, 'clusters': 0, 'joined': 0}
+
+    def assign(self, text: str) -> Tuple[Optional[ComplaintCluster], bool]:
+        """为查询分配簇，返回 (簇, 是否新建)；无法计算签名的查询返回 (None, True)"""
+        self._expire()
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None, True
+        self.stats['assigned'] += 1
+
+        keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for key in keys:
+            for cluster_id in self._buckets.get(key, ()):
+                if cluster_id in seen:
+                    continue
+                seen.add(cluster_id)
+                cluster = self.clusters[cluster_id]
+                similarity = float(np.mean(cluster.signature == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = cluster, similarity
+
+        if best is not None:
+            best.size += 1
+            best.last_seen = time.monotonic()
+            self.stats['joined'] += 1
+            return best, False
+
+        self._next_id += 1
+        cluster = ComplaintCluster(f"c{self._next_id}", text, signature, keys)
+        self.clusters[cluster.id] = cluster
+        for key in keys:
+            self._buckets.setdefault(key, []).append(cluster.id)
+        self.stats['clusters'] += 1
+        return cluster, True
+
+    def _expire(self):
+        # 簇按创建时间有序，只需从头部淘汰
+        cutoff = time.monotonic() - self.window
+        while self.clusters:
+            cluster = next(iter(self.clusters.values()))
+            if cluster.created > cutoff:
+                break
+            del self.clusters[cluster.id]
+            for key in cluster.keys:
+                members = self._buckets.get(key)
+                if members is None:
+                    continue
+                members.remove(cluster.id)
+                if not members:
+                    del self._buckets[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """分配次数、新建簇数、并入已有簇的次数（即省下的LLM分析）和当前活跃簇"""
+        largest = sorted(self.clusters.values(), key=lambda cluster: cluster.size, reverse=True)[:5]
+        return {
+            **self.stats,
+            'active_clusters': len(self.clusters),
+            'largest': [
+                {'id': cluster.id, 'size': cluster.size, 'representative': cluster.representative[:50]}
+                for cluster in largest
+            ]
+        }
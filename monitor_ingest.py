@@ -0,0 +1,446 @@
+"""
+客服监控数据摄取 - 从JSONL文件、标准输入或本地socket持续读取对话与指标事件，
+有界队列背压、微批并发分析，分析结果与告警写入输出；同一相似对话簇的告警合并计数
+
+用法: python -m agent.agents.monitor_ingest --jsonl chats.jsonl --socket /tmp/monitor.sock --output out.jsonl
+
+事件格式（每行一个JSON）：
+    {"type": "metrics", "system_state": {"latency": 800, "error_rate": 0.05, ...}}
+    {"type": "conversation", "id": "c1", "user_query": "...", "ai_response": "...", "system_state": {...}}
+对话事件未携带的系统状态字段取最近一次指标快照。
+
+输出记录类型：analysis（每条对话）、alert（每个簇的首条告警）、alert_summary（簇内后续告警的累计计数，
+定期输出）、error。
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Dict, List, Optional
+from agent.agents.monitor import CustomerMonitorAgent
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+SYSTEM_STATE_FIELDS = (
+    'latency', 'error_rate', 'knowledge_base_hit_rate', 'active_conversations', 'average_response_time'
+)
+
+# socket单行上限
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _valid_state(state: Any) -> bool:
+    """系统状态须为dict，其中的已知指标字段须为数值"""
+    return isinstance(state, dict) and all(
+        isinstance(state[field], (int, float)) and not isinstance(state[field], bool)
+        for field in SYSTEM_STATE_FIELDS if field in state
+    )
+
+
+class JsonlSink:
+    """输出：每条记录一行JSON（path为 - 时写标准输出）"""
+
+    def __init__(self, path: Optional[str] = None):
+        """打开输出文件（追加写）"""
+        self.path = path or config.INGEST_OUTPUT_PATH
+        if self.path == '-':
+            self._file = sys.stdout
+        else:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    async def write(self, records: List[Dict[str, Any]]):
+        """写入一批记录"""
+        if not records:
+            return
+        data = ''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in records)
+        await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: str):
+        self._file.write(data)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class IngestStats:
+    """摄取统计：累计计数、滑动窗口事件速率、队列深度"""
+
+    def __init__(self, window: int = 60):
+        """初始化统计"""
+        self.window = window
+        self.counts = {
+            'received': 0, 'metrics': 0, 'invalid': 0, 'processed': 0, 'failed': 0,
+            'alerts': 0, 'merged_alerts': 0, 'batches': 0
+        }
+        self.max_queue_depth = 0
+        self.started = time.monotonic()
+        self._buckets: deque = deque()  # (秒, 处理数)
+
+    def record_processed(self, count: int):
+        self.counts['processed'] += count
+        second = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1][1] += count
+        else:
+            self._buckets.append([second, count])
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+
+    def events_per_second(self) -> float:
+        """最近window秒内的平均处理速率"""
+        now = time.monotonic()
+        span = min(self.window, max(now - self.started, 1.0))
+        recent = sum(count for second, count in self._buckets if second > now - self.window)
+        return recent / span
+
+
+class AlertAggregator:
+    """按相似对话簇聚合告警：簇内首条告警立即输出，之后的告警只累计计数，由flush定期输出汇总"""
+
+    # 汇总中保留的对话id数
+    MAX_SAMPLE_IDS = 10
+
+    def __init__(self, window: Optional[float] = None):
+        """window秒内没有新告警的簇在flush后不再跟踪"""
+        self.window = window or config.MONITOR_CLUSTER_WINDOW_SECONDS
+        self._open: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, record: Dict[str, Any], cluster_id: Optional[str]) -> bool:
+        """登记一条告警，返回是否需要立即输出"""
+        if cluster_id is None:
+            return True
+        entry = self._open.get(cluster_id)
+        first = entry is None
+        if first:
+            entry = self._open[cluster_id] = {
+                'count': 0, 'rules': Counter(), 'sample_ids': [], 'first_seen': record['timestamp'],
+                'reason': record['reason'], 'category': record['category'], 'reported': 1
+            }
+        entry['count'] += 1
+        entry['rules'].update(record['rules'])
+        entry['last_seen'] = record['timestamp']
+        entry['updated'] = time.monotonic()
+        if len(entry['sample_ids']) < self.MAX_SAMPLE_IDS:
+            entry['sample_ids'].append(record['id'])
+        return first
+
+    def flush(self, final: bool = False) -> List[Dict[str, Any]]:
+        """计数有增加的簇输出一条alert_summary，并清理不再活跃的簇"""
+        records = []
+        cutoff = time.monotonic() - self.window
+        for cluster_id, entry in list(self._open.items()):
+            if entry['count'] > entry['reported']:
+                records.append({
+                    'type': 'alert_summary',
+                    'cluster_id': cluster_id,
+                    'count': entry['count'],
+                    'new': entry['count'] - entry['reported'],
+                    'rules': dict(entry['rules']),
+                    'reason': entry['reason'],
+                    'category': entry['category'],
+                    'sample_ids': entry['sample_ids'],
+                    'first_seen': entry['first_seen'],
+                    'last_seen': entry['last_seen'],
+                    'timestamp': _timestamp()
+                })
+                entry['reported'] = entry['count']
+            if final or entry['updated'] < cutoff:
+                del self._open[cluster_id]
+        return records
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+
+class IngestPipeline:
+    """客服监控摄取管道
+
+    数据源协程把事件放入有界队列（队列满时阻塞读取，形成背压）；concurrency个worker
+    各自攒够batch_size条或等待batch_wait_ms后取出一批，打包分析后整批写入输出。
+    """
+
+    def __init__(
+        self,
+        agent: Optional[CustomerMonitorAgent] = None,
+        sink: Optional[JsonlSink] = None,
+        queue_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        batch_wait_ms: Optional[float] = None
+    ):
+        """初始化管道"""
+        self.agent = agent or CustomerMonitorAgent()
+        self.sink = sink or JsonlSink()
+        self.concurrency = concurrency or config.INGEST_CONCURRENCY
+        self.batch_size = batch_size or config.INGEST_BATCH_SIZE
+        self.batch_wait = (config.INGEST_BATCH_WAIT_MS if batch_wait_ms is None else batch_wait_ms) / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or config.INGEST_QUEUE_SIZE)
+        self.stats = IngestStats()
+        self.alerts = AlertAggregator()
+        self.system_state: Dict[str, Any] = {field: 0 for field in SYSTEM_STATE_FIELDS}
+
+    async def submit(self, line: str):
+        """解析一行事件：指标快照更新当前系统状态，对话事件入队（队列满时等待）
+
+        字段类型不合法的事件（system_state不是对象、指标不是数值、user_query不是字符串）计为invalid并丢弃。
+        """
+        line = line.strip()
+        if not line:
+            return
+        self.stats.counts['received'] += 1
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        if not isinstance(event, dict):
+            self.stats.counts['invalid'] += 1
+            return
+
+        if event.get('type') == 'metrics':
+            state = event.get('system_state')
+            if state is None or state == {}:
+                state = {key: value for key, value in event.items() if key in SYSTEM_STATE_FIELDS}
+            if not _valid_state(state):
+                self.stats.counts['invalid'] += 1
+                return
+            self.stats.counts['metrics'] += 1
+            self.system_state.update(state)
+            return
+
+        state = event.get('system_state')
+        if not isinstance(event.get('user_query'), str) or not (state is None or _valid_state(state)):
+            self.stats.counts['invalid'] += 1
+            return
+        # 对话按到达时的系统状态分析
+        event['system_state'] = {**self.system_state, **(state or {})}
+        await self.queue.put(event)
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.queue.qsize())
+
+    async def read_jsonl(self, path: str, follow: bool = False, poll_interval: float = 0.5):
+        """读取JSONL文件；follow为True时持续读取追加内容（类似 tail -f）"""
+        pending = ''
+        with open(path, 'r', encoding='utf-8') as f:
+            while True:
+                lines = await asyncio.to_thread(f.readlines, 1 << 16)
+                if not lines:
+                    if not follow:
+                        break
+                    await asyncio.sleep(poll_interval)
+                    continue
+
+                lines[0] = pending + lines[0]
+                pending = ''
+                # 追加中的文件最后一行可能不完整
+                if follow and not lines[-1].endswith('\n'):
+                    pending = lines.pop()
+                for line in lines:
+                    await self.submit(line)
+
+        if pending:
+            await self.submit(pending)
+        logger.info(f"文件读取完毕: {path}")
+
+    async def read_stdin(self):
+        """读取标准输入直到EOF"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except ValueError:
+            # 标准输入重定向自普通文件时不支持管道传输，改为线程中分块读取
+            while True:
+                lines = await asyncio.to_thread(sys.stdin.readlines, 1 << 16)
+                if not lines:
+                    return
+                for line in lines:
+                    await self.submit(line)
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            await self.submit(line.decode('utf-8', errors='replace'))
+
+    async def serve_socket(self, address: str):
+        """监听本地socket（host:port 为TCP，否则为Unix socket路径），每个连接逐行发送事件"""
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                # 入队阻塞时不再读取，积压由内核缓冲区和TCP流控反压给发送方
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    await self.submit(line.decode('utf-8', errors='replace'))
+            except (ConnectionError, ValueError) as e:
+                logger.warning(f"socket连接异常: {e}")
+            finally:
+                writer.close()
+
+        host, _, port = address.rpartition(':')
+        if port.isdigit():
+            server = await asyncio.start_server(handle, host or '127.0.0.1', int(port), limit=MAX_LINE_BYTES)
+        else:
+            server = await asyncio.start_unix_server(handle, address, limit=MAX_LINE_BYTES)
+        logger.info(f"监听socket: {address}")
+        async with server:
+            await server.serve_forever()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logger.error(f"批次处理失败: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _process(self, batch: List[Dict[str, Any]]):
+        """分析一批对话，整批写入输出"""
+        analyses = await self.agent.analyze_conversations(batch, return_exceptions=True)
+
+        records = []
+        processed = 0
+        for event, analysis in zip(batch, analyses):
+            event_id = event.get('id')
+            if isinstance(analysis, BaseException):
+                self.stats.counts['failed'] += 1
+                records.append({'type': 'error', 'id': event_id, 'error': str(analysis), 'timestamp': _timestamp()})
+                continue
+
+            processed += 1
+            records.append({'type': 'analysis', 'id': event_id, 'analysis': analysis, 'timestamp': _timestamp()})
+            if analysis.get('alert_triggered'):
+                self.stats.counts['alerts'] += 1
+                alert = {
+                    'type': 'alert',
+                    'id': event_id,
+                    'cluster_id': analysis.get('cluster_id'),
+                    'rules': analysis.get('alert_rules', []),
+                    'reason': analysis.get('alert_reason', ''),
+                    'category': analysis.get('category'),
+                    'recommended_actions': analysis.get('recommendedActions', []),
+                    'system_state': event['system_state'],
+                    'timestamp': _timestamp()
+                }
+                if self.alerts.add(alert, alert['cluster_id']):
+                    records.append(alert)
+                else:
+                    self.stats.counts['merged_alerts'] += 1
+
+        await self.sink.write(records)
+        self.stats.counts['batches'] += 1
+        self.stats.record_processed(processed)
+
+    async def _report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.get_stats()
+            logger.info(
+                f"摄取统计: {stats['events_per_second']:.1f} 条/秒, 队列 {stats['queue_depth']}, "
+                f"已处理 {stats['processed']}, 失败 {stats['failed']}, 告警 {stats['alerts']}（合并 {stats['merged_alerts']}）"
+            )
+
+    async def _flush_alerts(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.sink.write(self.alerts.flush())
+
+    async def run(self, *sources: Awaitable):
+        """运行管道：数据源全部结束后等待队列处理完毕再返回"""
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        background = [
+            asyncio.create_task(self._report(config.INGEST_REPORT_SECONDS)),
+            asyncio.create_task(self._flush_alerts(config.INGEST_ALERT_FLUSH_SECONDS))
+        ]
+        try:
+            await asyncio.gather(*sources)
+            await self.queue.join()
+        finally:
+            for task in workers + background:
+                task.cancel()
+            await asyncio.gather(*workers, *background, return_exceptions=True)
+            await self.sink.write(self.alerts.flush(final=True))
+            logger.info(f"摄取结束: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """吞吐与队列统计"""
+        return {
+            **self.stats.counts,
+            'events_per_second': self.stats.events_per_second(),
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.stats.max_queue_depth,
+            'queue_capacity': self.queue.maxsize,
+            'open_alert_clusters': len(self.alerts),
+            'uptime_seconds': time.monotonic() - self.stats.started
+        }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="客服监控数据摄取")
+    parser.add_argument('--jsonl', action='append', default=[], help="JSONL事件文件（可多次指定）")
+    parser.add_argument('--follow', action='store_true', help="持续读取文件追加内容")
+    parser.add_argument('--stdin', action='store_true', help="从标准输入读取事件")
+    parser.add_argument('--socket', help="监听的socket地址（host:port 或 Unix socket路径）")
+    parser.add_argument('--output', default=config.INGEST_OUTPUT_PATH, help="输出文件（- 为标准输出）")
+    parser.add_argument('--concurrency', type=int, default=config.INGEST_CONCURRENCY, help="并发处理的批次数")
+    parser.add_argument('--batch-size', type=int, default=config.INGEST_BATCH_SIZE, help="每批最多事件数")
+    args = parser.parse_args()
+
+    async def run():
+        pipeline = IngestPipeline(
+            sink=JsonlSink(args.output), concurrency=args.concurrency, batch_size=args.batch_size
+        )
+        sources = [pipeline.read_jsonl(path, follow=args.follow) for path in args.jsonl]
+        if args.stdin:
+            sources.append(pipeline.read_stdin())
+        if args.socket:
+            sources.append(pipeline.serve_socket(args.socket))
+        if not sources:
+            parser.error("至少指定一个数据源（--jsonl / --stdin / --socket）")
+        try:
+            await pipeline.run(*sources)
+        finally:
+            pipeline.sink.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,20 @@ Agent协调框架 - 主控Agent
 """
 
 import asyncio
-from typing import Dict, List, Any
+import heapq
+import json
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Any, Optional, Set, Tuple
+from agent.core.artifacts import get_artifact_store, is_handle
+from agent.core.checkpoint import CheckpointStore, step_fingerprint
+from agent.core.dag import WorkflowDAG
+from agent.core.deadline import DeadlineExceeded, deadline_scope, resolve_deadline, run_with_deadline
+from agent.core.job_queue import QueueBackend
+from agent.core.latency import LatencyEstimator
 from agent.core.llm import core_llm
+from agent.core.plan_cache import PlanCache
+from agent.utils.config import config
 from agent.utils.logger import Logger
 
 
@@ -14,21 +26,48 @@ logger = Logger(__name__)
 class CoordinatorAgent:
     """主控Agent - 协调专业Agent"""
 
-    def __init__(self):
+    def __init__(self, max_concurrency: Optional[int] = None, backend: Optional[QueueBackend] = None):
         """初始化协调器"""
         self.agents = {}
+        self.agent_limits: Dict[str, int] = {}
+        self.max_concurrency = max_concurrency or config.WORKFLOW_MAX_CONCURRENCY
+        self.latency = LatencyEstimator()
+        self.checkpoints = CheckpointStore(config.WORKFLOW_CHECKPOINT_PATH)
+        self.plan_cache = PlanCache()
+        self.artifacts = get_artifact_store()
+
+        # 队列后端：步骤由worker进程执行，本进程只负责调度
+        if backend is None and config.WORKFLOW_BACKEND == 'queue':
+            backend = QueueBackend()
+        self.backend = backend
         logger.info("主控Agent初始化完成")
 
-    def register_agent(self, name: str, agent: Any):
+    def register_agent(self, name: str, agent: Any, max_concurrency: Optional[int] = None):
         """注册专业Agent"""
         self.agents[name] = agent
+        self.agent_limits[name] = max_concurrency or config.WORKFLOW_AGENT_CONCURRENCY
         logger.debug(f"Agent已注册: {name}")
 
     async def plan_workflow(
         self,
-        task_description: str
+        task_description: str,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
-        """规划工作流"""
+        """规划工作流（优先复用缓存的规划，未命中再调用LLM，相似任务的规划作为参考）"""
+        reference = None
+        if use_cache:
+            cached = self.plan_cache.lookup(task_description)
+            if cached is not None:
+                return cached
+            reference = self.plan_cache.find_similar(task_description)
+
+        reference_section = ""
+        if reference is not None:
+            reference_section = f"""
+
+参考：以下是一个相似任务的已有规划，请逐步核对并按本任务调整，不要照搬与本任务无关的内容：
+{json.dumps(reference, ensure_ascii=False)}"""
+
         prompt = f"""请为以下任务规划详细的工作流：
 
 任务描述：{task_description}
@@ -41,7 +80,7 @@ class CoordinatorAgent:
 请输出工作流规划，包括：
 1. 任务分解步骤
 2. 每个步骤的执行Agent
-3. 步骤间的依赖关系
+3. 步骤间的依赖关系{reference_section}
 
 请以JSON格式输出。"""
 
@@ -72,64 +111,332 @@ class CoordinatorAgent:
         )
 
         logger.info(f"工作流规划完成: {len(workflow['steps'])}个步骤")
+
+        if use_cache:
+            try:
+                WorkflowDAG(workflow['steps'])
+                self.plan_cache.store(task_description, workflow)
+            except ValueError as e:
+                logger.warning(f"规划不合法，不缓存: {e}")
+
         return workflow
 
     async def execute_workflow(
         self,
         steps: List[Dict[str, Any]],
-        context: Dict[str, Any] = None
+        context: Dict[str, Any] = None,
+        workflow_id: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
-        """执行工作流"""
-        logger.info("开始执行工作流")
-
-        results = {}
-        completed_steps = set()
-        pending_steps = steps.copy()
-
-        max_iterations = 10
-        iteration = 0
-
-        while pending_steps and iteration < max_iterations:
-            iteration += 1
-            progress_made = False
-
-            for step in pending_steps[:]:
-                # 检查依赖是否完成
-                dependencies = step.get('dependencies', [])
-                if not all(dep in completed_steps for dep in dependencies):
-                    continue
-
-                # 执行步骤
-                try:
-                    logger.info(f"执行步骤: {step['name']}")
-                    agent_name = step['agent']
-                    agent = self.agents.get(agent_name)
-
-                    if not agent:
-                        logger.warning(f"Agent {agent_name} 不存在")
-                        pending_steps.remove(step)
-                        continue
-
-                    # 执行Agent任务
-                    result = await agent['execute'](
-                        step.get('description', ''),
-                        context
+        """执行工作流，全部步骤结束后返回汇总结果"""
+        summary = None
+        async for event in self.execute_workflow_stream(steps, context, workflow_id, timeout):
+            if event['type'] == 'workflow_completed':
+                summary = event['summary']
+        return summary
+
+    async def execute_workflow_stream(
+        self,
+        steps: List[Dict[str, Any]],
+        context: Dict[str, Any] = None,
+        workflow_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流式执行工作流：无依赖关系的步骤并发执行，关键路径长的步骤优先
+
+        依次产出 workflow_started、step_started、step_completed、step_failed、
+        step_skipped 事件，最后产出带汇总结果的 workflow_completed 事件。
+        每个完成的步骤按workflow_id和输入指纹记录检查点，
+        以相同workflow_id重新执行时跳过已完成的步骤。
+        截止时间（timeout与外层请求截止时间取早者）传递给每个步骤；
+        标记 critical: false 的步骤超时后记为timeout结果而不是失败，下游照常执行；
+        Agent自身在截止前降级返回的部分结果（partial: true）原样保留。
+        超过ARTIFACT_MIN_BYTES的步骤结果在检查点和step_completed事件中以句柄表示
+        （用 artifacts.resolve() 展开），workflow_completed汇总中的结果已展开。
+        """
+        workflow_id = workflow_id or f"wf_{uuid.uuid4().hex[:12]}"
+        deadline = resolve_deadline(timeout)
+        logger.info(f"开始执行工作流: {workflow_id}")
+
+        dag = WorkflowDAG(steps)
+        self.checkpoints.save_workflow(workflow_id, steps, context)
+
+        # 按拓扑序计算指纹，上游变化会使下游检查点失效
+        fingerprints: Dict[str, str] = {}
+        for step_id in dag.order:
+            step = dag.steps[step_id]
+            fingerprints[step_id] = step_fingerprint(
+                step,
+                context,
+                [fingerprints[dep] for dep in sorted(step.get('dependencies') or [])]
+            )
+
+        # 中间结果已被清理的检查点无法恢复，对应步骤重新执行
+        results = {
+            step_id: result
+            for step_id, result in self.checkpoints.load_results(workflow_id, fingerprints).items()
+            if not is_handle(result) or self.artifacts.exists(result)
+        }
+        completed_steps = set(results)
+        failed_steps = set()
+        skipped_steps = set()
+        step_seconds: Dict[str, float] = {}
+
+        for step_id in dag.order:
+            if step_id in completed_steps:
+                dag.complete(step_id)
+        if completed_steps:
+            logger.info(f"从检查点恢复 {len(completed_steps)} 个步骤")
+
+        # 按历史耗时估计计算剩余关键路径，作为就绪步骤的优先级
+        durations = {
+            step_id: 0.0 if step_id in completed_steps else self.latency.estimate(step)
+            for step_id, step in dag.steps.items()
+        }
+        priority = dag.critical_path(durations)
+        predicted_makespan = self._predict_makespan(dag, durations, priority, completed_steps)
+
+        yield {
+            'type': 'workflow_started',
+            'workflow_id': workflow_id,
+            'total_steps': len(dag.steps),
+            'restored': sorted(completed_steps),
+            'predicted_makespan': predicted_makespan
+        }
+        for step_id in dag.order:
+            if step_id in completed_steps:
+                yield self._step_event('step_completed', workflow_id, dag.steps[step_id],
+                                       result=results[step_id], elapsed=0.0, restored=True)
+
+        ready = self._ready_heap(
+            dag,
+            [step_id for step_id in dag.ready() if step_id not in completed_steps],
+            priority
+        )
+        running: Dict[asyncio.Task, Tuple[str, float]] = {}
+        agent_running: Dict[str, int] = {}
+        started_at = time.monotonic()
+
+        try:
+            while ready or running:
+                for step_id in self._pop_launchable(ready, len(running), agent_running, dag):
+                    logger.info(f"执行步骤: {dag.steps[step_id]['name']}")
+                    task = asyncio.create_task(
+                        self._run_step(dag.steps[step_id], context, deadline)
                     )
+                    running[task] = (step_id, time.monotonic())
+                    yield self._step_event('step_started', workflow_id, dag.steps[step_id])
 
-                    results[step['id']] = result
-                    completed_steps.add(step['id'])
-                    pending_steps.remove(step)
-                    progress_made = True
+                if not running:
+                    break
 
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    step_id, step_started = running.pop(task)
+                    step = dag.steps[step_id]
+                    agent_running[step['agent']] -= 1
+                    step_seconds[step_id] = time.monotonic() - step_started
+
+                    timed_out = False
+                    try:
+                        results[step_id] = task.result()
+                    except Exception as e:
+                        if isinstance(e, DeadlineExceeded) and not step.get('critical', True):
+                            # 非关键步骤超时且未产出结果：记为timeout，下游照常执行
+                            logger.warning(f"非关键步骤超时，无结果: {step['name']}")
+                            results[step_id] = {'status': 'timeout', 'error': str(e)}
+                            timed_out = True
+                        else:
+                            logger.error(f"步骤失败: {step['name']}, 错误: {e}")
+                            failed_steps.add(step_id)
+                            yield self._step_event('step_failed', workflow_id, step,
+                                                   error=str(e), elapsed=step_seconds[step_id])
+
+                            skipped = dag.fail(step_id, completed_steps) - skipped_steps
+                            if skipped:
+                                logger.warning(f"跳过下游步骤: {', '.join(sorted(skipped))}")
+                            skipped_steps |= skipped
+                            for skipped_id in sorted(skipped, key=dag.position.get):
+                                yield self._step_event('step_skipped', workflow_id, dag.steps[skipped_id],
+                                                       reason=f"依赖步骤失败: {step_id}")
+                            continue
+
+                    completed_steps.add(step_id)
+                    partial = timed_out or self._is_partial(results[step_id])
+                    # 大结果落盘，results和检查点中只保留句柄
+                    results[step_id] = self.artifacts.maybe_put(results[step_id])
+                    if not partial:
+                        self.checkpoints.save_result(
+                            workflow_id, step_id, fingerprints[step_id], results[step_id]
+                        )
+                        self.latency.observe(step, step_seconds[step_id])
+                    # 从检查点恢复的下游步骤已有结果，上游重跑后不再调度
+                    newly_ready = [dependent for dependent in dag.complete(step_id) if dependent not in completed_steps]
+                    for dependent in self._ready_heap(dag, newly_ready, priority):
+                        heapq.heappush(ready, dependent)
                     logger.info(f"步骤完成: {step['name']}")
+                    yield self._step_event('step_completed', workflow_id, step,
+                                           result=results[step_id], elapsed=step_seconds[step_id])
+        finally:
+            # 调用方提前停止迭代时取消仍在执行的步骤
+            for task in running:
+                task.cancel()
 
-                except Exception as e:
-                    logger.error(f"步骤失败: {step['name']}, 错误: {e}")
-                    pending_steps.remove(step)
+        actual_makespan = time.monotonic() - started_at
+        self.latency.save()
+        self.plan_cache.flush()
+        self.checkpoints.set_status(
+            workflow_id, 'failed' if failed_steps or skipped_steps else 'completed'
+        )
+        await asyncio.to_thread(self.artifacts.maybe_sweep)
+        # 句柄只在检查点和事件中流转，返回给调用方的汇总展开为实际内容
+        results = await asyncio.to_thread(self.artifacts.resolve, results)
 
-            if not progress_made:
-                logger.warning("工作流无法继续，存在循环依赖")
+        logger.info(f"工作流执行完成: {len(completed_steps)}/{len(steps)}")
+        logger.info(f"工作流耗时: 预测 {predicted_makespan:.2f}s, 实际 {actual_makespan:.2f}s")
+        yield {
+            'type': 'workflow_completed',
+            'workflow_id': workflow_id,
+            'summary': {
+                'workflow_id': workflow_id,
+                'results': results,
+                'completed': completed_steps,
+                'failed': failed_steps,
+                'skipped': skipped_steps,
+                'timing': {
+                    'predicted_makespan': predicted_makespan,
+                    'actual_makespan': actual_makespan,
+                    'critical_path': max(priority.values(), default=0.0),
+                    'steps': step_seconds
+                }
+            }
+        }
+
+    @staticmethod
+    def _step_event(event_type: str, workflow_id: str, step: Dict[str, Any], **fields) -> Dict[str, Any]:
+        """构造步骤事件"""
+        return {
+            'type': event_type,
+            'workflow_id': workflow_id,
+            'step_id': step['id'],
+            'name': step.get('name'),
+            'agent': step.get('agent'),
+            'timestamp': time.time(),
+            **fields
+        }
+
+    @staticmethod
+    def _ready_heap(
+        dag: WorkflowDAG,
+        step_ids: List[str],
+        priority: Dict[str, float]
+    ) -> List[Tuple[float, int, str]]:
+        """就绪步骤按剩余关键路径降序排列（拓扑序打破平局）"""
+        heap = [(-priority[step_id], dag.position[step_id], step_id) for step_id in step_ids]
+        heapq.heapify(heap)
+        return heap
+
+    def _pop_launchable(
+        self,
+        ready: List[Tuple[float, int, str]],
+        running_count: int,
+        agent_running: Dict[str, int],
+        dag: WorkflowDAG
+    ) -> List[str]:
+        """在全局和单Agent并发上限内按优先级取出可启动的步骤"""
+        launch = []
+        deferred = []
+
+        while ready and running_count + len(launch) < self.max_concurrency:
+            item = heapq.heappop(ready)
+            agent_name = dag.steps[item[2]]['agent']
+
+            if agent_running.get(agent_name, 0) >= self.agent_limits.get(
+                agent_name, config.WORKFLOW_AGENT_CONCURRENCY
+            ):
+                deferred.append(item)
+                continue
+
+            agent_running[agent_name] = agent_running.get(agent_name, 0) + 1
+            launch.append(item[2])
+
+        for item in deferred:
+            heapq.heappush(ready, item)
+
+        return launch
+
+    def _predict_makespan(
+        self,
+        dag: WorkflowDAG,
+        durations: Dict[str, float],
+        priority: Dict[str, float],
+        completed: Set[str]
+    ) -> float:
+        """按相同调度策略用估计耗时模拟执行，预测总耗时"""
+        pending = dict(dag.pending_deps)
+        ready = self._ready_heap(
+            dag,
+            [step_id for step_id in dag.ready() if step_id not in completed],
+            priority
+        )
+        running: List[Tuple[float, str]] = []
+        agent_running: Dict[str, int] = {}
+        now = 0.0
+
+        while ready or running:
+            for step_id in self._pop_launchable(ready, len(running), agent_running, dag):
+                heapq.heappush(running, (now + durations[step_id], step_id))
+
+            if not running:
                 break
 
-        logger.info(f"工作流执行完成: {len(completed_steps)}/{len(steps)}")
-        return {'results': results, 'completed': completed_steps}
+            now, step_id = heapq.heappop(running)
+            agent_running[dag.steps[step_id]['agent']] -= 1
+
+            for dependent in dag.dependents[step_id]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0 and dependent not in completed:
+                    heapq.heappush(
+                        ready, (-priority[dependent], dag.position[dependent], dependent)
+                    )
+
+        return now
+
+    async def resume(self, workflow_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """恢复工作流：只重跑失败或缺失的步骤（进程重启后同样有效）"""
+        saved = self.checkpoints.load_workflow(workflow_id)
+        if not saved:
+            raise KeyError(f"工作流不存在: {workflow_id}")
+
+        logger.info(f"恢复工作流: {workflow_id} (上次状态: {saved['status']})")
+        return await self.execute_workflow(saved['steps'], saved['context'], workflow_id, timeout)
+
+    async def _run_step(
+        self,
+        step: Dict[str, Any],
+        context: Optional[Dict[str, Any]],
+        deadline: Optional[float] = None
+    ) -> Any:
+        """在工作流截止时间和步骤timeout内调用步骤对应的Agent"""
+        agent_name = step['agent']
+        if self.backend is not None:
+            with deadline_scope(deadline=deadline):
+                return await run_with_deadline(self.backend.run(step, context), step.get('timeout'))
+
+        agent = self.agents.get(agent_name)
+
+        if not agent:
+            raise LookupError(f"Agent {agent_name} 不存在")
+
+        execute = agent['execute'] if isinstance(agent, dict) else agent.execute
+        with deadline_scope(deadline=deadline):
+            return await run_with_deadline(
+                execute(step.get('description', ''), context),
+                step.get('timeout')
+            )
+
+    @staticmethod
+    def _is_partial(result: Any) -> bool:
+        """部分结果不写检查点，恢复时会重跑"""
+        return isinstance(result, dict) and result.get('partial') is True
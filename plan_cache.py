@@ -0,0 +1,243 @@
+"""
+工作流规划缓存 - 精确/模板匹配的任务复用已规划的步骤DAG，相似任务的规划作为重新规划的参考
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from agent.core.bm25 import tokenize
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+# 任务参数：引号内的内容，或含数字的编号/数量（订单号、SKU、金额等）
+_PARAM_PATTERN = re.compile(
+    r'[“"「『]([^”"」』]+)[”"」』]|([A-Za-z0-9_\-]*\d[A-Za-z0-9_\-.%]*)'
+)
+
+
+def extract_parameters(text: str) -> Tuple[str, List[str]]:
+    """提取任务参数，返回（模板文本, 参数列表）"""
+    params: List[str] = []
+
+    def replace(match) -> str:
+        params.append(match.group(1) or match.group(2))
+        return f"{{{{p{len(params) - 1}}}}}"
+
+    template = _PARAM_PATTERN.sub(replace, ' '.join(text.split()))
+    return template.lower(), params
+
+
+def _key(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+# 结构性字段不做参数替换，保证DAG结构不变
+_STRUCTURAL_FIELDS = {'id', 'agent', 'dependencies'}
+
+
+def _map_strings(value: Any, func) -> Any:
+    """对嵌套结构中的字符串逐一变换"""
+    if isinstance(value, str):
+        return func(value)
+    if isinstance(value, list):
+        return [_map_strings(item, func) for item in value]
+    if isinstance(value, dict):
+        return {key: _map_strings(item, func) for key, item in value.items()}
+    return value
+
+
+def _map_workflow(workflow: Dict[str, Any], func) -> Dict[str, Any]:
+    """对工作流各步骤的非结构性字段做字符串变换"""
+    result = copy.deepcopy(workflow)
+    result['steps'] = [
+        {
+            key: value if key in _STRUCTURAL_FIELDS else _map_strings(value, func)
+            for key, value in step.items()
+        }
+        for step in workflow.get('steps', [])
+    ]
+    return result
+
+
+def _substituter(params: List[str]):
+    def substitute(text: str) -> str:
+        for index, value in enumerate(params):
+            text = text.replace(f"{{{{p{index}}}}}", value)
+        return text
+    return substitute
+
+
+class PlanCache:
+    """工作流规划缓存
+
+    新规划在store()时立即落盘；命中只更新内存中的使用统计，
+    距上次保存超过PLAN_CACHE_SAVE_INTERVAL秒时或调用flush()时才落盘。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        similarity: Optional[float] = None
+    ):
+        """初始化缓存并加载持久化数据"""
+        self.path = Path(path or config.PLAN_CACHE_PATH)
+        self.max_entries = max_entries or config.PLAN_CACHE_MAX_ENTRIES
+        self.similarity = similarity or config.PLAN_CACHE_SIMILARITY
+
+        self.entries: Dict[str, Dict[str, Any]] = {}  # 模板key -> 条目
+        self.exact: Dict[str, str] = {}  # 原文key -> 模板key
+        self._token_sets: Dict[str, set] = {}
+        # similar为未命中时找到相似规划作为参考的次数（计入miss）
+        self.stats = {'exact': 0, 'template': 0, 'miss': 0, 'similar': 0}
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except Exception as e:
+            logger.warning(f"规划缓存加载失败: {e}")
+            return
+
+        self.entries = data.get('entries', {})
+        self.exact = data.get('exact', {})
+        for key, entry in self.entries.items():
+            self._token_sets[key] = set(tokenize(entry['template']))
+
+    def save(self):
+        """持久化缓存（写临时文件后替换，避免中断时留下不完整的文件）"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            temp_path.write_text(
+                json.dumps({'entries': self.entries, 'exact': self.exact}, ensure_ascii=False),
+                encoding='utf-8'
+            )
+            os.replace(temp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.warning(f"规划缓存保存失败: {e}")
+        self._last_save = time.monotonic()
+
+    def flush(self):
+        """保存尚未落盘的命中统计"""
+        if self._dirty:
+            self.save()
+
+    def lookup(self, task_description: str) -> Optional[Dict[str, Any]]:
+        """查找可直接复用的工作流规划（原文或参数化模板完全一致），未命中返回None
+
+        只有模板一致时替换参数才能得到本任务的规划；相似但不一致的任务见find_similar。
+        """
+        template, params = extract_parameters(task_description)
+
+        template_key = self.exact.get(_key(' '.join(task_description.split())))
+        kind = 'exact'
+
+        if template_key is None and _key(template) in self.entries:
+            template_key = _key(template)
+            kind = 'template'
+
+        entry = self.entries.get(template_key) if template_key else None
+        if entry is None or len(entry['params']) != len(params):
+            self.stats['miss'] += 1
+            return None
+
+        entry['hits'] += 1
+        entry['last_used'] = time.time()
+        self.stats[kind] += 1
+        self._dirty = True
+        if time.monotonic() - self._last_save >= config.PLAN_CACHE_SAVE_INTERVAL:
+            self.save()
+        logger.info(f"规划缓存命中({kind}): {entry['template'][:40]}")
+
+        return _map_workflow(entry['workflow'], _substituter(params))
+
+    def find_similar(self, task_description: str) -> Optional[Dict[str, Any]]:
+        """查找相似任务的已有规划（保留其原始参数），只能作为重新规划时的参考"""
+        template, _ = extract_parameters(task_description)
+        template_key = self._most_similar(template)
+        if template_key is None:
+            return None
+
+        entry = self.entries[template_key]
+        self.stats['similar'] += 1
+        logger.info(f"规划缓存找到相似规划: {entry['template'][:40]}")
+        return _map_workflow(entry['workflow'], _substituter(entry['params']))
+
+    def _most_similar(self, template: str) -> Optional[str]:
+        """按字符n-gram的Dice系数查找最相近的模板"""
+        tokens = set(tokenize(template))
+        if not tokens:
+            return None
+
+        best_key, best_score = None, 0.0
+        for key, entry_tokens in self._token_sets.items():
+            score = 2 * len(tokens & entry_tokens) / (len(tokens) + len(entry_tokens))
+            if score > best_score:
+                best_key, best_score = key, score
+
+        return best_key if best_score >= self.similarity else None
+
+    def store(self, task_description: str, workflow: Dict[str, Any]):
+        """缓存工作流规划，参数值替换为占位符"""
+        template, params = extract_parameters(task_description)
+        template_key = _key(template)
+
+        # 长参数先替换，避免短参数误替换其中一部分；不拆分字母数字串
+        patterns = [
+            (index, re.compile(rf'(?<![A-Za-z0-9]){re.escape(value)}(?![A-Za-z0-9])'))
+            for index, value in sorted(enumerate(params), key=lambda item: len(item[1]), reverse=True)
+        ]
+
+        def parameterize(text: str) -> str:
+            for index, pattern in patterns:
+                text = pattern.sub(f"{{{{p{index}}}}}", text)
+            return text
+
+        self.entries[template_key] = {
+            'template': template,
+            'params': params,
+            'workflow': _map_workflow(workflow, parameterize),
+            'hits': 0,
+            'last_used': time.time()
+        }
+        self.exact[_key(' '.join(task_description.split()))] = template_key
+        self._token_sets[template_key] = set(tokenize(template))
+
+        self._evict()
+        self.save()
+
+    def _evict(self):
+        """超出容量时淘汰最久未使用的条目"""
+        if len(self.entries) <= self.max_entries:
+            return
+
+        victims = sorted(self.entries, key=lambda key: self.entries[key]['last_used'])
+        for key in victims[:len(self.entries) - self.max_entries]:
+            del self.entries[key]
+            del self._token_sets[key]
+
+        self.exact = {text: key for text, key in self.exact.items() if key in self.entries}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        lookups = self.stats['exact'] + self.stats['template'] + self.stats['miss']
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'hit_rate': (lookups - self.stats['miss']) / lookups if lookups else 0.0
+        }
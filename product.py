@@ -2,7 +2,9 @@
 Level 3: 产品经理Agent
 """
 
+from agent.core.deadline import DeadlineExceeded, check_deadline, reserve, run_with_deadline
 from agent.core.llm import core_llm
+from agent.utils.config import config
 from agent.utils.logger import Logger
 
 
@@ -39,8 +41,15 @@ class ProductManagerAgent:
         # 步骤3: 生成PRD
         prd = await self._generate_prd(synthesis, initial_requirement)
 
-        # 步骤4: 校验
-        validation = await self._validate_prd_logic(prd)
+        # 步骤4: 校验（非关键步骤，超时则返回未校验的PRD；提前到期以便在外层超时前返回）
+        partial = False
+        try:
+            with reserve(config.DEADLINE_FALLBACK_MARGIN_SECONDS):
+                validation = await run_with_deadline(self._validate_prd_logic(prd))
+        except DeadlineExceeded:
+            logger.warning("PRD校验超时，返回未校验的PRD")
+            validation = {'isValid': None, 'issues': [], 'score': None}
+            partial = True
 
         logger.info("产品经理工作流完成")
 
@@ -48,7 +57,8 @@ class ProductManagerAgent:
             'interrogation': interrogation,
             'synthesis': synthesis,
             'prd': prd,
-            'validation': validation
+            'validation': validation,
+            'partial': partial
         }
 
     async def _interrogation(self, initial_requirement: str) -> dict:
@@ -191,6 +201,7 @@ PRD：{prd}
 
     async def execute(self, input_data: str, context: dict = None) -> dict:
         """执行任务"""
+        check_deadline()
         if context and context.get('workflow') == 'full':
             return await self.run_full_workflow(input_data)
         return {'status': 'unknown task type'}
@@ -2,7 +2,9 @@
 Level 2: 小红书RedNote-Agent
 """
 
+from agent.core.deadline import DeadlineExceeded, check_deadline, reserve, run_with_deadline
 from agent.core.llm import core_llm
+from agent.utils.config import config
 from agent.utils.logger import Logger
 
 
@@ -39,8 +41,15 @@ class RedNoteAgent:
         # 步骤4: 生成
         draft = await self._generate_draft(strategy, product_info)
 
-        # 步骤5: 优化
-        optimized = await self._optimize_draft(draft, analysis)
+        # 步骤5: 优化（非关键步骤，超时则返回初稿；提前到期以便在外层超时前返回）
+        partial = False
+        try:
+            with reserve(config.DEADLINE_FALLBACK_MARGIN_SECONDS):
+                optimized = await run_with_deadline(self._optimize_draft(draft, analysis))
+        except DeadlineExceeded:
+            logger.warning("文案优化超时，返回未优化的初稿")
+            optimized = draft
+            partial = True
 
         logger.info("小红书创作工作流完成")
 
@@ -49,7 +58,8 @@ class RedNoteAgent:
             'analysis': analysis,
             'strategy': strategy,
             'draft': draft,
-            'optimized_draft': optimized
+            'optimized_draft': optimized,
+            'partial': partial
         }
 
     async def _analyze_trending_notes(self, search_query: str) -> dict:
@@ -180,6 +190,7 @@ class RedNoteAgent:
 
     async def execute(self, input_data: str, context: dict = None) -> dict:
         """执行任务"""
+        check_deadline()
         if context and context.get('workflow') == 'full':
             return await self.run_full_workflow(input_data, context.get('product_info', {}))
         return {'status': 'unknown task type'}
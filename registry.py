@@ -3,8 +3,17 @@
 """
 
 import asyncio
+import copy
 import json
-from typing import Dict, Any, Callable, Optional
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional, Union
+from agent.tools.executor import EXECUTION_MODES, ToolExecutor
+from agent.tools.expression import calculate
+from agent.tools.http_client import get_http_client
+from agent.tools.schema import CompiledSchema, ToolArgumentError
+from agent.tools.search import get_search_backend
+from agent.tools.tool_cache import ToolResultCache, cache_key
+from agent.utils.config import config
 from agent.utils.logger import Logger
 
 
@@ -17,6 +26,11 @@ class ToolRegistry:
     def __init__(self):
         """初始化注册表"""
         self.tools: Dict[str, Dict[str, Any]] = {}
+        self.cache = ToolResultCache()
+        self.executor = ToolExecutor()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._definitions: Optional[List[Dict[str, Any]]] = None
+        self.validation_errors: Dict[str, int] = {}
         self._register_default_tools()
         logger.info(f"工具注册表初始化完成: {len(self.tools)}个工具")
 
@@ -25,9 +39,25 @@ class ToolRegistry:
         name: str,
         description: str,
         parameters: Dict[str, Any],
-        handler: Callable
+        handler: Callable,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        cache_ttl: Optional[float] = None,
+        idempotent: Union[bool, Callable[[Dict[str, Any]], bool], None] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+        mode: str = 'inline'
     ):
-        """注册工具"""
+        """注册工具
+
+        max_concurrency限制该工具的同时执行数；idempotent声明相同参数的调用结果相同
+        （可传入按参数判断的函数），并发的相同调用会合并为一次执行；cache_ttl>0时
+        幂等调用的结果缓存cache_ttl秒，cacheable按结果判断是否写入缓存（如只缓存成功的响应）。mode为执行模式：inline在事件循环中执行，
+        thread在线程池中执行，process在可强制终止的进程池中执行（handler须为
+        可pickle的模块级函数）。parameters在注册时编译为校验函数，执行前校验参数、
+        填充默认值并做宽松类型转换。
+        """
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"不支持的执行模式: {mode}")
         if name in self.tools:
             logger.warning(f"工具 {name} 已存在，将被覆盖")
 
@@ -35,8 +65,17 @@ class ToolRegistry:
             'name': name,
             'description': description,
             'parameters': parameters,
-            'handler': handler
+            'validator': CompiledSchema(name, parameters),
+            'handler': handler,
+            'timeout': timeout,
+            'max_concurrency': max_concurrency,
+            'semaphore': asyncio.Semaphore(max_concurrency) if max_concurrency else None,
+            'cache_ttl': cache_ttl,
+            'idempotent': bool(cache_ttl) if idempotent is None else idempotent,
+            'cacheable': cacheable,
+            'mode': mode
         }
+        self._definitions = None
 
         logger.debug(f"工具已注册: {name}")
 
@@ -49,45 +88,112 @@ class ToolRegistry:
         return self.tools.copy()
 
     def get_definitions(self) -> List[Dict[str, Any]]:
-        """获取工具的OpenAI Function Calling格式"""
-        return [
-            {
-                'type': 'function',
-                'function': {
-                    'name': tool['name'],
-                    'description': tool['description'],
-                    'parameters': tool['parameters']
+        """获取工具的OpenAI Function Calling格式（缓存至注册表变更）"""
+        if self._definitions is None:
+            self._definitions = [
+                {
+                    'type': 'function',
+                    'function': {
+                        'name': tool['name'],
+                        'description': tool['description'],
+                        'parameters': tool['parameters']
+                    }
                 }
-            }
-            for tool in self.tools.values()
-        ]
+                for tool in self.tools.values()
+            ]
+        return list(self._definitions)
 
     async def execute(
         self,
         name: str,
         arguments: Dict[str, Any]
     ) -> Any:
-        """执行工具"""
+        """执行工具（幂等调用走缓存并合并并发的相同调用）"""
         tool = self.tools.get(name)
 
         if not tool:
             raise ValueError(f"工具 {name} 不存在")
 
+        # 规范化后的参数同时用于缓存键，默认值省略与否命中同一缓存
+        try:
+            arguments = tool['validator'].validate(arguments)
+        except ToolArgumentError as e:
+            self.validation_errors[name] = self.validation_errors.get(name, 0) + 1
+            logger.warning(str(e))
+            raise
+
+        idempotent = tool['idempotent']
+        if callable(idempotent):
+            idempotent = idempotent(arguments)
+        if not idempotent:
+            return await self._invoke(tool, arguments)
+
+        key = cache_key(name, arguments)
+        if tool['cache_ttl']:
+            hit, value = self.cache.get(key)
+            if hit:
+                self.cache.record(name, 'hits')
+                logger.debug(f"工具缓存命中: {name}")
+                return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.cache.record(name, 'misses')
+            task = asyncio.ensure_future(self._invoke_and_store(tool, arguments, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._settle(key, done))
+        else:
+            self.cache.record(name, 'coalesced')
+            logger.debug(f"合并进行中的相同调用: {name}")
+
+        # 共享执行不随单个调用方取消；结果复制后返回，避免调用方之间相互修改
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _invoke_and_store(self, tool: Dict[str, Any], arguments: Dict[str, Any], key: str) -> Any:
+        result = await self._invoke(tool, arguments)
+        if tool['cache_ttl'] and (tool['cacheable'] is None or tool['cacheable'](result)):
+            self.cache.put(tool['name'], key, result, tool['cache_ttl'])
+        return result
+
+    def _settle(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # 所有调用方都已取消时也取走异常，避免未处理异常告警
+            task.exception()
+
+    async def _invoke(self, tool: Dict[str, Any], arguments: Dict[str, Any]) -> Any:
+        """实际执行工具（受并发限制和超时约束）"""
+        name = tool['name']
         try:
             logger.info(f"执行工具: {name}", arguments=arguments)
-            result = await tool['handler'](arguments)
+            if tool['semaphore'] is None:
+                result = await self._run(tool, arguments)
+            else:
+                async with tool['semaphore']:
+                    result = await self._run(tool, arguments)
             logger.debug(f"工具执行完成: {name}")
             return result
         except Exception as e:
             logger.error(f"工具执行失败: {name}, 错误: {e}")
             raise
 
+    def get_executor_stats(self) -> Dict[str, Any]:
+        """各执行模式的排队/执行/超时统计、进程池状态和事件循环延迟"""
+        return self.executor.get_stats()
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按工具统计缓存命中、合并和实际执行次数"""
+        return self.cache.get_stats()
+
+    async def _run(self, tool: Dict[str, Any], arguments: Dict[str, Any]) -> Any:
+        return await self.executor.run(tool, arguments)
+
     def _register_default_tools(self):
         """注册默认工具集"""
         # 搜索工具
         self.register(
             name='search_web',
-            description='在网络上搜索信息',
+            description='检索信息（默认检索本地语料库）',
             parameters={
                 'type': 'object',
                 'properties': {
@@ -103,7 +209,8 @@ class ToolRegistry:
                 },
                 'required': ['query']
             },
-            handler=lambda args: self._mock_search(args)
+            handler=lambda args: self._search(args),
+            cache_ttl=config.TOOL_SEARCH_CACHE_TTL
         )
 
         # HTTP请求工具
@@ -116,63 +223,69 @@ class ToolRegistry:
                     'url': {'type': 'string', 'description': '请求的URL'},
                     'method': {
                         'type': 'string',
-                        'enum': ['GET', 'POST', 'PUT', 'DELETE'],
+                        'enum': ['GET', 'HEAD', 'POST', 'PUT', 'DELETE'],
                         'description': 'HTTP方法'
                     },
                     'headers': {'type': 'object', 'description': '请求头'},
-                    'body': {'type': 'object', 'description': '请求体'}
+                    'body': {'type': 'object', 'description': '请求体（JSON）'},
+                    'timeout': {'type': 'number', 'description': '超时时间（秒）'},
+                    'max_bytes': {'type': 'number', 'description': '响应体最大字节数（不超过系统上限），超出部分截断'}
                 },
                 'required': ['url', 'method']
             },
-            handler=lambda args: self._mock_http_request(args)
+            handler=lambda args: self._http_request(args),
+            max_concurrency=config.TOOL_HTTP_CONCURRENCY,
+            cache_ttl=config.TOOL_HTTP_CACHE_TTL,
+            idempotent=lambda args: str(args.get('method', 'GET')).upper() in ('GET', 'HEAD'),
+            # 限流、服务端错误等响应不缓存，下次调用重新请求
+            cacheable=lambda result: 200 <= result['status'] < 300 or result['status'] == 304
         )
 
         # 数学计算工具
         self.register(
             name='calculate',
-            description='执行数学计算',
+            description='执行数学计算，支持变量和批量计算（同一表达式对多行数据求值）',
             parameters={
                 'type': 'object',
                 'properties': {
                     'expression': {
                         'type': 'string',
-                        'description': '数学表达式，如 "2 + 3 * 4"'
+                        'description': '数学表达式，如 "2 + 3 * 4"、"price * qty if qty > 0 else 0"'
+                    },
+                    'variables': {
+                        'type': 'object',
+                        'description': '变量取值，如 {"price": 9.9}'
+                    },
+                    'batch': {
+                        'type': 'object',
+                        'description': '批量计算的变量列，如 {"price": [1, 2], "qty": [3, 4]}，返回每行的结果'
                     }
                 },
                 'required': ['expression']
             },
-            handler=lambda args: self._mock_calculate(args)
+            handler=calculate,
+            idempotent=True,
+            mode='process'
         )
 
-    async def _mock_search(self, args: Dict[str, Any]) -> Dict[str, Any]:
-        """模拟搜索（实际场景应调用真实搜索API）"""
-        await asyncio.sleep(0.5)
+    async def _search(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """搜索（后端由SEARCH_BACKEND配置）"""
         return {
-            'results': [
-                {'title': '示例结果1', 'url': 'https://example.com/1', 'snippet': '搜索结果摘要1'},
-                {'title': '示例结果2', 'url': 'https://example.com/2', 'snippet': '搜索结果摘要2'}
-            ],
+            'results': await get_search_backend().search(args['query'], int(args.get('num_results', 10))),
             'query': args.get('query'),
-            'timestamp': '2024-01-09T10:00:00Z'
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
         }
 
-    async def _mock_http_request(self, args: Dict[str, Any]) -> Dict[str, Any]:
-        """模拟HTTP请求（实际场景应发送真实请求）"""
-        await asyncio.sleep(0.3)
-        return {
-            'status': 200,
-            'data': {'message': 'Mock response'},
-            'headers': {'content-type': 'application/json'}
-        }
-
-    async def _mock_calculate(self, args: Dict[str, Any]) -> Dict[str, Any]:
-        """模拟数学计算（实际场景应使用安全计算）"""
-        expression = args.get('expression', '')
-        try:
-            result = eval(expression)
-            return {'expression': expression, 'result': result}
-        except Exception as e:
-            return {'expression': expression, 'error': str(e)}
+    async def _http_request(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """发送HTTP请求（共享连接池，GET响应按ETag/Last-Modified条件请求复用）"""
+        return await get_http_client().request(
+            args['url'],
+            method=args.get('method', 'GET'),
+            headers=args.get('headers'),
+            body=args.get('body'),
+            timeout=args.get('timeout'),
+            max_bytes=int(args['max_bytes']) if args.get('max_bytes') else None
+        )
 
 
 # 全局实例
@@ -0,0 +1,293 @@
+"""
+参数校验 - 将工具的JSON Schema预编译为校验函数（填充默认值、宽松类型转换、紧凑错误信息）
+"""
+
+import copy
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+
+# 返回给模型的错误条数上限
+MAX_REPORTED_ERRORS = 5
+
+_MISSING = object()
+
+# 校验函数：(值, 路径, 错误列表) -> 转换后的值
+Validator = Callable[[Any, str, List[str]], Any]
+
+
+class ToolArgumentError(ValueError):
+    """工具参数不符合Schema"""
+
+    def __init__(self, tool: str, errors: List[str]):
+        self.tool = tool
+        self.errors = errors
+        shown = '; '.join(errors[:MAX_REPORTED_ERRORS])
+        if len(errors) > MAX_REPORTED_ERRORS:
+            shown += f"; 等{len(errors)}处"
+        super().__init__(f"{tool} 参数错误: {shown}")
+
+
+def _join(path: str, key: Any) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else str(key)
+
+
+def _label(path: str) -> str:
+    return path or '参数'
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _coerce_number(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            number = float(value.strip())
+        except ValueError:
+            return _MISSING
+        return int(number) if number.is_integer() and '.' not in value and 'e' not in value.lower() else number
+    return value if _is_number(value) else _MISSING
+
+
+def _coerce_integer(value: Any) -> Any:
+    number = _coerce_number(value)
+    if number is _MISSING:
+        return _MISSING
+    if isinstance(number, float):
+        return int(number) if number.is_integer() else _MISSING
+    return number
+
+
+def _coerce_boolean(value: Any) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    if value in (0, 1) and _is_number(value):
+        return bool(value)
+    return _MISSING
+
+
+def _coerce_string(value: Any) -> Any:
+    if isinstance(value, str):
+        return value
+    if _is_number(value):
+        return str(value)
+    return _MISSING
+
+
+def _coerce_container(kind: type) -> Callable[[Any], Any]:
+    # 模型有时把对象/数组序列化成字符串传入
+    def coerce(value: Any) -> Any:
+        if isinstance(value, kind):
+            return value
+        if isinstance(value, str):
+            try:
+                decoded = json.loads(value)
+            except ValueError:
+                return _MISSING
+            if isinstance(decoded, kind):
+                return decoded
+        return _MISSING
+    return coerce
+
+
+_COERCERS = {
+    'string': _coerce_string,
+    'number': _coerce_number,
+    'integer': _coerce_integer,
+    'boolean': _coerce_boolean,
+    'object': _coerce_container(dict),
+    'array': _coerce_container(list),
+    'null': lambda value: None if value is None else _MISSING,
+}
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """编译Schema为校验函数
+
+    支持 type（含类型列表）、enum、default、properties、required、
+    additionalProperties、items、minimum/maximum、minLength/maxLength、
+    minItems/maxItems；其余关键字忽略。
+    """
+    checks: List[Validator] = []
+
+    types = schema.get('type')
+    if types is not None:
+        checks.append(_compile_type([types] if isinstance(types, str) else list(types)))
+
+    if 'enum' in schema:
+        checks.append(_compile_enum(schema['enum']))
+
+    bounds = _compile_bounds(schema)
+    if bounds is not None:
+        checks.append(bounds)
+
+    if 'properties' in schema or 'required' in schema or 'additionalProperties' in schema:
+        checks.append(_compile_object(schema))
+
+    if 'items' in schema:
+        checks.append(_compile_items(compile_schema(schema['items'])))
+
+    def validate(value: Any, path: str, errors: List[str]) -> Any:
+        for check in checks:
+            before = len(errors)
+            value = check(value, path, errors)
+            if len(errors) > before:
+                break
+        return value
+
+    return validate
+
+
+def _compile_type(types: List[str]) -> Validator:
+    coercers = [(name, _COERCERS[name]) for name in types if name in _COERCERS]
+    expected = '|'.join(types)
+
+    def check(value: Any, path: str, errors: List[str]) -> Any:
+        # 先找无需转换即匹配的类型，再尝试转换
+        for name, _ in coercers:
+            if _matches(name, value):
+                return value
+        for name, coerce in coercers:
+            converted = coerce(value)
+            if converted is not _MISSING:
+                return converted
+        errors.append(f"{_label(path)}: 应为{expected}")
+        return value
+
+    return check
+
+
+def _matches(name: str, value: Any) -> bool:
+    if name == 'integer':
+        return isinstance(value, int) and not isinstance(value, bool)
+    if name == 'number':
+        return _is_number(value)
+    if name == 'string':
+        return isinstance(value, str)
+    if name == 'boolean':
+        return isinstance(value, bool)
+    if name == 'object':
+        return isinstance(value, dict)
+    if name == 'array':
+        return isinstance(value, list)
+    return value is None
+
+
+def _compile_enum(options: List[Any]) -> Validator:
+    lowered = {}
+    for option in options:
+        if isinstance(option, str):
+            lowered.setdefault(option.lower(), []).append(option)
+
+    def check(value: Any, path: str, errors: List[str]) -> Any:
+        if value in options:
+            return value
+        # 字符串枚举忽略大小写（如 get -> GET）
+        if isinstance(value, str) and len(lowered.get(value.lower(), ())) == 1:
+            return lowered[value.lower()][0]
+        errors.append(f"{_label(path)}: 应为{'/'.join(map(str, options))}之一")
+        return value
+
+    return check
+
+
+# 关键字 -> (适用类型, 取值方式, 是否下限, 错误描述)
+_BOUNDS = {
+    'minimum': (_is_number, lambda value: value, True, '不能小于'),
+    'maximum': (_is_number, lambda value: value, False, '不能大于'),
+    'minLength': (lambda value: isinstance(value, str), len, True, '长度不能小于'),
+    'maxLength': (lambda value: isinstance(value, str), len, False, '长度不能大于'),
+    'minItems': (lambda value: isinstance(value, list), len, True, '元素数不能小于'),
+    'maxItems': (lambda value: isinstance(value, list), len, False, '元素数不能大于'),
+}
+
+
+def _compile_bounds(schema: Dict[str, Any]) -> Optional[Validator]:
+    limits = [(*_BOUNDS[keyword], schema[keyword]) for keyword in _BOUNDS if keyword in schema]
+    if not limits:
+        return None
+
+    def check(value: Any, path: str, errors: List[str]) -> Any:
+        for applies, measure, lower, message, limit in limits:
+            if not applies(value):
+                continue
+            size = measure(value)
+            if (size < limit) if lower else (size > limit):
+                errors.append(f"{_label(path)}: {message}{limit}")
+        return value
+
+    return check
+
+
+def _compile_object(schema: Dict[str, Any]) -> Validator:
+    properties = {
+        name: (compile_schema(sub), sub.get('default', _MISSING))
+        for name, sub in schema.get('properties', {}).items()
+    }
+    required = [name for name in schema.get('required', []) if properties.get(name, (None, _MISSING))[1] is _MISSING]
+    additional = schema.get('additionalProperties', True)
+    extra = compile_schema(additional) if isinstance(additional, dict) else None
+
+    def check(value: Any, path: str, errors: List[str]) -> Any:
+        if not isinstance(value, dict):
+            return value
+
+        result = {}
+        for name in required:
+            if value.get(name) is None:
+                errors.append(f"{_join(path, name)}: 缺少必填字段")
+
+        for name, item in value.items():
+            entry = properties.get(name)
+            if entry is not None:
+                # 模型常把可选字段显式传为null，按未传处理
+                if item is None and name not in required:
+                    continue
+                result[name] = entry[0](item, _join(path, name), errors)
+            elif extra is not None:
+                result[name] = extra(item, _join(path, name), errors)
+            elif additional is False:
+                errors.append(f"{_join(path, name)}: 未知字段")
+            else:
+                result[name] = item
+
+        for name, (_, default) in properties.items():
+            if default is not _MISSING and result.get(name) is None:
+                result[name] = copy.deepcopy(default)
+        return result
+
+    return check
+
+
+def _compile_items(item_validator: Validator) -> Validator:
+    def check(value: Any, path: str, errors: List[str]) -> Any:
+        if not isinstance(value, list):
+            return value
+        return [item_validator(item, _join(path, index), errors) for index, item in enumerate(value)]
+
+    return check
+
+
+class CompiledSchema:
+    """编译后的工具参数Schema"""
+
+    def __init__(self, tool: str, schema: Dict[str, Any]):
+        """编译Schema"""
+        self.tool = tool
+        self.schema = schema
+        self._validate = compile_schema(schema)
+
+    def validate(self, arguments: Any) -> Dict[str, Any]:
+        """校验并返回规范化后的参数（填充默认值、转换类型），不合法时抛出ToolArgumentError"""
+        if arguments is None:
+            arguments = {}
+        errors: List[str] = []
+        result = self._validate(arguments, '', errors)
+        if errors:
+            raise ToolArgumentError(self.tool, errors)
+        return result
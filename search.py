@@ -0,0 +1,371 @@
+"""
+本地全文检索 - 目录语料的倒排索引（中文n-gram分词、BM25排序、mmap索引文件、增量重建）
+"""
+
+import asyncio
+import json
+import mmap
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from agent.core.bm25 import BM25Index, bm25_idf, tokenize
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+DOCUMENT_SUFFIXES = ('.txt', '.md', '.markdown', '.json')
+
+# 增量段文档数超过基础段的该比例时合并重建
+COMPACT_RATIO = 0.2
+COMPACT_MIN_DOCS = 200
+
+
+def read_document(path: Path) -> Tuple[str, str]:
+    """读取文档，返回（标题, 正文）"""
+    text = path.read_text(encoding='utf-8', errors='replace')
+
+    if path.suffix == '.json':
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            body = str(data.get('content') or data.get('text') or '')
+            return str(data.get('title') or path.stem), f"{data.get('title', '')}\n{body}"
+
+    for line in text.splitlines():
+        line = line.strip().lstrip('#').strip()
+        if line:
+            return line[:80], text
+    return path.stem, text
+
+
+class LocalSearchEngine:
+    """本地全文检索引擎
+
+    基础段：倒排表写入 postings-<代>.bin（uint32的 (文档号, 词频) 对），查询时mmap映射；
+    词典和文档表写入 meta.json。增量段：自上次合并后新增或修改的文档保存在内存BM25索引中，
+    被修改或删除的基础段文档记为墓碑。增量段过大时合并生成新一代基础段。
+    刷新、合并与查询打分由同一把锁互斥（合并会解除旧倒排文件的映射），摘要在锁外读取。
+    """
+
+    def __init__(
+        self,
+        corpus_dir: Optional[str] = None,
+        index_dir: Optional[str] = None,
+        ngram: int = 2,
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        """初始化引擎并加载已有索引"""
+        self.corpus_dir = Path(corpus_dir or config.SEARCH_CORPUS_PATH)
+        self.index_dir = Path(index_dir or config.SEARCH_INDEX_PATH)
+        self.ngram = ngram
+        self.k1 = k1
+        self.b = b
+
+        # 基础段
+        self.generation = 0
+        self.docs: List[Dict[str, Any]] = []
+        self.lexicon: Dict[str, Tuple[int, int]] = {}
+        self._paths: Dict[str, int] = {}
+        self._lengths = np.zeros(0, dtype=np.float64)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._postings = np.zeros((0, 2), dtype=np.uint32)
+        self._mmap: Optional[mmap.mmap] = None
+        self._file = None
+
+        # 增量段
+        self.delta = BM25Index(k1=k1, b=b, ngram=ngram)
+        self.delta_docs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+        self._load()
+
+    def _load(self):
+        meta_path = self.index_dir / 'meta.json'
+        if not meta_path.exists():
+            return
+
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        self.generation = meta['generation']
+        self.docs = meta['docs']
+        self.lexicon = {term: tuple(entry) for term, entry in meta['lexicon'].items()}
+        self._paths = {doc['path']: doc_id for doc_id, doc in enumerate(self.docs)}
+        self._lengths = np.array([doc['length'] for doc in self.docs], dtype=np.float64)
+        self._deleted = np.zeros(len(self.docs), dtype=bool)
+        self._map(self.index_dir / meta['postings'])
+        logger.info(f"检索索引已加载: {len(self.docs)} 篇文档, {len(self.lexicon)} 个词项")
+
+    def _map(self, path: Path):
+        self._unmap()
+        if path.stat().st_size == 0:
+            self._postings = np.zeros((0, 2), dtype=np.uint32)
+            return
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._postings = np.frombuffer(self._mmap, dtype=np.uint32).reshape(-1, 2)
+
+    def _unmap(self):
+        self._postings = np.zeros((0, 2), dtype=np.uint32)
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def __len__(self) -> int:
+        return int(len(self.docs) - self._deleted.sum()) + len(self.delta)
+
+    def refresh(self) -> Dict[str, int]:
+        """扫描语料目录，增量索引新增/修改的文档，标记删除的文档"""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> Dict[str, int]:
+        current = {}
+        if self.corpus_dir.exists():
+            for path in self.corpus_dir.rglob('*'):
+                if path.suffix.lower() in DOCUMENT_SUFFIXES and path.is_file():
+                    stat = path.stat()
+                    current[str(path.relative_to(self.corpus_dir))] = (stat.st_mtime, stat.st_size)
+
+        changes = {'added': 0, 'updated': 0, 'removed': 0}
+
+        for path, doc_id in self._paths.items():
+            if self._deleted[doc_id]:
+                continue
+            doc = self.docs[doc_id]
+            if current.get(path) != (doc['mtime'], doc['size']):
+                self._deleted[doc_id] = True
+                changes['removed' if path not in current else 'updated'] += 1
+
+        for path in list(self.delta_docs):
+            if path not in current:
+                self.delta.remove(path)
+                del self.delta_docs[path]
+                changes['removed'] += 1
+
+        for path, (mtime, size) in current.items():
+            doc_id = self._paths.get(path)
+            if doc_id is not None and not self._deleted[doc_id]:
+                continue
+            known = self.delta_docs.get(path)
+            if known is not None and (known['mtime'], known['size']) == (mtime, size):
+                continue
+
+            title, text = read_document(self.corpus_dir / path)
+            self.delta.add(path, text)
+            self.delta_docs[path] = {'path': path, 'mtime': mtime, 'size': size, 'title': title}
+            if known is None and doc_id is None:
+                changes['added'] += 1
+            elif known is not None:
+                changes['updated'] += 1
+
+        live_base = len(self.docs) - int(self._deleted.sum())
+        if len(self.delta) > max(COMPACT_MIN_DOCS, COMPACT_RATIO * live_base) or (
+            not live_base and len(self.delta)
+        ):
+            self._compact()
+
+        if any(changes.values()):
+            logger.info(f"检索索引已更新: 新增{changes['added']} 更新{changes['updated']} 删除{changes['removed']}")
+        return changes
+
+    def compact(self):
+        """合并基础段与增量段，写出新一代mmap索引"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        started = time.monotonic()
+        live = np.flatnonzero(~self._deleted)
+        remap = np.zeros(len(self.docs), dtype=np.uint32)
+        remap[live] = np.arange(len(live), dtype=np.uint32)
+        docs = [self.docs[old] for old in live]
+
+        delta_ids = {}
+        for path, info in self.delta_docs.items():
+            delta_ids[path] = len(docs)
+            docs.append({**info, 'length': self.delta.doc_lengths[path]})
+
+        generation = self.generation + 1
+        postings_name = f"postings-{generation}.bin"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        lexicon = {}
+        offset = 0
+        with open(self.index_dir / postings_name, 'wb') as out:
+            for term in sorted(set(self.lexicon) | set(self.delta.postings)):
+                blocks = []
+                entry = self.lexicon.get(term)
+                if entry is not None:
+                    segment = self._postings[entry[0]:entry[0] + entry[1]]
+                    segment = segment[~self._deleted[segment[:, 0]]].copy()
+                    segment[:, 0] = remap[segment[:, 0]]
+                    blocks.append(segment)
+                delta_posting = self.delta.postings.get(term)
+                if delta_posting:
+                    blocks.append(np.array(
+                        [(delta_ids[path], tf) for path, tf in delta_posting.items()], dtype=np.uint32
+                    ))
+
+                count = sum(len(block) for block in blocks)
+                if not count:
+                    continue
+                for block in blocks:
+                    out.write(block.tobytes())
+                lexicon[term] = (offset, count)
+                offset += count
+
+        meta = {'generation': generation, 'postings': postings_name, 'docs': docs, 'lexicon': lexicon}
+        tmp = self.index_dir / 'meta.json.tmp'
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.index_dir / 'meta.json')
+
+        old_postings = self.index_dir / f"postings-{self.generation}.bin"
+        self._unmap()
+        self.delta = BM25Index(k1=self.k1, b=self.b, ngram=self.ngram)
+        self.delta_docs = {}
+        self._load()
+        old_postings.unlink(missing_ok=True)
+
+        logger.info(f"检索索引合并完成: 第{generation}代, 耗时 {time.monotonic() - started:.2f}s")
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """BM25检索"""
+        terms = set(tokenize(query, self.ngram))
+        with self._lock:
+            candidates = self._rank(terms, limit)
+        return [self._result(doc, score, terms) for score, doc in candidates]
+
+    def _rank(self, terms: set, limit: int) -> List[Tuple[float, Dict[str, Any]]]:
+        n_docs = len(self)
+        if not n_docs or limit <= 0:
+            return []
+
+        live = ~self._deleted
+        total_length = float(self._lengths[live].sum()) + self.delta.total_length
+        avg_length = total_length / n_docs
+
+        base_scores = np.zeros(len(self.docs), dtype=np.float64)
+        delta_scores: Counter = Counter()
+
+        for term in terms:
+            entry = self.lexicon.get(term)
+            segment = self._postings[entry[0]:entry[0] + entry[1]] if entry else self._postings[:0]
+            delta_posting = self.delta.postings.get(term, {})
+
+            ids = segment[:, 0].astype(np.int64)
+            mask = live[ids]
+            doc_freq = int(mask.sum()) + len(delta_posting)
+            if not doc_freq:
+                continue
+            idf = bm25_idf(n_docs, doc_freq)
+
+            if len(ids):
+                tf = segment[:, 1].astype(np.float64)
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[ids] / avg_length)
+                base_scores[ids] += np.where(mask, idf * tf * (self.k1 + 1) / (tf + norm), 0.0)
+
+            for path, tf in delta_posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.delta.doc_lengths[path] / avg_length)
+                delta_scores[path] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        candidates: List[Tuple[float, Dict[str, Any]]] = []
+        if len(base_scores):
+            top = np.argpartition(-base_scores, min(limit, len(base_scores)) - 1)[:limit]
+            candidates.extend((float(base_scores[i]), self.docs[i]) for i in top if base_scores[i] > 0)
+        candidates.extend((score, self.delta_docs[path]) for path, score in delta_scores.most_common(limit))
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return candidates[:limit]
+
+    def _result(self, doc: Dict[str, Any], score: float, terms: set) -> Dict[str, Any]:
+        path = self.corpus_dir / doc['path']
+        return {
+            'title': doc['title'],
+            'url': path.resolve().as_uri(),
+            'snippet': self._snippet(path, terms),
+            'score': round(score, 4)
+        }
+
+    @staticmethod
+    def _snippet(path: Path, terms: set, width: int = 120) -> str:
+        """截取首个命中词项附近的正文"""
+        try:
+            text = ' '.join(read_document(path)[1].split())
+        except OSError:
+            return ''
+        lowered = text.lower()
+        positions = [pos for pos in (lowered.find(term) for term in terms) if pos >= 0]
+        start = max(min(positions) - width // 4, 0) if positions else 0
+        return text[start:start + width]
+
+
+class SearchBackend(ABC):
+    """搜索后端接口"""
+
+    @abstractmethod
+    async def search(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        """返回 [{'title', 'url', 'snippet', ...}]"""
+
+
+class MockSearchBackend(SearchBackend):
+    """模拟搜索（固定结果）"""
+
+    async def search(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        await asyncio.sleep(0.5)
+        return [
+            {'title': '示例结果1', 'url': 'https://example.com/1', 'snippet': '搜索结果摘要1'},
+            {'title': '示例结果2', 'url': 'https://example.com/2', 'snippet': '搜索结果摘要2'}
+        ][:num_results]
+
+
+class LocalSearchBackend(SearchBackend):
+    """本地语料检索后端：查询前按间隔增量刷新索引，刷新和查询都在线程中执行"""
+
+    def __init__(self, engine: Optional[LocalSearchEngine] = None, refresh_seconds: Optional[float] = None):
+        """初始化后端"""
+        # 未建索引的引擎长度为0，不能用 or 判断
+        self.engine = engine if engine is not None else LocalSearchEngine()
+        self.refresh_seconds = config.SEARCH_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self._refreshed_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def search(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        await self._ensure_fresh()
+        return await asyncio.to_thread(self.engine.search, query, num_results)
+
+    async def _ensure_fresh(self):
+        # 并发查询共享同一次刷新；调用方被取消时刷新照常完成并记录时间（shield），
+        # 线程中的刷新无法中途停止，不能让它在后台运行时被当作未刷新而再次发起
+        if self._refreshing is None or self._refreshing.done():
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+                return
+            self._refreshing = asyncio.create_task(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self):
+        await asyncio.to_thread(self.engine.refresh)
+        self._refreshed_at = time.monotonic()
+
+
+_search_backend_instance: Optional[SearchBackend] = None
+
+
+def get_search_backend() -> SearchBackend:
+    """按配置获取搜索后端（local: 本地语料检索；mock: 模拟结果）"""
+    global _search_backend_instance
+    if _search_backend_instance is None:
+        if config.SEARCH_BACKEND == 'mock':
+            _search_backend_instance = MockSearchBackend()
+        else:
+            _search_backend_instance = LocalSearchBackend()
+    return _search_backend_instance
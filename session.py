@@ -0,0 +1,166 @@
+"""
+会话记忆 - 近期对话原文 + 滚动摘要 + 长期记忆召回，控制每轮提示词长度
+"""
+
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+from agent.core.llm import core_llm
+from agent.core.memory import memory_store
+from agent.utils.config import config
+from agent.utils.logger import Logger
+from agent.utils.tokens import estimate_tokens, truncate_to_tokens
+
+
+logger = Logger(__name__)
+
+_SUMMARY_PROMPT = """你负责维护一段多轮对话的滚动摘要。请将新增对话合并进已有摘要：
+- 保留用户目标、关键事实、已做出的决定和未解决的问题
+- 删除寒暄和重复信息
+- 只输出更新后的摘要正文"""
+
+
+def _turn_tokens(turn: Dict[str, Any]) -> int:
+    # 每条消息额外计入角色等格式开销
+    return estimate_tokens(turn['content']) + 4
+
+
+class SessionMemory:
+    """会话记忆"""
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        recent_turns: Optional[int] = None,
+        context_budget: Optional[int] = None,
+        store=None,
+        llm=None,
+        persist: bool = True
+    ):
+        """初始化会话记忆"""
+        self.session_id = session_id or f"session_{uuid.uuid4().hex[:12]}"
+        self.recent_turns = recent_turns or config.SESSION_RECENT_TURNS
+        self.context_budget = context_budget or config.SESSION_CONTEXT_BUDGET
+        self.store = store or memory_store
+        self.llm = llm or core_llm
+        self.persist = persist
+
+        self.turns: deque = deque()
+        self.pending: List[Dict[str, Any]] = []  # 已移出窗口、待并入摘要的对话
+        self.summary = ""
+        self.turn_count = 0
+
+    async def add_turn(self, role: str, content: str, importance: float = 0.5) -> Dict[str, Any]:
+        """追加一轮对话"""
+        turn = {'role': role, 'content': content, 'memory_id': None}
+        self.turn_count += 1
+
+        if self.persist:
+            turn['memory_id'] = await self.store.add(
+                content,
+                {'type': 'session_turn', 'session_id': self.session_id, 'role': role},
+                importance
+            )
+
+        self.turns.append(turn)
+        while len(self.turns) > self.recent_turns:
+            self.pending.append(self.turns.popleft())
+
+        if len(self.pending) >= config.SESSION_FOLD_BATCH:
+            await self._fold()
+
+        return turn
+
+    async def _fold(self):
+        """将待合并对话增量并入摘要"""
+        if not self.pending:
+            return
+
+        transcript = '\n'.join(f"{turn['role']}: {turn['content']}" for turn in self.pending)
+        messages = [
+            {'role': 'system', 'content': _SUMMARY_PROMPT},
+            {'role': 'user', 'content': f"已有摘要：\n{self.summary or '（无）'}\n\n新增对话：\n{transcript}"}
+        ]
+
+        try:
+            self.summary = await self.llm.generate(
+                messages,
+                temperature=0.3,
+                max_tokens=config.SESSION_SUMMARY_MAX_TOKENS
+            )
+            logger.debug(f"会话摘要已更新: {self.session_id}, 合并 {len(self.pending)} 轮")
+            self.pending = []
+        except Exception as e:
+            # 摘要失败时保留待合并对话，下次再试
+            logger.warning(f"会话摘要更新失败: {e}")
+
+    async def build_messages(
+        self,
+        query: str,
+        system_prompt: str = "",
+        budget: Optional[int] = None,
+        memory_limit: int = 10
+    ) -> List[Dict[str, str]]:
+        """构建本轮提示词：摘要 + 相关长期记忆 + 近期对话，总长度不超过预算"""
+        budget = budget or self.context_budget
+        remaining = budget - estimate_tokens(system_prompt) - estimate_tokens(query) - 8
+
+        sections = []
+        if self.summary:
+            # 摘要本身超出预算时只保留末尾（较新的内容）
+            header = "对话摘要：\n"
+            summary = truncate_to_tokens(self.summary, remaining - estimate_tokens(header))
+            if summary:
+                summary_section = header + summary
+                remaining -= estimate_tokens(summary_section)
+                sections.append(summary_section)
+
+        # 近期对话优先保留，从最新往前取
+        window = list(self.pending) + list(self.turns)
+        recent: List[Dict[str, Any]] = []
+        for turn in reversed(window):
+            cost = _turn_tokens(turn)
+            if cost > remaining:
+                break
+            recent.insert(0, turn)
+            remaining -= cost
+
+        # 剩余预算填充相关长期记忆
+        in_context = {turn['memory_id'] for turn in window if turn['memory_id']}
+        recalled = []
+        if remaining > 0:
+            for memory in await self.store.semantic_search(query, limit=memory_limit):
+                if memory['id'] in in_context:
+                    continue
+                line = f"- {memory['content']}"
+                cost = estimate_tokens(line) + 1
+                if cost > remaining:
+                    continue
+                recalled.append(line)
+                remaining -= cost
+
+        if recalled:
+            sections.append("相关记忆：\n" + '\n'.join(recalled))
+
+        system_content = '\n\n'.join(part for part in [system_prompt, *sections] if part)
+        messages = []
+        if system_content:
+            messages.append({'role': 'system', 'content': system_content})
+        messages.extend({'role': turn['role'], 'content': turn['content']} for turn in recent)
+        messages.append({'role': 'user', 'content': query})
+
+        logger.debug(
+            f"会话上下文: 近期 {len(recent)} 轮, 召回 {len(recalled)} 条, "
+            f"约 {budget - remaining}/{budget} tokens"
+        )
+        return messages
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话统计"""
+        return {
+            'session_id': self.session_id,
+            'turn_count': self.turn_count,
+            'recent_turns': len(self.turns),
+            'pending_turns': len(self.pending),
+            'summary_tokens': estimate_tokens(self.summary),
+        }
@@ -0,0 +1,29 @@
+"""
+测试公共夹具
+"""
+
+import pytest
+
+from agent.core import artifacts
+from agent.utils.config import config
+
+
+# 各模块落盘文件对应的配置项
+_DATA_PATHS = {
+    'WORKFLOW_LATENCY_PATH': 'step_latency.json',
+    'WORKFLOW_CHECKPOINT_PATH': 'workflow_checkpoints.db',
+    'JOB_QUEUE_PATH': 'jobs.db',
+    'ARTIFACT_PATH': 'artifacts',
+    'PLAN_CACHE_PATH': 'plan_cache.json',
+    'TOOL_CACHE_PATH': 'tool_cache.db',
+    'MEMORY_COLD_STORE_PATH': 'memory_cold.db',
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """把数据文件重定向到临时目录，并重置中间结果存储单例"""
+    for name, filename in _DATA_PATHS.items():
+        monkeypatch.setattr(config, name, str(tmp_path / filename))
+    monkeypatch.setattr(artifacts, '_artifact_store_instance', None)
+    return tmp_path
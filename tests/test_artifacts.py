@@ -0,0 +1,135 @@
+"""
+中间结果存储测试：内容寻址、句柄展开、过期清理与工作流汇总展开
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from agent.core.artifacts import ArtifactStore, get_artifact_store, is_handle
+from agent.core.orchestrator import CoordinatorAgent
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / 'artifacts'), min_bytes=100, cache_items=2)
+
+
+def _age(store, handle, seconds):
+    path = store._path(handle.artifact_id)
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_small_values_are_not_stored(store):
+    assert store.maybe_put({'a': 1}) == {'a': 1}
+    assert store.maybe_put(None) is None
+    assert store.maybe_put(3) == 3
+    assert store.get_stats()['artifacts'] == 0
+
+
+def test_same_content_stored_once(store):
+    value = {'text': 'x' * 500}
+    first = store.maybe_put(value)
+    second = store.maybe_put(dict(value))
+    assert is_handle(first) and first == second
+    assert store.maybe_put(first) is first
+    assert store.get_stats()['artifacts'] == 1
+    assert store.get(first) == value
+
+
+def test_resolve_nested_and_json_round_trip(store):
+    inner = store.put(['y' * 200])
+    outer = store.put({'inner': inner, 'n': 1})
+    # JSON往返后句柄变成普通dict，仍能展开
+    assert store.resolve({'results': [dict(outer)]}) == {'results': [{'inner': ['y' * 200], 'n': 1}]}
+
+
+def test_missing_artifact(store):
+    handle = store.put({'text': 'z' * 200})
+    store.delete(handle)
+    assert not store.exists(handle)
+    with pytest.raises(KeyError):
+        store.get(handle)
+
+
+def test_sweep_removes_expired(store):
+    old = store.put({'text': 'old' * 100})
+    fresh = store.put({'text': 'new' * 100})
+    store.get(old)
+    _age(store, old, 3600)
+
+    assert store.sweep(max_age_seconds=60) == 1
+    assert not store.exists(old) and store.exists(fresh)
+    with pytest.raises(KeyError):
+        store.get(old)
+
+
+def test_rewrite_refreshes_age(store):
+    value = {'text': 'v' * 200}
+    handle = store.put(value)
+    _age(store, handle, 3600)
+    store.put(value)
+    assert store.sweep(max_age_seconds=60) == 0
+    assert store.exists(handle)
+
+
+def test_sweep_disabled(store):
+    handle = store.put({'text': 'v' * 200})
+    _age(store, handle, 10 ** 6)
+    assert store.sweep(max_age_seconds=0) == 0
+    assert store.exists(handle)
+
+
+def test_maybe_sweep_is_throttled(store, monkeypatch):
+    from agent.utils.config import config
+    monkeypatch.setattr(config, 'ARTIFACT_SWEEP_INTERVAL_SECONDS', 3600)
+    handle = store.put({'text': 'v' * 200})
+    store.sweep(max_age_seconds=60)
+    _age(store, handle, 3600)
+    assert store.maybe_sweep() == 0
+    assert store.exists(handle)
+
+
+def _workflow(calls):
+    async def execute(description, context=None):
+        calls.append(description)
+        return {'text': description * 5000}
+
+    coordinator = CoordinatorAgent()
+    coordinator.register_agent('a', {'execute': execute})
+    steps = [
+        {'id': 's1', 'name': 's1', 'agent': 'a', 'description': 'x'},
+        {'id': 's2', 'name': 's2', 'agent': 'a', 'description': 'y', 'dependencies': ['s1']},
+    ]
+    return coordinator, steps
+
+
+def test_workflow_summary_is_materialized(data_dir):
+    calls = []
+    coordinator, steps = _workflow(calls)
+
+    async def main():
+        return [event async for event in coordinator.execute_workflow_stream(steps, {}, 'wf')]
+
+    events = asyncio.run(main())
+    completed = [event for event in events if event['type'] == 'step_completed']
+    # 事件中保留句柄，汇总中展开
+    assert all(is_handle(event['result']) for event in completed)
+    assert events[-1]['summary']['results'] == {'s1': {'text': 'x' * 5000}, 's2': {'text': 'y' * 5000}}
+
+
+def test_swept_checkpoint_is_rerun(data_dir):
+    calls = []
+    coordinator, steps = _workflow(calls)
+    asyncio.run(coordinator.execute_workflow(steps, {}, 'wf'))
+
+    store = get_artifact_store()
+    handle = store.maybe_put({'text': 'x' * 5000})
+    store.delete(handle)
+
+    summary = asyncio.run(coordinator.resume('wf'))
+    assert calls == ['x', 'y', 'x']
+    assert summary['results']['s1'] == {'text': 'x' * 5000}
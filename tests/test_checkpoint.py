@@ -0,0 +1,126 @@
+"""
+工作流检查点与断点续跑测试
+"""
+
+import asyncio
+from collections import Counter
+
+import pytest
+
+from agent.core.checkpoint import CheckpointStore, step_fingerprint
+from agent.core.orchestrator import CoordinatorAgent
+
+
+class _Agents:
+    """按步骤描述返回结果的测试Agent，记录每个步骤的执行次数"""
+
+    def __init__(self, behaviours=None):
+        self.calls = Counter()
+        self.behaviours = behaviours or {}
+
+    def agent(self):
+        async def execute(description, context=None):
+            self.calls[description] += 1
+            behaviour = self.behaviours.get(description)
+            if callable(behaviour):
+                return await behaviour()
+            if behaviour is not None:
+                return behaviour
+            return {'step': description}
+        return {'execute': execute}
+
+
+def _coordinator(agents):
+    coordinator = CoordinatorAgent()
+    coordinator.register_agent('a', agents.agent())
+    return coordinator
+
+
+async def _collect(coordinator, steps, workflow_id):
+    return [event async for event in coordinator.execute_workflow_stream(steps, {'k': 1}, workflow_id)]
+
+
+def _completed(events):
+    return [event['step_id'] for event in events if event['type'] == 'step_completed']
+
+
+def test_fingerprint_depends_on_upstream():
+    step = {'id': 's2', 'name': 'n', 'agent': 'a', 'description': 'd', 'dependencies': ['s1']}
+    assert step_fingerprint(step, {'k': 1}, ['x']) == step_fingerprint(dict(step), {'k': 1}, ['x'])
+    assert step_fingerprint(step, {'k': 1}, ['x']) != step_fingerprint(step, {'k': 1}, ['y'])
+    assert step_fingerprint(step, {'k': 1}, ['x']) != step_fingerprint(step, {'k': 2}, ['x'])
+
+
+def test_store_round_trip(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'cp.db'))
+    store.save_workflow('wf', [{'id': 's1'}], {'k': 1})
+    store.save_result('wf', 's1', 'fp1', {'v': 1})
+    assert store.load_results('wf', {'s1': 'fp1'}) == {'s1': {'v': 1}}
+    # 指纹变化的结果不恢复
+    assert store.load_results('wf', {'s1': 'fp2'}) == {}
+    assert store.load_workflow('wf')['steps'] == [{'id': 's1'}]
+
+
+def test_resume_skips_completed_steps(data_dir):
+    agents = _Agents({'s2': RuntimeError})
+    steps = [
+        {'id': 's1', 'name': 's1', 'agent': 'a', 'description': 's1'},
+        {'id': 's2', 'name': 's2', 'agent': 'a', 'description': 's2', 'dependencies': ['s1']},
+        {'id': 's3', 'name': 's3', 'agent': 'a', 'description': 's3', 'dependencies': ['s2']},
+    ]
+
+    async def fail():
+        raise RuntimeError('boom')
+
+    agents.behaviours['s2'] = fail
+    coordinator = _coordinator(agents)
+    summary = asyncio.run(coordinator.execute_workflow(steps, {'k': 1}, 'wf1'))
+    assert summary['failed'] == {'s2'} and summary['skipped'] == {'s3'}
+
+    agents.behaviours.pop('s2')
+    summary = asyncio.run(coordinator.resume('wf1'))
+    assert summary['completed'] == {'s1', 's2', 's3'}
+    assert agents.calls == Counter({'s1': 1, 's2': 2, 's3': 1})
+
+
+@pytest.mark.parametrize('upstream', ['partial', 'timeout'])
+def test_restored_step_not_rerun_after_uncheckpointed_upstream(data_dir, upstream):
+    """上游未写检查点（部分结果或非关键超时）时重跑上游，已恢复的下游不再执行"""
+    async def slow():
+        await asyncio.sleep(1)
+
+    agents = _Agents({'s1': {'partial': True} if upstream == 'partial' else slow})
+    steps = [
+        {'id': 's1', 'name': 's1', 'agent': 'a', 'description': 's1', 'critical': False, 'timeout': 0.05},
+        {'id': 's2', 'name': 's2', 'agent': 'a', 'description': 's2', 'dependencies': ['s1']},
+        {'id': 's3', 'name': 's3', 'agent': 'a', 'description': 's3', 'dependencies': ['s2']},
+    ]
+    coordinator = _coordinator(agents)
+    asyncio.run(_collect(coordinator, steps, 'wf2'))
+    assert agents.calls == Counter({'s1': 1, 's2': 1, 's3': 1})
+
+    events = asyncio.run(_collect(coordinator, steps, 'wf2'))
+    assert agents.calls == Counter({'s1': 2, 's2': 1, 's3': 1})
+    assert sorted(_completed(events)) == ['s1', 's2', 's3']
+    assert events[0]['restored'] == ['s2', 's3']
+
+
+def test_failed_upstream_does_not_skip_restored_steps(data_dir):
+    agents = _Agents({'s1': {'partial': True}})
+    steps = [
+        {'id': 's1', 'name': 's1', 'agent': 'a', 'description': 's1'},
+        {'id': 's2', 'name': 's2', 'agent': 'a', 'description': 's2', 'dependencies': ['s1']},
+        {'id': 's3', 'name': 's3', 'agent': 'a', 'description': 's3', 'dependencies': ['s2']},
+    ]
+    coordinator = _coordinator(agents)
+    asyncio.run(coordinator.execute_workflow(steps, {'k': 1}, 'wf3'))
+
+    async def fail():
+        raise RuntimeError('boom')
+
+    agents.behaviours['s1'] = fail
+    events = asyncio.run(_collect(coordinator, steps, 'wf3'))
+    summary = events[-1]['summary']
+    assert summary['failed'] == {'s1'}
+    assert summary['skipped'] == set()
+    assert not [event for event in events if event['type'] == 'step_skipped']
@@ -0,0 +1,140 @@
+"""
+工作流DAG执行测试：依赖校验、就绪跟踪、并发执行与失败时跳过下游
+"""
+
+import asyncio
+
+import pytest
+
+from agent.core.dag import WorkflowDAG, WorkflowValidationError
+from agent.core.orchestrator import CoordinatorAgent
+
+
+def _step(step_id, *dependencies, agent='a', **fields):
+    return {'id': step_id, 'name': step_id, 'agent': agent, 'description': step_id,
+            'dependencies': list(dependencies), **fields}
+
+
+@pytest.mark.parametrize('steps, message', [
+    ([_step('s1'), _step('s1')], '重复'),
+    ([_step('s1', 'missing')], '不存在'),
+    ([_step('s1', 's3'), _step('s2', 's1'), _step('s3', 's2')], '循环依赖'),
+])
+def test_invalid_workflows(steps, message):
+    with pytest.raises(WorkflowValidationError, match=message):
+        WorkflowDAG(steps)
+
+
+def test_ready_tracking():
+    dag = WorkflowDAG([_step('s3', 's1', 's2'), _step('s1'), _step('s2', 's1')])
+    assert dag.order == ['s1', 's2', 's3']
+    assert dag.ready() == ['s1']
+    assert dag.complete('s1') == ['s2']
+    assert dag.complete('s2') == ['s3']
+
+
+def test_fail_skips_transitive_dependents():
+    dag = WorkflowDAG([_step('s1'), _step('s2', 's1'), _step('s3', 's2'), _step('s4')])
+    assert dag.fail('s1') == {'s2', 's3'}
+    assert dag.fail('s1', completed={'s2'}) == set()
+
+
+class _Agent:
+    """记录并发度的测试Agent"""
+
+    def __init__(self, delay=0.05, failing=(), total=None):
+        self.delay = delay
+        self.failing = set(failing)
+        self.running = 0
+        self.max_running = 0
+        self.calls = []
+        # 多个Agent共享的全局并发计数
+        self.total = total if total is not None else {'running': 0, 'max': 0}
+
+    async def execute(self, description, context=None):
+        self.calls.append(description)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.total['running'] += 1
+        self.total['max'] = max(self.total['max'], self.total['running'])
+        try:
+            await asyncio.sleep(self.delay)
+            if description in self.failing:
+                raise RuntimeError(f'{description} failed')
+            return {'step': description}
+        finally:
+            self.running -= 1
+            self.total['running'] -= 1
+
+
+def _run(coordinator, steps):
+    async def main():
+        return [event async for event in coordinator.execute_workflow_stream(steps, {})]
+    return asyncio.run(main())
+
+
+def test_independent_steps_run_concurrently(data_dir):
+    agent = _Agent()
+    coordinator = CoordinatorAgent(max_concurrency=4)
+    coordinator.register_agent('a', agent, max_concurrency=4)
+
+    events = _run(coordinator, [_step('s1'), _step('s2'), _step('s3'), _step('s4', 's1', 's2', 's3')])
+    summary = events[-1]['summary']
+    assert agent.max_running == 3
+    assert agent.calls[-1] == 's4'
+    assert summary['completed'] == {'s1', 's2', 's3', 's4'}
+    assert summary['timing']['actual_makespan'] < 4 * agent.delay
+
+
+def test_concurrency_limits(data_dir):
+    total = {'running': 0, 'max': 0}
+    limited, other = _Agent(total=total), _Agent(delay=0.02, total=total)
+    coordinator = CoordinatorAgent(max_concurrency=3)
+    coordinator.register_agent('a', limited, max_concurrency=1)
+    coordinator.register_agent('b', other, max_concurrency=5)
+
+    steps = [_step(f'a{i}') for i in range(3)] + [_step(f'b{i}', agent='b') for i in range(5)]
+    _run(coordinator, steps)
+    assert limited.max_running == 1
+    assert total['max'] == 3
+    assert len(limited.calls) == 3 and len(other.calls) == 5
+
+
+def test_failure_skips_only_downstream(data_dir):
+    agent = _Agent(failing={'s1'})
+    coordinator = CoordinatorAgent()
+    coordinator.register_agent('a', agent)
+
+    events = _run(coordinator, [_step('s1'), _step('s2', 's1'), _step('s3', 's2'), _step('s4')])
+    types = [(event['type'], event.get('step_id')) for event in events]
+    assert ('step_failed', 's1') in types
+    assert ('step_skipped', 's2') in types and ('step_skipped', 's3') in types
+    assert ('step_completed', 's4') in types
+    assert set(agent.calls) == {'s1', 's4'}
+
+    summary = events[-1]['summary']
+    assert summary['failed'] == {'s1'} and summary['skipped'] == {'s2', 's3'}
+    assert summary['completed'] == {'s4'}
+
+
+def test_unknown_agent_fails_step(data_dir):
+    coordinator = CoordinatorAgent()
+    summary = asyncio.run(coordinator.execute_workflow([_step('s1', agent='nobody')]))
+    assert summary['failed'] == {'s1'}
+
+
+def test_stopping_iteration_cancels_running_steps(data_dir):
+    agent = _Agent(delay=10)
+    coordinator = CoordinatorAgent()
+    coordinator.register_agent('a', agent)
+
+    async def main():
+        stream = coordinator.execute_workflow_stream([_step('s1'), _step('s2')], {})
+        async for event in stream:
+            if event['type'] == 'step_started':
+                break
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return agent.running
+
+    assert asyncio.run(main()) == 0
@@ -0,0 +1,66 @@
+"""
+请求级截止时间测试
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agent.core.deadline import (
+    DeadlineExceeded, current_deadline, deadline_scope, reserve, resolve_deadline, run_with_deadline
+)
+
+
+def test_resolve_deadline_none_inherits_outer():
+    assert resolve_deadline(None) is None
+    with deadline_scope(10) as outer:
+        assert resolve_deadline(None) == outer
+
+
+@pytest.mark.parametrize('timeout', [0, 0.0, -1])
+def test_resolve_deadline_exhausted_budget_raises(timeout):
+    with pytest.raises(DeadlineExceeded):
+        resolve_deadline(timeout)
+
+
+def test_resolve_deadline_only_tightens():
+    with deadline_scope(1) as outer:
+        assert resolve_deadline(60) == outer
+        assert resolve_deadline(0.1) < outer
+
+
+def test_run_with_deadline_exhausted_budget_does_not_run():
+    ran = []
+
+    async def step():
+        ran.append(True)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run_with_deadline(step(), 0))
+    assert not ran
+
+
+def test_run_with_deadline_times_out():
+    async def main():
+        with deadline_scope(0.05):
+            await run_with_deadline(asyncio.sleep(1))
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert time.monotonic() - started < 0.5
+
+
+def test_reserve_expires_before_outer_deadline():
+    async def main():
+        with deadline_scope(0.5) as outer:
+            with reserve(0.4) as reserved:
+                assert reserved == pytest.approx(outer - 0.4)
+                with pytest.raises(DeadlineExceeded):
+                    await run_with_deadline(asyncio.sleep(0.3))
+            # 降级逻辑仍在外层截止时间内
+            assert current_deadline() == outer
+            return await run_with_deadline(asyncio.sleep(0.01, result='fallback'))
+
+    assert asyncio.run(main()) == 'fallback'
@@ -0,0 +1,143 @@
+"""
+工具执行器测试：内联/线程/进程三种执行模式、硬超时终止、worker回收与执行统计
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from agent.core.deadline import DeadlineExceeded
+from agent.tools.executor import ProcessWorkerPool, ToolExecutor
+from agent.tools.expression import calculate
+from agent.tools.registry import ToolRegistry
+
+
+# 进程模式的处理函数须为可pickle的模块级函数
+
+def _pid(args):
+    return os.getpid()
+
+
+def _sleep(args):
+    time.sleep(args['seconds'])
+    return 'done'
+
+
+def _fail(args):
+    raise ValueError('bad input')
+
+
+async def _async_double(args):
+    await asyncio.sleep(0)
+    return args['x'] * 2
+
+
+def _tool(handler, mode='inline', timeout=None):
+    return {'name': handler.__name__, 'handler': handler, 'mode': mode, 'timeout': timeout}
+
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor()
+    yield executor
+    if executor._processes is not None:
+        executor._processes.shutdown()
+
+
+def test_inline_sync_and_async(executor):
+    assert asyncio.run(executor.run(_tool(lambda args: args['x'] + 1), {'x': 1})) == 2
+    assert asyncio.run(executor.run(_tool(_async_double), {'x': 2})) == 4
+
+
+def test_thread_mode_keeps_loop_responsive(executor):
+    def blocking(args):
+        time.sleep(0.2)
+        return threading.current_thread().name
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        name = await executor.run(_tool(blocking, mode='thread'), {})
+        task.cancel()
+        return name, ticks
+
+    name, ticks = asyncio.run(main())
+    assert name.startswith('tool')
+    assert ticks >= 10
+
+
+def test_thread_mode_runs_coroutine_handlers(executor):
+    assert asyncio.run(executor.run(_tool(_async_double, mode='thread'), {'x': 3})) == 6
+
+
+def test_process_mode(executor):
+    async def main():
+        pid = await executor.run(_tool(_pid, mode='process'), {})
+        result = await executor.run(_tool(calculate, mode='process'), {'expression': '6 * 7'})
+        return pid, result
+
+    pid, result = asyncio.run(main())
+    assert pid != os.getpid()
+    assert result['result'] == 42
+
+
+def test_process_timeout_kills_worker(executor):
+    async def main():
+        with pytest.raises(DeadlineExceeded):
+            await executor.run(_tool(_sleep, mode='process', timeout=0.3), {'seconds': 10})
+        # 超时的worker被终止，新任务由新的worker执行
+        return await executor.run(_tool(_sleep, mode='process'), {'seconds': 0})
+
+    started = time.monotonic()
+    assert asyncio.run(main()) == 'done'
+    assert time.monotonic() - started < 5
+    stats = executor.get_stats()
+    assert stats['process_pool']['killed'] == 1
+    assert stats['modes']['process']['timeouts'] == 1
+
+
+def test_process_errors_are_reported(executor):
+    with pytest.raises(RuntimeError, match='ValueError: bad input'):
+        asyncio.run(executor.run(_tool(_fail, mode='process'), {}))
+    assert executor.get_stats()['process_pool']['killed'] == 0
+
+
+def test_workers_recycled_after_max_tasks():
+    pool = ProcessWorkerPool(size=1, max_tasks_per_child=2)
+
+    async def main():
+        return [await pool.run(_pid, {}) for _ in range(3)]
+
+    try:
+        pids = asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert pids[0] == pids[1] != pids[2]
+    assert pool.get_stats()['recycled'] == 1
+
+
+def test_stats_settle_after_calls(executor):
+    async def main():
+        await asyncio.gather(*(executor.run(_tool(_async_double), {'x': i}) for i in range(3)))
+        with pytest.raises(DeadlineExceeded):
+            await executor.run(_tool(lambda args: asyncio.sleep(1), timeout=0.05), {})
+
+    asyncio.run(main())
+    inline = executor.get_stats()['modes']['inline']
+    assert inline['calls'] == 4 and inline['timeouts'] == 1
+    assert inline['queued'] == 0 and inline['running'] == 0
+
+
+def test_registry_rejects_unknown_mode(data_dir):
+    with pytest.raises(ValueError, match='执行模式'):
+        ToolRegistry().register('t', 't', {'type': 'object'}, _pid, mode='fork')
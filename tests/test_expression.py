@@ -0,0 +1,128 @@
+"""
+安全表达式引擎测试：语法白名单、变量校验与标量/批量求值一致性
+"""
+
+import pytest
+
+from agent.tools import expression
+from agent.tools.expression import ExpressionError, calculate, compile_expression
+
+
+def test_scalar_and_batch():
+    compiled = compile_expression('price * (1 - rate) if vip else price')
+    assert compiled.variables == ['price', 'rate', 'vip']
+    assert compiled.evaluate({'price': 100, 'rate': 0.2, 'vip': True}) == pytest.approx(80)
+
+    results = compiled.evaluate_batch({'price': [100, 50], 'vip': [True, False]}, {'rate': 0.5})
+    assert results == pytest.approx([50, 50])
+
+
+@pytest.mark.parametrize('source', [
+    '__import__("os")',
+    'x.__class__',
+    '[1, 2]',
+    '"a" * 3',
+    'lambda: 1',
+    'x << 2',
+    '_pow(2, 3)',
+])
+def test_rejects_unsafe_syntax(source):
+    with pytest.raises(ExpressionError):
+        compile_expression(source)
+
+
+@pytest.mark.parametrize('value', [[1, 2], 'ab', b'ab', None, {'a': 1}, (1,)])
+def test_rejects_non_numeric_variables(value):
+    # 列表、字符串等支持乘法，x * 1000000000 会构造超大对象
+    with pytest.raises(ExpressionError, match='不是数值'):
+        compile_expression('x * 1000000000').evaluate({'x': value})
+
+
+def test_rejects_non_numeric_shared_variables_in_batch():
+    with pytest.raises(ExpressionError, match='不是数值'):
+        compile_expression('x * y').evaluate_batch({'x': [1, 2]}, {'y': [1, 2]})
+
+
+@pytest.mark.parametrize('column', [['a', 'b'], [[1, 2], [3, 4]], [1, None]])
+def test_rejects_non_numeric_columns(column):
+    with pytest.raises(ExpressionError):
+        compile_expression('x * 2').evaluate_batch({'x': column})
+
+
+def test_rejects_private_variable_names():
+    with pytest.raises(ExpressionError, match='非法变量名'):
+        compile_expression('1 + 1').evaluate({'_pow': 1})
+
+
+def test_missing_variable():
+    with pytest.raises(ExpressionError, match='缺少变量'):
+        compile_expression('x + y').evaluate({'x': 1})
+
+
+def test_integer_growth_is_bounded():
+    with pytest.raises(ExpressionError):
+        compile_expression('9 ** 9 ** 9').evaluate()
+    with pytest.raises(ExpressionError):
+        compile_expression('x * x * x * x').evaluate({'x': 2 ** 40_000})
+    with pytest.raises(ExpressionError, match='位数上限'):
+        compile_expression('x + 1').evaluate({'x': 2 ** (expression.MAX_INTEGER_BITS + 1)})
+    assert compile_expression('x * x').evaluate({'x': 2 ** 100}) == 2 ** 200
+
+
+def test_division_by_zero_matches_scalar():
+    compiled = compile_expression('x / y')
+    with pytest.raises(ExpressionError):
+        compiled.evaluate({'x': 1, 'y': 0})
+    with pytest.raises(ExpressionError):
+        compiled.evaluate_batch({'x': [1, 2], 'y': [1, 0]})
+
+
+def test_guarded_division_in_batch():
+    # 条件表达式排除的除零在批量模式下与标量模式一样不报错
+    compiled = compile_expression('x / y if y != 0 else 0')
+    assert compiled.evaluate({'x': 1, 'y': 0}) == 0
+    assert compiled.evaluate_batch({'x': [1, 2], 'y': [2, 0]}) == [0.5, 0]
+
+
+def test_domain_error_matches_scalar():
+    compiled = compile_expression('sqrt(x)')
+    with pytest.raises(ExpressionError):
+        compiled.evaluate({'x': -1})
+    with pytest.raises(ExpressionError):
+        compiled.evaluate_batch({'x': [4, -1]})
+
+
+@pytest.mark.parametrize('column', [5, 'abc', {'a': 1}, None])
+def test_rejects_non_list_columns(column):
+    with pytest.raises(ExpressionError, match='必须是列表'):
+        compile_expression('a * 2').evaluate_batch({'a': column})
+    assert calculate({'expression': 'a * 2', 'batch': {'a': column}})['error']
+
+
+@pytest.mark.parametrize('source, columns', [
+    ('x * 2', {'x': [1, 2]}),
+    ('x // 3 - y', {'x': [7, -7], 'y': [1, 2]}),
+    ('x / 2', {'x': [4, 6]}),
+    ('x + 0.5', {'x': [1, 2]}),
+    ('x > 1', {'x': [1, 2]}),
+    ('x * 2', {'x': [1.0, 2.0]}),
+    ('x * x', {'x': [2 ** 40, 3]}),
+    ('x + 1', {'x': [2 ** 60, 1]}),
+])
+def test_batch_types_match_scalar(source, columns):
+    compiled = compile_expression(source)
+    results = compiled.evaluate_batch(columns)
+    expected = [compiled.evaluate({name: values[i] for name, values in columns.items()})
+                for i in range(len(results))]
+    assert results == expected
+    assert [type(value) for value in results] == [type(value) for value in expected]
+
+
+def test_batch_with_large_shared_integer_is_exact():
+    assert compile_expression('x + y').evaluate_batch({'x': [1, 2]}, {'y': 2 ** 60}) == [2 ** 60 + 1, 2 ** 60 + 2]
+
+
+def test_calculate_reports_errors():
+    assert calculate({'expression': '1 / 0'})['error']
+    assert calculate({'expression': 'x * 3', 'variables': {'x': [1]}})['error']
+    assert calculate({'expression': 'x + 1', 'batch': {'x': [1, 2]}})['results'] == [2, 3]
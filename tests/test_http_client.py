@@ -0,0 +1,129 @@
+"""
+HTTP客户端测试：基于本地HTTP服务验证响应截断、条件请求缓存与目标主机校验
+"""
+
+import asyncio
+import http.server
+import threading
+
+import pytest
+
+from agent.tools.http_client import BlockedHostError, HttpClient
+from agent.utils.config import config
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path == '/big':
+            self._send(200, b'x' * 10_000, {'Content-Type': 'text/plain'})
+        elif self.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self._send(304, b'', {'ETag': '"v1"'})
+            else:
+                # 内容随Accept-Language变化
+                body = b'{"lang": "%s"}' % self.headers.get('Accept-Language', 'none').encode()
+                self._send(200, body, {'Content-Type': 'application/json', 'ETag': '"v1"',
+                                       'Vary': 'Accept-Language'})
+        elif self.path == '/redirect':
+            self._send(302, b'', {'Location': 'http://127.0.0.2:1/internal'})
+        else:
+            self._send(404, b'', {})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def base_url(server, monkeypatch):
+    monkeypatch.setattr(config, 'HTTP_ALLOWED_HOSTS', ['127.0.0.1'])
+    server.requests.clear()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_max_bytes_truncates(base_url):
+    result = run(HttpClient().request(f"{base_url}/big", max_bytes=100))
+    assert result['status'] == 200
+    assert result['truncated'] is True
+    assert len(result['data']) == 100
+
+
+def test_max_bytes_is_clamped_to_config(base_url, monkeypatch):
+    monkeypatch.setattr(config, 'HTTP_MAX_RESPONSE_BYTES', 1000)
+    result = run(HttpClient().request(f"{base_url}/big", max_bytes=10 ** 9))
+    assert result['truncated'] is True
+    assert len(result['data']) == 1000
+
+
+def test_etag_revalidation(base_url, server):
+    client = HttpClient()
+    first = run(client.request(f"{base_url}/etag"))
+    second = run(client.request(f"{base_url}/etag"))
+    assert first['data'] == {'lang': 'none'}
+    assert second['revalidated'] is True and second['data'] == first['data']
+    assert server.requests[-1][1].get('If-None-Match') == '"v1"'
+    assert client.cache.get_stats()['revalidated'] == 1
+
+
+def test_cache_key_includes_request_headers(base_url):
+    client = HttpClient()
+    run(client.request(f"{base_url}/etag", headers={'Accept-Language': 'zh'}))
+    other = run(client.request(f"{base_url}/etag", headers={'Accept-Language': 'en'}))
+    # 不同请求头不能复用对方的缓存
+    assert other['revalidated'] is False
+    assert other['data'] == {'lang': 'en'}
+    assert client.cache.get_stats()['entries'] == 2
+
+
+def test_client_recreated_per_event_loop(base_url):
+    client = HttpClient()
+    run(client.request(f"{base_url}/big", max_bytes=10))
+    stale = client._client
+    run(client.request(f"{base_url}/big", max_bytes=10))
+    assert client._client is not stale
+    assert stale.is_closed
+
+
+def test_host_not_in_allowlist(base_url, monkeypatch):
+    monkeypatch.setattr(config, 'HTTP_ALLOWED_HOSTS', ['*.example.com'])
+    with pytest.raises(BlockedHostError):
+        run(HttpClient().request(f"{base_url}/big"))
+
+
+def test_redirect_target_checked(base_url):
+    with pytest.raises(BlockedHostError):
+        run(HttpClient().request(f"{base_url}/redirect"))
+
+
+def test_private_addresses_blocked_without_allowlist(base_url, server, monkeypatch):
+    monkeypatch.setattr(config, 'HTTP_ALLOWED_HOSTS', [])
+    with pytest.raises(BlockedHostError):
+        run(HttpClient().request(f"{base_url}/big"))
+    with pytest.raises(BlockedHostError):
+        run(HttpClient().request('http://localhost:1/'))
+    assert server.requests == []
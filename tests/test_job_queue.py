@@ -0,0 +1,221 @@
+"""
+任务队列测试：租约、重试与反复失败任务的处理
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from agent.core.deadline import DeadlineExceeded, deadline_scope
+from agent.core.job_queue import JobQueue, QueueBackend, SQLiteJobQueue
+from agent.core.worker import WorkflowWorker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / 'jobs.db'))
+
+
+def test_job_queue_is_abstract():
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+def test_lease_complete(queue):
+    job_id = queue.enqueue('agent_step', {'agent': 'rednote'})
+    job = queue.lease('w1')
+    assert job['id'] == job_id and job['attempt'] == 1
+    assert job['payload'] == {'agent': 'rednote'}
+    assert queue.lease('w2') is None
+
+    assert not queue.complete(job_id, 'w2', 'x')
+    assert queue.complete(job_id, 'w1', {'ok': True})
+    assert queue.get(job_id)['status'] == 'done'
+    assert queue.get(job_id)['result'] == {'ok': True}
+
+
+def test_fail_requeues_with_backoff_then_fails(queue):
+    job_id = queue.enqueue('agent_step', {}, max_attempts=2)
+
+    job = queue.lease('w1')
+    assert queue.fail(job_id, 'w1', 'boom')
+    assert queue.get(job_id)['status'] == 'queued'
+    # 退避期间不可领取
+    assert queue.lease('w1') is None
+
+    queue.conn.execute('UPDATE jobs SET available_at = 0 WHERE id = ?', (job_id,))
+    job = queue.lease('w1')
+    assert job['attempt'] == 2
+    assert queue.fail(job_id, 'w1', 'boom again')
+    assert queue.get(job_id)['status'] == 'failed'
+    assert queue.get(job_id)['error'] == 'boom again'
+
+
+def test_fail_requires_lease_owner(queue):
+    job_id = queue.enqueue('agent_step', {})
+    queue.lease('w1')
+    assert not queue.fail(job_id, 'w2', 'boom')
+    assert queue.get(job_id)['status'] == 'leased'
+
+
+def test_fail_not_retryable(queue):
+    job_id = queue.enqueue('agent_step', {}, max_attempts=5)
+    queue.lease('w1')
+    assert queue.fail(job_id, 'w1', 'bad agent', retryable=False)
+    assert queue.get(job_id)['status'] == 'failed'
+
+
+def test_expired_lease_is_released_to_other_worker(queue):
+    job_id = queue.enqueue('agent_step', {}, max_attempts=3)
+    queue.lease('w1', lease_seconds=0.01)
+    time.sleep(0.02)
+
+    job = queue.lease('w2')
+    assert job['id'] == job_id and job['attempt'] == 2
+    # 原worker的租约已失效
+    assert not queue.heartbeat(job_id, 'w1')
+    assert not queue.complete(job_id, 'w1', 'late')
+
+
+def test_poison_job_fails_after_max_attempts(queue):
+    # 每次领取后worker都崩溃（租约过期），达到重试上限后不再分发
+    job_id = queue.enqueue('agent_step', {}, max_attempts=2)
+    for _ in range(2):
+        assert queue.lease('w', lease_seconds=0.01)['id'] == job_id
+        time.sleep(0.02)
+
+    assert queue.lease('w') is None
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['attempts'] == 2
+    assert '最大重试次数' in job['error']
+
+
+def test_poison_job_does_not_block_others(queue):
+    poison = queue.enqueue('agent_step', {}, max_attempts=1)
+    queue.lease('w', lease_seconds=0.01)
+    other = queue.enqueue('agent_step', {})
+    time.sleep(0.02)
+
+    assert queue.lease('w')['id'] == other
+    assert queue.get(poison)['status'] == 'failed'
+
+
+def test_cancel(queue):
+    job_id = queue.enqueue('agent_step', {})
+    queue.cancel(job_id)
+    assert queue.get(job_id)['status'] == 'cancelled'
+    assert queue.lease('w') is None
+
+
+def test_backend_rejects_expired_deadline(queue):
+    async def main():
+        with deadline_scope(0.01):
+            await asyncio.sleep(0.02)
+            await QueueBackend(queue).run({'id': 's1', 'agent': 'rednote'}, None)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert queue.get_stats() == {}
+
+
+def test_backend_round_trip(queue):
+    async def worker():
+        while True:
+            job = await asyncio.to_thread(queue.lease, 'w1')
+            if job is not None:
+                queue.complete(job['id'], 'w1', {'echo': job['payload']['description']})
+                return job
+            await asyncio.sleep(0.01)
+
+    async def main():
+        backend = QueueBackend(queue, poll_interval=0.01)
+        with deadline_scope(5):
+            job, result = await asyncio.gather(
+                worker(), backend.run({'id': 's1', 'agent': 'rednote', 'description': 'hi'}, None)
+            )
+        return job, result
+
+    job, result = asyncio.run(main())
+    assert result == {'echo': 'hi'}
+    # 下发绝对截止时间，而不是相对秒数
+    assert time.time() < job['payload']['deadline'] <= time.time() + 5
+
+
+def test_worker_applies_remaining_time(queue):
+    # 任务在队列中等待的时间计入时限
+    seen = {}
+
+    async def execute(description, context=None):
+        from agent.core.deadline import remaining
+        seen['remaining'] = remaining()
+        return 'ok'
+
+    job_id = queue.enqueue('agent_step', {'agent': 'a', 'description': 'd', 'deadline': time.time() + 0.5})
+    time.sleep(0.2)
+    asyncio.run(WorkflowWorker(queue, {'a': {'execute': execute}}).run(max_jobs=1))
+    assert queue.get(job_id)['status'] == 'done'
+    assert 0 < seen['remaining'] <= 0.3
+
+
+def test_worker_fails_expired_job_as_timeout(queue):
+    calls = []
+
+    async def execute(description, context=None):
+        calls.append(description)
+
+    job_id = queue.enqueue('agent_step', {'agent': 'a', 'description': 'd', 'deadline': time.time() - 1})
+    asyncio.run(WorkflowWorker(queue, {'a': {'execute': execute}}).run(max_jobs=1))
+    job = queue.get(job_id)
+    assert calls == []
+    assert job['status'] == 'failed' and job['error_type'] == 'DeadlineExceeded'
+
+
+def test_backend_reraises_worker_timeout(queue):
+    async def slow(description, context=None):
+        await asyncio.sleep(1)
+
+    async def main():
+        worker = WorkflowWorker(queue, {'a': {'execute': slow}}, poll_interval=0.01)
+        backend = QueueBackend(queue, poll_interval=0.01)
+        # backend.run本身不设超时，超时由worker按下发的截止时间触发
+        with deadline_scope(0.1):
+            job = asyncio.create_task(backend.run({'id': 's1', 'agent': 'a', 'description': 'd'}, None))
+        await worker.run(max_jobs=1)
+        return await job
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+
+
+def test_backend_other_failures_are_runtime_errors(queue):
+    async def main():
+        job = asyncio.create_task(QueueBackend(queue, poll_interval=0.01).run({'id': 's1', 'agent': 'a'}, None))
+        await asyncio.sleep(0.05)
+        leased = queue.lease('w1')
+        queue.fail(leased['id'], 'w1', 'boom', retryable=False, error_type='ValueError')
+        return await job
+
+    with pytest.raises(RuntimeError, match='boom'):
+        asyncio.run(main())
+
+
+def test_adds_error_type_column_to_old_database(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL,
+           status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,
+           lease_owner TEXT, lease_expires REAL, available_at REAL NOT NULL, result TEXT, error TEXT,
+           created_at REAL NOT NULL, updated_at REAL NOT NULL)"""
+    )
+    conn.commit()
+    conn.close()
+
+    queue = SQLiteJobQueue(path)
+    job_id = queue.enqueue('agent_step', {})
+    queue.lease('w1')
+    queue.fail(job_id, 'w1', 'late', retryable=False, error_type='DeadlineExceeded')
+    assert queue.get(job_id)['error_type'] == 'DeadlineExceeded'
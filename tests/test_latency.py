@@ -0,0 +1,105 @@
+"""
+关键路径调度测试：耗时EWMA估计、剩余关键路径计算、优先级调度与总耗时预测
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from agent.core.dag import WorkflowDAG
+from agent.core.latency import LatencyEstimator
+from agent.core.orchestrator import CoordinatorAgent
+
+
+def _step(step_id, *dependencies, agent='a', **fields):
+    return {'id': step_id, 'name': step_id, 'agent': agent, 'description': step_id,
+            'dependencies': list(dependencies), **fields}
+
+
+def test_estimate_fallbacks(tmp_path):
+    estimator = LatencyEstimator(str(tmp_path / 'latency.json'), alpha=0.5, default=7)
+    step = _step('s1', type='search')
+    assert estimator.estimate(step) == 7
+
+    estimator.observe(step, 2)
+    assert estimator.estimate(step) == 2
+    # 同一Agent的其他类型步骤使用Agent级估计
+    assert estimator.estimate(_step('s2', type='write')) == 2
+    assert estimator.estimate(_step('s3', agent='b')) == 7
+
+    estimator.observe(step, 4)
+    assert estimator.estimate(step) == 3
+
+
+def test_estimates_persist(tmp_path):
+    path = tmp_path / 'latency.json'
+    estimator = LatencyEstimator(str(path))
+    estimator.observe(_step('s1'), 1.5)
+    estimator.save()
+    assert LatencyEstimator(str(path)).estimate(_step('s1')) == 1.5
+
+    path.write_text('{broken', encoding='utf-8')
+    assert LatencyEstimator(str(path), default=3).estimates == {}
+
+
+def test_critical_path():
+    dag = WorkflowDAG([_step('a'), _step('b', 'a'), _step('c', 'a'), _step('d', 'b', 'c')])
+    remaining = dag.critical_path({'a': 1, 'b': 5, 'c': 2, 'd': 1})
+    assert remaining == {'a': 7, 'b': 6, 'c': 3, 'd': 1}
+
+
+class _Agent:
+    def __init__(self):
+        self.order = []
+
+    async def execute(self, description, context=None):
+        self.order.append(description)
+        await asyncio.sleep(0.01)
+        return {'step': description}
+
+
+def _coordinator(estimates, max_concurrency=1):
+    coordinator = CoordinatorAgent(max_concurrency=max_concurrency)
+    agent = _Agent()
+    coordinator.register_agent('a', agent, max_concurrency=max_concurrency)
+    coordinator.latency.estimates = {f'step:a:{name}': seconds for name, seconds in estimates.items()}
+    return coordinator, agent
+
+
+def _run(coordinator, steps):
+    async def main():
+        return [event async for event in coordinator.execute_workflow_stream(steps, {})]
+    return asyncio.run(main())
+
+
+def test_longest_remaining_path_starts_first(data_dir):
+    # short在拓扑序中靠前，但head后面的链更长，并发受限时head、tail先执行
+    coordinator, agent = _coordinator({'short': 2, 'head': 1, 'tail': 5})
+    _run(coordinator, [_step('short'), _step('head'), _step('tail', 'head')])
+    assert agent.order == ['head', 'tail', 'short']
+
+
+def test_ties_follow_topological_order(data_dir):
+    coordinator, agent = _coordinator({'x': 1, 'y': 1})
+    _run(coordinator, [_step('x'), _step('y')])
+    assert agent.order == ['x', 'y']
+
+
+@pytest.mark.parametrize('max_concurrency, expected', [(1, 8.0), (2, 6.0)])
+def test_predicted_makespan(data_dir, max_concurrency, expected):
+    coordinator, _ = _coordinator({'a': 1, 'b': 5, 'c': 2, 'd': 0}, max_concurrency)
+    events = _run(coordinator, [_step('a'), _step('b', 'a'), _step('c', 'a'), _step('d', 'b', 'c')])
+    assert events[0]['predicted_makespan'] == pytest.approx(expected)
+    timing = events[-1]['summary']['timing']
+    assert timing['predicted_makespan'] == pytest.approx(expected)
+    assert timing['critical_path'] == pytest.approx(6.0)
+    assert set(timing['steps']) == {'a', 'b', 'c', 'd'}
+
+
+def test_observed_latency_saved(data_dir):
+    coordinator, _ = _coordinator({})
+    _run(coordinator, [_step('s1')])
+    saved = json.loads((data_dir / 'step_latency.json').read_text(encoding='utf-8'))
+    assert 0 < saved['step:a:s1'] < 1
+    assert 'agent:a' in saved
@@ -0,0 +1,94 @@
+"""
+记忆库列式导入导出测试：Parquet/Arrow往返、额外列并入元数据与时间戳解析
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+from agent.core.memory import MemoryStore
+from agent.core.memory_io import export_memories, import_memories
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def _store(count=5):
+    store = MemoryStore()
+    run(store.add_many([
+        {
+            'id': f'm{i}',
+            'content': f'记忆内容 {i}',
+            'metadata': {'type': 'faq' if i % 2 else 'note', 'tags': ['a', str(i)]},
+            'importance': i / 10,
+            'timestamp': datetime(2026, 1, 1, 12, i),
+        }
+        for i in range(count)
+    ]))
+    return store
+
+
+def _snapshot(store):
+    return {
+        memory['id']: (memory['content'], memory['metadata'], memory['timestamp'])
+        for memory in store.iter_memories()
+    }
+
+
+@pytest.mark.parametrize('filename', ['memories.parquet', 'memories.arrow'])
+def test_round_trip(tmp_path, filename):
+    source = _store()
+    path = str(tmp_path / filename)
+    assert run(export_memories(path, source, chunk_size=2)) == 5
+
+    target = MemoryStore()
+    assert run(import_memories(path, target, chunk_size=2)) == 5
+    assert _snapshot(target) == _snapshot(source)
+    assert target.get_stats()['total'] == 5
+    assert run(target.semantic_search('内容', limit=10))
+
+
+def test_extra_columns_become_metadata(tmp_path):
+    path = str(tmp_path / 'extra.parquet')
+    pq.write_table(pa.table({
+        'content': ['退款', '物流'],
+        'metadata': ['{"type": "faq", "channel": "web"}', None],
+        'channel': ['app', None],
+        'timestamp': ['2026-01-02T03:04:05', '2026-01-03T00:00:00'],
+    }), path)
+
+    store = MemoryStore()
+    assert run(import_memories(path, store)) == 2
+    first, second = sorted(store.iter_memories(), key=lambda memory: memory['timestamp'])
+    # 非空的额外列覆盖metadata列中的同名字段
+    assert first['metadata']['type'] == 'faq' and first['metadata']['channel'] == 'app'
+    assert 'channel' not in second['metadata']
+    assert first['timestamp'] == datetime(2026, 1, 2, 3, 4, 5)
+    assert first['metadata']['importance'] == 0.5
+
+
+def test_missing_content_column(tmp_path):
+    path = str(tmp_path / 'bad.parquet')
+    pq.write_table(pa.table({'id': ['a']}), path)
+    with pytest.raises(ValueError, match='content'):
+        run(import_memories(path, MemoryStore()))
+
+
+def test_export_embeddings(tmp_path):
+    class _Collection:
+        def add(self, **kwargs):
+            pass
+
+        def get(self, ids, include):
+            return {'ids': ids, 'embeddings': [[float(i), 1.0] if i % 2 else None for i in range(len(ids))]}
+
+    store = _store(3)
+    store.collection = _Collection()
+    path = str(tmp_path / 'vectors.parquet')
+    run(export_memories(path, store, include_embeddings=True))
+    assert pq.read_table(path).column('embedding').to_pylist() == [None, [1.0, 1.0], None]
@@ -0,0 +1,126 @@
+"""
+记忆混合检索测试：BM25关键词检索、过滤条件下推与RRF融合
+"""
+
+import asyncio
+
+import pytest
+
+from agent.core.bm25 import BM25Index, tokenize
+from agent.core.memory import MemoryStore, _build_where, _reciprocal_rank_fusion
+
+
+class _Collection:
+    """记录查询参数的向量库替身，按预设顺序返回ID"""
+
+    def __init__(self, ranking):
+        self.ranking = ranking
+        self.queries = []
+
+    def add(self, **kwargs):
+        pass
+
+    def delete(self, **kwargs):
+        pass
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        return {'ids': [self.ranking[:kwargs['n_results']]]}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_tokenize_mixes_words_and_cjk_ngrams():
+    tokens = tokenize('Refund 退款申请')
+    assert 'refund' in tokens
+    assert '退款' in tokens and '申请' in tokens
+
+
+def test_bm25_ranks_matching_documents():
+    index = BM25Index()
+    index.add_many(['a', 'b', 'c'], ['退款申请流程', '物流查询', '退款到账时间和退款进度'])
+    ranked = [doc_id for doc_id, _ in index.search('退款', 10)]
+    assert ranked[0] == 'c' and set(ranked) == {'a', 'c'}
+
+
+def test_bm25_predicate_filters_before_scoring():
+    index = BM25Index()
+    index.add_many(['a', 'b'], ['退款申请', '退款进度'])
+    assert [doc_id for doc_id, _ in index.search('退款', 10, lambda doc_id: doc_id == 'b')] == ['b']
+
+
+def test_bm25_remove_and_overwrite():
+    index = BM25Index()
+    index.add('a', '退款申请')
+    index.add('a', '物流查询')
+    assert index.search('退款', 10) == []
+    index.remove('a')
+    assert len(index) == 0 and index.postings == {} and index.total_length == 0
+
+
+def test_rrf_rewards_agreement():
+    fused = _reciprocal_rank_fusion([['x', 'y', 'z'], ['y', 'w']])
+    assert fused[0] == 'y'
+    assert set(fused) == {'x', 'y', 'z', 'w'}
+
+
+def test_build_where_pushes_scalar_filters():
+    assert _build_where(0.0, None) is None
+    assert _build_where(0.5, None) == {'importance': {'$gte': 0.5}}
+    assert _build_where(0.0, {'type': 'faq', 'tags': ['a']}) == {'type': {'$eq': 'faq'}}
+    assert _build_where(0.3, {'type': 'faq'}) == {
+        '$and': [{'importance': {'$gte': 0.3}}, {'type': {'$eq': 'faq'}}]
+    }
+
+
+@pytest.fixture
+def store():
+    return MemoryStore()
+
+
+def _add(store, records):
+    return run(store.add_many(records))
+
+
+def test_keyword_search_without_vector_store(store):
+    _add(store, [
+        {'id': 'm1', 'content': '用户咨询退款进度', 'metadata': {'type': 'faq'}},
+        {'id': 'm2', 'content': '物流延迟投诉', 'metadata': {'type': 'complaint'}},
+    ])
+    results = run(store.semantic_search('退款', limit=5))
+    assert [memory['id'] for memory in results] == ['m1']
+
+
+def test_filters_applied_to_both_paths(store):
+    _add(store, [
+        {'id': 'm1', 'content': '退款进度查询', 'metadata': {'type': 'faq'}, 'importance': 0.9},
+        {'id': 'm2', 'content': '退款投诉', 'metadata': {'type': 'complaint'}, 'importance': 0.9},
+        {'id': 'm3', 'content': '退款规则说明', 'metadata': {'type': 'faq'}, 'importance': 0.1},
+    ])
+    store.collection = _Collection(['m2', 'm3', 'm1'])
+
+    results = run(store.semantic_search('退款', limit=5, min_importance=0.5, filters={'type': 'faq'}))
+    assert [memory['id'] for memory in results] == ['m1']
+    assert store.collection.queries[0]['where'] == {
+        '$and': [{'importance': {'$gte': 0.5}}, {'type': {'$eq': 'faq'}}]
+    }
+
+
+def test_hybrid_fusion_combines_rankings(store):
+    _add(store, [
+        {'id': 'm1', 'content': '退款退款退款', 'metadata': {}},
+        {'id': 'm2', 'content': '退款申请', 'metadata': {}},
+        {'id': 'm3', 'content': '售后服务', 'metadata': {}},
+    ])
+    # 向量检索找到关键词检索不到的m3，两路都靠前的m2排第一
+    store.collection = _Collection(['m2', 'm3'])
+    results = run(store.semantic_search('退款', limit=3))
+    assert [memory['id'] for memory in results] == ['m2', 'm1', 'm3']
+
+
+def test_deleted_memories_not_returned(store):
+    _add(store, [{'id': 'm1', 'content': '退款申请', 'metadata': {}}])
+    assert run(store.delete('m1'))
+    assert run(store.semantic_search('退款')) == []
@@ -0,0 +1,114 @@
+"""
+记忆库增量统计测试：增删后的计数与全量重算一致、批量与逐条一致、年龄分桶与增量推送
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from agent.core import memory_stats
+from agent.core.memory import MemoryStore
+from agent.core.memory_stats import MemoryStats, memory_size
+
+
+def _memory(memory_id, importance=0.5, hours_ago=0, **metadata):
+    timestamp = datetime.now() - timedelta(hours=hours_ago)
+    return {
+        'id': memory_id,
+        'content': f'内容{memory_id}',
+        'metadata': {**metadata, 'importance': importance, 'timestamp': timestamp.isoformat()},
+        'timestamp': timestamp,
+    }
+
+
+def _recompute(memories):
+    """全量重算的参考结果"""
+    stats = MemoryStats()
+    for memory in memories:
+        stats.record_add(memory)
+    return stats.snapshot()
+
+
+def test_add_and_remove():
+    memories = [
+        _memory('a', 0.9, type='faq'),
+        _memory('b', 0.2, hours_ago=30, type='faq', tags=['x']),
+        _memory('c', 0.2, hours_ago=24 * 40, type='complaint'),
+    ]
+    stats = MemoryStats()
+    for memory in memories:
+        stats.record_add(memory)
+
+    snapshot = stats.snapshot()
+    assert snapshot['total'] == 3
+    assert snapshot['by_importance'] == {'0.9': 1, '0.2': 2}
+    assert snapshot['metadata_cardinality'] == {'type': 2, 'importance': 2, 'tags': 1}
+    assert snapshot['by_age'] == {'<1h': 1, '<1d': 0, '<7d': 1, '<30d': 0, '>=30d': 1}
+    assert snapshot['size_bytes'] == sum(memory_size(memory) for memory in memories)
+
+    stats.record_remove(memories[2])
+    assert stats.snapshot() == _recompute(memories[:2])
+    assert 'complaint' not in stats.metadata_values['type']
+
+
+def test_batch_matches_incremental():
+    memories = [_memory(str(i), importance=i / 10, hours_ago=i * 7, group=i % 3) for i in range(10)]
+    batch = MemoryStats()
+    batch.record_add_many(memories, [memory_size(memory) for memory in memories])
+    assert batch.snapshot() == _recompute(memories)
+
+
+def test_age_buckets_move_across_hours(monkeypatch):
+    stats = MemoryStats()
+    stats.record_add(_memory('a'))
+    assert stats.snapshot()['by_age']['<1h'] == 1
+
+    # 两天后：跨小时时重算分桶
+    class _Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(days=2)
+
+    monkeypatch.setattr(memory_stats, 'datetime', _Later)
+    assert stats.snapshot()['by_age'] == {'<1h': 0, '<1d': 0, '<7d': 1, '<30d': 0, '>=30d': 0}
+
+
+def test_unhashable_metadata_values():
+    stats = MemoryStats()
+    stats.record_add(_memory('a', tags=['x', 'y']))
+    stats.record_add(_memory('b', tags=['x', 'y']))
+    assert stats.snapshot()['metadata_cardinality']['tags'] == 1
+
+
+def test_subscribers_receive_deltas():
+    stats = MemoryStats()
+    queue = stats.subscribe(maxsize=2)
+    for memory_id in 'abc':
+        stats.record_add(_memory(memory_id))
+
+    # 队列满时丢弃最旧的增量
+    deltas = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert [delta['memory_id'] for delta in deltas] == ['b', 'c']
+    assert deltas[-1]['total'] == 3
+
+    stats.unsubscribe(queue)
+    stats.record_add(_memory('d'))
+    assert queue.empty()
+
+
+def test_store_stats_follow_overwrites_and_deletes():
+    store = MemoryStore()
+
+    async def main():
+        await store.add_many([
+            {'id': 'm1', 'content': '一', 'metadata': {'type': 'faq'}},
+            {'id': 'm2', 'content': '二', 'metadata': {'type': 'faq'}},
+        ])
+        # 相同ID覆盖不重复计数
+        await store.add_many([{'id': 'm1', 'content': '一（更新）', 'metadata': {'type': 'note'}}])
+        await store.delete('m2')
+
+    asyncio.run(main())
+    stats = store.get_stats()
+    assert stats['total'] == 1
+    assert stats['metadata_cardinality']['type'] == 1
+    assert stats['size_bytes'] == memory_size(store.relational_memory['m1'])
@@ -0,0 +1,92 @@
+"""
+记忆分层存储测试：冷存储延迟打开、超出预算淘汰、换入与冷数据检索
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from agent.core.memory import MemoryStore
+from agent.utils.config import config
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def store(data_dir, monkeypatch):
+    # 约2KB预算，每条记忆约200字节
+    monkeypatch.setattr(config, 'MEMORY_RAM_BUDGET_MB', 2048 / 1024 / 1024)
+    return MemoryStore()
+
+
+def _records(count, importance=0.5, prefix='m', **metadata):
+    return [
+        {'id': f'{prefix}{i}', 'content': f'{prefix}{i} 退款记录 ' + 'x' * 100,
+         'metadata': dict(metadata), 'importance': importance}
+        for i in range(count)
+    ]
+
+
+def test_cold_tier_opened_lazily(store, data_dir):
+    assert not (data_dir / 'memory_cold.db').exists()
+    store.get_stats()
+    assert (data_dir / 'memory_cold.db').exists()
+
+
+def test_eviction_keeps_hot_tier_within_budget(store):
+    run(store.add_many(_records(30)))
+    stats = store.get_stats()
+    assert stats['total'] == 30
+    assert stats['tiers']['hot_bytes'] <= store.ram_budget
+    assert stats['tiers']['cold'] == len(store.cold_ids) > 0
+    assert stats['tiers']['hot'] + stats['tiers']['cold'] == 30
+
+
+def test_low_importance_evicted_first(store):
+    run(store.add_many(_records(5, importance=0.9, prefix='keep')))
+    run(store.add_many(_records(20, importance=0.1, prefix='drop')))
+    assert all(memory_id in store.relational_memory for memory_id in [f'keep{i}' for i in range(5)])
+
+
+def test_get_swaps_cold_memory_in(store):
+    run(store.add_many(_records(30)))
+    memory_id = next(iter(store.cold_ids))
+    memory = run(store.get(memory_id))
+    assert memory['id'] == memory_id
+    assert memory_id in store.relational_memory
+    assert store.hot_bytes <= store.ram_budget
+
+
+def test_search_and_filters_reach_cold_memories(store):
+    run(store.add_many(_records(30, type='refund')))
+    cold_id = sorted(store.cold_ids)[0]
+    results = run(store.semantic_search(cold_id, limit=1))
+    assert results[0]['id'] == cold_id
+    assert len(run(store.search_by_metadata({'type': 'refund'}))) == 30
+
+
+def test_delete_and_cleanup_cold_memories(store):
+    old = datetime.now() - timedelta(days=60)
+    records = _records(30)
+    for record in records:
+        record['timestamp'] = old
+        record['importance'] = 0.1
+    run(store.add_many(records))
+
+    cold_id = next(iter(store.cold_ids))
+    assert run(store.delete(cold_id))
+    assert run(store.get(cold_id)) is None
+    assert run(store.cleanup_old_memories(days=30, min_importance=0.3)) == 29
+    assert store.get_stats()['total'] == 0
+
+
+def test_cold_memories_restored_on_restart(store):
+    run(store.add_many(_records(30)))
+    cold_ids = set(store.cold_ids)
+    restarted = MemoryStore()
+    assert restarted.get_stats()['total'] == len(cold_ids)
+    cold_id = sorted(cold_ids)[0]
+    assert run(restarted.semantic_search(cold_id, limit=1))[0]['id'] == cold_id
@@ -0,0 +1,143 @@
+"""
+指标异常检测测试：EWMA/z分数与窗口分位数的联合判定、快照去重与融合规则告警
+"""
+
+import asyncio
+
+import pytest
+
+from agent.agents.monitor import CustomerMonitorAgent
+from agent.agents.monitor_anomaly import AnomalyDetector, MetricDetector
+from agent.core.llm import core_llm
+from agent.utils.config import config
+
+
+def _state(latency=200.0, error_rate=0.01, hit_rate=0.9, response_time=300.0):
+    return {'latency': latency, 'error_rate': error_rate, 'knowledge_base_hit_rate': hit_rate,
+            'active_conversations': 10, 'average_response_time': response_time}
+
+
+def _warm(target, count=60):
+    # 小幅周期波动的平稳序列
+    for i in range(count):
+        wobble = (i % 5 - 2) / 100
+        signals = target.observe(_state(200 * (1 + wobble), 0.01 * (1 + wobble), 0.9 * (1 + wobble / 10),
+                                         300 * (1 + wobble)))
+    return signals
+
+
+def _detector():
+    return MetricDetector('high', alpha=0.1, window=50, z_threshold=3.0, quantile=0.95, warmup=10)
+
+
+def test_stable_series_is_not_anomalous():
+    detector = _detector()
+    signals = [detector.update(100 + i % 7) for i in range(200)]
+    assert not any(signal['anomalous'] for signal in signals)
+    assert detector.mean == pytest.approx(103, abs=1)
+
+
+def test_spike_detected_after_warmup():
+    detector = _detector()
+    assert detector.update(1000)['anomalous'] is False
+    for i in range(5):
+        detector.update(100 + i % 3)
+    # 预热期内不判定
+    assert detector.score(1000)['anomalous'] is False
+
+    for i in range(30):
+        detector.update(100 + i % 3)
+    signal = detector.update(1000)
+    assert signal['anomalous'] is True
+    assert signal['z'] > 3 and signal['baseline'] < 200
+
+
+def test_low_direction():
+    detector = MetricDetector('low', alpha=0.1, window=50, z_threshold=3.0, quantile=0.95, warmup=10)
+    for i in range(40):
+        detector.update(0.9 + (i % 3) / 100)
+    assert detector.score(0.5)['anomalous'] is True
+    assert detector.score(1.5)['anomalous'] is False
+
+
+def test_z_and_quantile_must_agree():
+    detector = _detector()
+    # 窗口内早期的高值抬高分位数阈值，单独的z分数超限不足以判定
+    for value in [1000] * 5 + [100] * 30:
+        detector.update(value)
+    signal = detector.score(900)
+    assert signal['z'] > 3
+    assert signal['anomalous'] is False
+
+
+def test_window_evicts_oldest():
+    detector = MetricDetector('high', window=5)
+    for value in [5, 1, 4, 2, 3, 9, 0]:
+        detector.update(value)
+    assert list(detector._window) == [4, 2, 3, 9, 0]
+    assert detector._sorted == [0, 2, 3, 4, 9]
+
+
+def test_repeated_snapshot_counted_once():
+    detector = AnomalyDetector()
+    state = _state()
+    first = detector.observe(state)
+    assert detector.observe(dict(state)) is first
+    assert detector.stats['snapshots'] == 1
+    assert detector.detectors['latency'].count == 1
+
+
+def test_non_numeric_metrics_ignored():
+    detector = AnomalyDetector()
+    signals = detector.observe({'latency': 'slow', 'error_rate': True, 'knowledge_base_hit_rate': 0.9})
+    assert set(signals) == {'knowledge_base_hit_rate'}
+
+
+def test_fusion_rules():
+    detector = AnomalyDetector(warmup=10)
+    _warm(detector)
+    signals = detector.observe(_state(hit_rate=0.3))
+    assert detector.stats['anomalies']['knowledge_base_hit_rate'] == 1
+
+    assert detector.fuse(signals, {'sentiment': 'positive'}) == []
+    fired = detector.fuse(signals, {'sentiment': 'negative'})
+    assert [alert['rule'] for alert in fired] == ['kb_drop_negative']
+    assert '知识库命中率 0.3' in detector.describe(signals)
+
+    signals = detector.observe(_state(latency=2000, error_rate=0.5))
+    rules = {alert['rule'] for alert in detector.fuse(signals, {'sentiment': 'neutral'})}
+    assert rules == {'error_spike', 'multi_metric'}
+
+    detector.record(fired)
+    assert detector.get_stats()['alerts']['kb_drop_negative'] == 1
+
+
+def test_escalation_rule_needs_no_anomaly():
+    detector = AnomalyDetector()
+    fired = detector.fuse(detector.observe(_state()), {'sentiment': 'negative', 'status': 'escalated'})
+    assert [alert['rule'] for alert in fired] == ['negative_escalation']
+
+
+def test_agent_alerts_follow_rules(monkeypatch):
+    monkeypatch.setattr(config, 'MONITOR_FASTPATH_ENABLED', False)
+    monkeypatch.setattr(config, 'MONITOR_CLUSTER_ENABLED', False)
+    monkeypatch.setattr(config, 'MONITOR_ANOMALY_WARMUP', 10)
+    agent = CustomerMonitorAgent()
+    _warm(agent.detector)
+
+    async def generate_structured(messages, schema, max_tokens=None):
+        # 只有检测到异常时提示词中才给出异常指标
+        reason = '知识库缺少相关条目' if '检测到的指标异常' in messages[-1]['content'] else ''
+        return {'intent': '投诉', 'sentiment': 'negative', 'category': '售后', 'status': 'in_progress',
+                'confidence': 0.8, 'alert_reason': reason}
+
+    monkeypatch.setattr(core_llm, 'generate_structured', generate_structured)
+
+    calm = asyncio.run(agent.analyze_conversation('怎么退货', '请提交申请', _state()))
+    assert calm['alert_triggered'] is False and calm['alert_reason'] == ''
+
+    alert = asyncio.run(agent.analyze_conversation('找不到答案', '抱歉', _state(hit_rate=0.3)))
+    assert alert['alert_triggered'] is True
+    assert alert['alert_rules'] == ['kb_drop_negative']
+    assert alert['alert_reason'].startswith('用户情绪负面且知识库命中率骤降')
+    assert alert['alert_reason'].endswith('知识库缺少相关条目')
@@ -0,0 +1,144 @@
+"""
+客服监控批量分析测试：按token预算打包、按编号回填结果与失败项逐条重试
+"""
+
+import asyncio
+import re
+
+import pytest
+
+from agent.agents import monitor
+from agent.agents.monitor import ANALYSIS_SCHEMA, CustomerMonitorAgent
+from agent.core.llm import core_llm
+from agent.utils.config import config
+from agent.utils.tokens import estimate_tokens, truncate_to_tokens
+
+
+STATE = {'latency': 200, 'error_rate': 0.01, 'knowledge_base_hit_rate': 0.9,
+         'active_conversations': 10, 'average_response_time': 300}
+
+
+def _analysis(query, **fields):
+    return {'intent': query, 'sentiment': 'neutral', 'category': '咨询', 'status': 'resolved',
+            'confidence': 0.9, **fields}
+
+
+class _LLM:
+    """按提示词中的用户查询构造分析结果，intent即对应的查询"""
+
+    def __init__(self, mangle=None, error=None):
+        self.mangle = mangle
+        self.error = error
+        self.calls = []
+
+    async def generate_structured(self, messages, schema, max_tokens=None):
+        queries = re.findall(r'用户查询：(.*)', messages[-1]['content'])
+        self.calls.append(len(queries) if schema is not ANALYSIS_SCHEMA else 'single')
+        if schema is ANALYSIS_SCHEMA:
+            return _analysis(queries[0])
+        if self.error is not None:
+            raise self.error
+        results = [{'id': str(position), **_analysis(query)} for position, query in enumerate(queries, 1)]
+        return {'results': self.mangle(results) if self.mangle else results}
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(config, 'MONITOR_FASTPATH_ENABLED', False)
+    monkeypatch.setattr(config, 'MONITOR_CLUSTER_ENABLED', False)
+    return CustomerMonitorAgent()
+
+
+def _use(monkeypatch, llm):
+    monkeypatch.setattr(core_llm, 'generate_structured', llm.generate_structured)
+    return llm
+
+
+def _conversations(count):
+    return [{'user_query': f"问题{i}", 'ai_response': '好的', 'system_state': dict(STATE)} for i in range(count)]
+
+
+def test_packs_conversations_into_one_request(agent, monkeypatch):
+    llm = _use(monkeypatch, _LLM())
+    results = asyncio.run(agent.analyze_conversations(_conversations(5)))
+    assert llm.calls == [5]
+    assert [result['intent'] for result in results] == [f"问题{i}" for i in range(5)]
+    assert all(result['alert_triggered'] is False for result in results)
+    assert agent.batch_stats == {'requests': 1, 'packed_items': 5, 'retried_items': 0}
+
+
+def test_results_matched_by_id(agent, monkeypatch):
+    _use(monkeypatch, _LLM(mangle=lambda results: results[::-1]))
+    results = asyncio.run(agent.analyze_conversations(_conversations(3)))
+    assert [result['intent'] for result in results] == ['问题0', '问题1', '问题2']
+
+
+def test_missing_and_invalid_items_retried(agent, monkeypatch):
+    def mangle(results):
+        results[2]['sentiment'] = 'angry'
+        return results[:1] + results[2:]
+
+    llm = _use(monkeypatch, _LLM(mangle=mangle))
+    results = asyncio.run(agent.analyze_conversations(_conversations(4)))
+    assert llm.calls == [4, 'single', 'single']
+    assert [result['intent'] for result in results] == [f"问题{i}" for i in range(4)]
+    assert agent.batch_stats['retried_items'] == 2
+
+
+def test_unparseable_response_retried_individually(agent, monkeypatch):
+    llm = _use(monkeypatch, _LLM(error=ValueError('truncated json')))
+    results = asyncio.run(agent.analyze_conversations(_conversations(3)))
+    assert llm.calls == [3] + ['single'] * 3
+    assert [result['intent'] for result in results] == ['问题0', '问题1', '问题2']
+
+
+def test_transport_error_fails_batch(agent, monkeypatch):
+    llm = _use(monkeypatch, _LLM(error=ConnectionError('down')))
+    results = asyncio.run(agent.analyze_conversations(_conversations(3), return_exceptions=True))
+    # 调用失败不展开为逐条请求
+    assert llm.calls == [3]
+    assert all(isinstance(result, ConnectionError) for result in results)
+    with pytest.raises(ConnectionError):
+        asyncio.run(agent.analyze_conversations(_conversations(3)))
+
+
+def test_single_conversation_skips_packing(agent, monkeypatch):
+    llm = _use(monkeypatch, _LLM())
+    assert asyncio.run(agent.analyze_conversations(_conversations(1)))[0]['intent'] == '问题0'
+    assert llm.calls == ['single']
+
+
+def test_plan_batches_respects_item_cap(agent, monkeypatch):
+    monkeypatch.setattr(config, 'MONITOR_BATCH_MAX_ITEMS', 4)
+    assert agent._plan_batches(_conversations(10), list(range(10))) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    # 输出预算只够容纳2条
+    monkeypatch.setattr(config, 'MONITOR_BATCH_OUTPUT_TOKENS', 2 * agent.item_output_tokens)
+    assert agent._plan_batches(_conversations(3), [0, 1, 2]) == [[0, 1], [2]]
+
+
+def test_plan_batches_respects_input_budget(agent, monkeypatch):
+    conversations = _conversations(4)
+    conversations[1]['user_query'] = '很长的问题' * 200
+    cost = estimate_tokens(agent._format(conversations[0])) + monitor._ITEM_OVERHEAD_TOKENS
+    fixed = (estimate_tokens(agent.system_prompt) + estimate_tokens(str(monitor.BATCH_SCHEMA))
+             + estimate_tokens(monitor._ANALYSIS_DIMENSIONS) + 100)
+    monkeypatch.setattr(config, 'MONITOR_BATCH_INPUT_TOKENS', fixed + 3 * cost)
+    # 超长对话单独成批，其余按预算打包
+    assert agent._plan_batches(conversations, [0, 1, 2, 3]) == [[0], [1], [2, 3]]
+
+
+def test_item_output_estimate_tracks_responses(agent, monkeypatch):
+    _use(monkeypatch, _LLM())
+    before = agent.item_output_tokens
+    asyncio.run(agent.analyze_conversations(_conversations(3)))
+    assert agent.item_output_tokens < before
+
+
+def test_estimate_and_truncate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('中文') == 2
+    assert estimate_tokens('abcdefgh') == 2
+    assert truncate_to_tokens('abcdefgh中文', 3) == 'efgh中文'
+    assert truncate_to_tokens('abc', 10) == 'abc'
+    assert truncate_to_tokens('abc', 0) == ''
@@ -0,0 +1,85 @@
+"""
+快速分类器测试：样本缓冲落盘、文件压缩与训练快照
+"""
+
+import json
+import threading
+
+import pytest
+
+from agent.agents import monitor_classifier
+from agent.agents.monitor_classifier import FastPathClassifier
+from agent.utils.config import config
+
+
+ANALYSIS = {'intent': '咨询', 'sentiment': 'neutral', 'category': '物流', 'status': 'resolved',
+            'alert_triggered': False}
+
+
+@pytest.fixture
+def classifier(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'MONITOR_FASTPATH_MAX_SAMPLES', 50)
+    monkeypatch.setattr(config, 'MONITOR_FASTPATH_MIN_SAMPLES', 20)
+    monkeypatch.setattr(config, 'MONITOR_FASTPATH_RETRAIN_EVERY', 10 ** 9)
+    return FastPathClassifier(str(tmp_path / 'samples.jsonl'), str(tmp_path / 'model.npz'))
+
+
+def _lines(classifier):
+    with open(classifier.samples_path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_observe_buffers_until_flush(classifier):
+    classifier.observe('快递到哪了', {}, ANALYSIS)
+    assert not classifier.samples_path.exists()
+    assert not classifier.flush_due()
+
+    for i in range(monitor_classifier.FLUSH_BATCH - 1):
+        classifier.observe(f"快递{i}", {}, ANALYSIS)
+    assert classifier.flush_due()
+    # 写入中不重复触发
+    assert not classifier.flush_due()
+    classifier.flush()
+    assert len(_lines(classifier)) == monitor_classifier.FLUSH_BATCH
+
+
+def test_flush_compacts_file(classifier):
+    for i in range(130):
+        classifier.observe(f"查询{i}", {}, ANALYSIS)
+        if i % 20 == 19:
+            classifier.flush()
+    classifier.flush()
+
+    lines = _lines(classifier)
+    assert len(lines) <= 2 * config.MONITOR_FASTPATH_MAX_SAMPLES
+    assert lines[-1]['text'] == '查询129'
+    assert len(FastPathClassifier(str(classifier.samples_path), str(classifier.model_path)).samples) == 50
+
+
+def test_train_while_observing(classifier):
+    for i in range(30):
+        classifier.observe(f"物流查询{i}", {'latency': 100}, ANALYSIS)
+
+    errors = []
+    stop = threading.Event()
+
+    def observe():
+        i = 0
+        while not stop.is_set():
+            classifier.observe(f"并发{i}", {}, ANALYSIS)
+            i += 1
+
+    thread = threading.Thread(target=observe)
+    thread.start()
+    try:
+        for _ in range(3):
+            try:
+                classifier.train()
+            except RuntimeError as e:
+                errors.append(e)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert not errors
+    assert classifier.model is not None
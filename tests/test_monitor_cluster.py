@@ -0,0 +1,57 @@
+"""
+相似投诉聚类测试：簇分配与代表结果的传播
+"""
+
+import asyncio
+
+import pytest
+
+from agent.agents.monitor_cluster import ComplaintClusterer
+
+
+def test_assign_outside_event_loop():
+    clusterer = ComplaintClusterer(window=60)
+    cluster, created = clusterer.assign('我的订单12345怎么还没发货')
+    assert created
+    same, created = clusterer.assign('我的订单67890怎么还没发货')
+    assert not created and same is cluster
+    other, created = clusterer.assign('退款到账需要几天')
+    assert created and other is not cluster
+
+    cluster.resolve({'category': '物流'})
+    assert cluster.done
+    assert asyncio.run(cluster.wait()) == {'category': '物流'}
+
+
+def test_followers_wait_for_representative():
+    clusterer = ComplaintClusterer(window=60)
+
+    async def main():
+        cluster, _ = clusterer.assign('物流一直不更新')
+        followers = [asyncio.create_task(cluster.wait()) for _ in range(3)]
+        await asyncio.sleep(0)
+        # 一个成员被取消不影响其他成员
+        followers[0].cancel()
+        cluster.resolve({'category': '物流'})
+        return await asyncio.gather(*followers, return_exceptions=True)
+
+    cancelled, *results = asyncio.run(main())
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert results == [{'category': '物流'}] * 2
+
+
+def test_representative_failure_propagates():
+    clusterer = ComplaintClusterer(window=60)
+    cluster, _ = clusterer.assign('客服不回复消息')
+
+    async def main():
+        waiter = asyncio.create_task(cluster.wait())
+        await asyncio.sleep(0)
+        cluster.resolve(RuntimeError('代表对话未完成分析'))
+        return await waiter
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+    # 先发布后等待同样得到异常
+    with pytest.raises(RuntimeError):
+        asyncio.run(cluster.wait())
@@ -0,0 +1,119 @@
+"""
+客服监控摄取测试：畸形事件计为invalid且不影响管道运行
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from agent.agents.monitor_ingest import IngestPipeline
+
+
+class _Agent:
+    async def analyze_conversations(self, batch, return_exceptions=False):
+        return [{'alert_triggered': False, 'query': event['user_query']} for event in batch]
+
+
+class _Sink:
+    def __init__(self):
+        self.records = []
+
+    async def write(self, records):
+        self.records.extend(records)
+
+
+def _pipeline():
+    return IngestPipeline(agent=_Agent(), sink=_Sink(), queue_size=100, concurrency=1,
+                          batch_size=10, batch_wait_ms=0)
+
+
+async def _submit_all(pipeline, lines):
+    for line in lines:
+        await pipeline.submit(line if isinstance(line, str) else json.dumps(line))
+
+
+@pytest.mark.parametrize('event', [
+    {'type': 'metrics', 'system_state': [1, 2]},
+    {'type': 'metrics', 'system_state': 'high'},
+    {'type': 'metrics', 'system_state': {'latency': 'slow'}},
+    {'type': 'metrics', 'latency': None},
+    {'type': 'conversation', 'user_query': 123},
+    {'type': 'conversation', 'user_query': ['a']},
+    {'type': 'conversation', 'ai_response': 'hi'},
+    {'type': 'conversation', 'user_query': 'q', 'system_state': 'bad'},
+    {'type': 'conversation', 'user_query': 'q', 'system_state': {'error_rate': True}},
+])
+def test_malformed_events_are_invalid(event):
+    pipeline = _pipeline()
+    asyncio.run(_submit_all(pipeline, [event]))
+    assert pipeline.stats.counts['invalid'] == 1
+    assert pipeline.queue.qsize() == 0
+    assert pipeline.system_state['latency'] == 0
+
+
+@pytest.mark.parametrize('line', ['not json', '[1, 2]', '"text"', 'null'])
+def test_unparseable_lines_are_invalid(line):
+    pipeline = _pipeline()
+    asyncio.run(_submit_all(pipeline, [line]))
+    assert pipeline.stats.counts['invalid'] == 1
+
+
+def test_metrics_update_system_state():
+    pipeline = _pipeline()
+    asyncio.run(_submit_all(pipeline, [
+        {'type': 'metrics', 'system_state': {'latency': 800, 'error_rate': 0.05}},
+        {'type': 'metrics', 'active_conversations': 12},
+        {'type': 'conversation', 'id': 'c1', 'user_query': 'q', 'system_state': {'latency': 100}},
+    ]))
+    assert pipeline.stats.counts['metrics'] == 2
+    event = pipeline.queue.get_nowait()
+    assert event['system_state']['latency'] == 100
+    assert event['system_state']['error_rate'] == 0.05
+    assert event['system_state']['active_conversations'] == 12
+
+
+def test_run_survives_malformed_events():
+    pipeline = _pipeline()
+
+    async def source():
+        await _submit_all(pipeline, [
+            {'type': 'metrics', 'system_state': [1]},
+            {'type': 'conversation', 'id': 'c1', 'user_query': 'q1'},
+            {'type': 'conversation', 'id': 'c2', 'user_query': 7},
+            {'type': 'conversation', 'id': 'c3', 'user_query': 'q3', 'system_state': 'x'},
+            {'type': 'conversation', 'id': 'c4', 'user_query': 'q4'},
+        ])
+
+    asyncio.run(pipeline.run(source()))
+    stats = pipeline.get_stats()
+    assert stats['invalid'] == 3
+    assert stats['processed'] == 2
+    assert [record['id'] for record in pipeline.sink.records if record['type'] == 'analysis'] == ['c1', 'c4']
+
+
+def test_socket_connection_survives_malformed_events(tmp_path):
+    pipeline = _pipeline()
+    path = str(tmp_path / 'ingest.sock')
+
+    async def main():
+        server = asyncio.create_task(pipeline.serve_socket(path))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if (tmp_path / 'ingest.sock').exists():
+                break
+        reader, writer = await asyncio.open_unix_connection(path)
+        events = [{'type': 'metrics', 'system_state': 5}, {'user_query': 'q1'}, {'user_query': None}, {'user_query': 'q2'}]
+        for event in events:
+            writer.write((json.dumps(event) + '\n').encode())
+        await writer.drain()
+        writer.close()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if pipeline.queue.qsize() == 2:
+                break
+        server.cancel()
+
+    asyncio.run(main())
+    assert pipeline.queue.qsize() == 2
+    assert pipeline.stats.counts['invalid'] == 2
@@ -0,0 +1,103 @@
+"""
+工作流规划缓存测试：参数提取、精确/模板命中、相似参考、淘汰与延迟落盘
+"""
+
+import json
+
+import pytest
+
+from agent.core.plan_cache import PlanCache, extract_parameters
+from agent.utils.config import config
+
+
+def _workflow(sku):
+    return {
+        'steps': [
+            {'id': 's1', 'agent': 'product', 'description': f'查询商品{sku}的库存', 'dependencies': []},
+            {'id': 's2', 'agent': 'rednote', 'description': f'为{sku}写推广文案', 'dependencies': ['s1']},
+        ]
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PlanCache(str(tmp_path / 'plan_cache.json'), max_entries=3, similarity=0.5)
+
+
+def test_extract_parameters():
+    template, params = extract_parameters('查询订单 A1024 的物流，收件人"张三"')
+    assert params == ['A1024', '张三']
+    assert template == '查询订单 {{p0}} 的物流，收件人{{p1}}'
+
+
+def test_exact_hit(cache):
+    cache.store('分析商品 SKU-001', _workflow('SKU-001'))
+    assert cache.lookup('分析商品   SKU-001') == _workflow('SKU-001')
+    assert cache.get_stats()['exact'] == 1
+
+
+def test_template_hit_substitutes_parameters(cache):
+    cache.store('分析商品 SKU-001', _workflow('SKU-001'))
+    workflow = cache.lookup('分析商品 SKU-777')
+    assert workflow == _workflow('SKU-777')
+    # 结构性字段不替换
+    assert workflow['steps'][1]['dependencies'] == ['s1']
+    assert cache.get_stats()['template'] == 1
+
+
+def test_miss_and_similar(cache):
+    cache.store('分析商品 SKU-001 的用户评价', _workflow('SKU-001'))
+    assert cache.lookup('分析商品 SKU-002 的差评原因和用户评价') is None
+    reference = cache.find_similar('分析商品 SKU-002 的差评原因和用户评价')
+    # 相似规划保留原参数，只作参考
+    assert reference == _workflow('SKU-001')
+    stats = cache.get_stats()
+    assert stats['miss'] == 1 and stats['similar'] == 1 and stats['hit_rate'] == 0
+
+
+def test_evicts_least_recently_used(cache):
+    for name in ['alpha', 'beta', 'gamma']:
+        cache.store(f'任务 {name}', _workflow(name))
+    cache.lookup('任务 alpha')
+    cache.store('任务 delta', _workflow('delta'))
+    assert cache.lookup('任务 beta') is None
+    assert cache.lookup('任务 alpha') is not None
+    assert len(cache.entries) == 3
+
+
+def test_store_persists(tmp_path):
+    path = str(tmp_path / 'plan_cache.json')
+    PlanCache(path).store('分析商品 SKU-001', _workflow('SKU-001'))
+    assert PlanCache(path).lookup('分析商品 SKU-009') == _workflow('SKU-009')
+
+
+def test_lookup_does_not_write_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PLAN_CACHE_SAVE_INTERVAL', 3600)
+    path = tmp_path / 'plan_cache.json'
+    cache = PlanCache(str(path))
+    cache.store('分析商品 SKU-001', _workflow('SKU-001'))
+    saved = path.stat().st_mtime_ns
+
+    for _ in range(5):
+        cache.lookup('分析商品 SKU-001')
+    assert path.stat().st_mtime_ns == saved
+
+    cache.flush()
+    entry = next(iter(json.loads(path.read_text(encoding='utf-8'))['entries'].values()))
+    assert entry['hits'] == 5
+
+
+def test_lookup_saves_after_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PLAN_CACHE_SAVE_INTERVAL', 0)
+    path = tmp_path / 'plan_cache.json'
+    cache = PlanCache(str(path))
+    cache.store('分析商品 SKU-001', _workflow('SKU-001'))
+    cache.lookup('分析商品 SKU-001')
+    entry = next(iter(json.loads(path.read_text(encoding='utf-8'))['entries'].values()))
+    assert entry['hits'] == 1
+
+
+def test_corrupt_file_is_ignored(tmp_path):
+    path = tmp_path / 'plan_cache.json'
+    path.write_text('{not json', encoding='utf-8')
+    assert PlanCache(str(path)).lookup('任务') is None
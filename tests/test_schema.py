@@ -0,0 +1,122 @@
+"""
+参数校验测试：Schema预编译、默认值填充、宽松类型转换与错误汇总
+"""
+
+import asyncio
+
+import pytest
+
+from agent.tools.registry import ToolRegistry
+from agent.tools.schema import MAX_REPORTED_ERRORS, CompiledSchema, ToolArgumentError
+
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'query': {'type': 'string', 'minLength': 1},
+        'limit': {'type': 'integer', 'minimum': 1, 'maximum': 50, 'default': 10},
+        'method': {'type': 'string', 'enum': ['GET', 'POST'], 'default': 'GET'},
+        'exact': {'type': 'boolean'},
+        'tags': {'type': 'array', 'items': {'type': 'string'}, 'maxItems': 3},
+        'filters': {'type': 'object', 'properties': {'price': {'type': 'number'}}, 'additionalProperties': False},
+        'note': {'type': ['string', 'null']},
+    },
+    'required': ['query'],
+}
+
+
+@pytest.fixture
+def schema():
+    return CompiledSchema('search', SCHEMA)
+
+
+def test_defaults_filled(schema):
+    assert schema.validate({'query': 'q'}) == {'query': 'q', 'limit': 10, 'method': 'GET'}
+    # 可选字段显式传null按未传处理
+    assert schema.validate({'query': 'q', 'limit': None, 'exact': None}) == {'query': 'q', 'limit': 10, 'method': 'GET'}
+
+
+def test_default_is_copied():
+    compiled = CompiledSchema('t', {'type': 'object', 'properties': {'items': {'type': 'array', 'default': []}}})
+    first = compiled.validate({})
+    first['items'].append(1)
+    assert compiled.validate({}) == {'items': []}
+
+
+def test_lenient_coercion(schema):
+    result = schema.validate({
+        'query': 42,
+        'limit': '5',
+        'method': 'post',
+        'exact': 'true',
+        'tags': '["a", "b"]',
+        'filters': '{"price": "9.5"}',
+    })
+    assert result == {
+        'query': '42', 'limit': 5, 'method': 'POST', 'exact': True,
+        'tags': ['a', 'b'], 'filters': {'price': 9.5},
+    }
+    assert schema.validate({'query': 'q', 'limit': 5.0})['limit'] == 5
+    assert schema.validate({'query': 'q', 'exact': 0})['exact'] is False
+
+
+@pytest.mark.parametrize('arguments, message', [
+    ({}, 'query: 缺少必填字段'),
+    ({'query': ''}, 'query: 长度不能小于1'),
+    ({'query': 'q', 'limit': 0}, 'limit: 不能小于1'),
+    ({'query': 'q', 'limit': 2.5}, 'limit: 应为integer'),
+    ({'query': 'q', 'limit': 'many'}, 'limit: 应为integer'),
+    ({'query': 'q', 'exact': 'yes'}, 'exact: 应为boolean'),
+    ({'query': 'q', 'method': 'PUT'}, 'method: 应为GET/POST之一'),
+    ({'query': 'q', 'tags': ['a', ['b']]}, 'tags[1]: 应为string'),
+    ({'query': 'q', 'tags': ['a', 'b', 'c', 'd']}, 'tags: 元素数不能大于3'),
+    ({'query': 'q', 'filters': {'brand': 'x'}}, 'filters.brand: 未知字段'),
+    ('not an object', '参数: 应为object'),
+])
+def test_errors(schema, arguments, message):
+    with pytest.raises(ToolArgumentError) as info:
+        schema.validate(arguments)
+    assert info.value.tool == 'search'
+    assert message in info.value.errors
+
+
+def test_type_list(schema):
+    assert schema.validate({'query': 'q', 'note': None}) == {'query': 'q', 'limit': 10, 'method': 'GET'}
+    assert schema.validate({'query': 'q', 'note': 5})['note'] == '5'
+
+
+def test_boolean_is_not_a_number():
+    compiled = CompiledSchema('t', {'type': 'object', 'properties': {'n': {'type': 'number'}}})
+    with pytest.raises(ToolArgumentError):
+        compiled.validate({'n': True})
+
+
+def test_errors_are_collected_and_truncated():
+    properties = {f"f{i}": {'type': 'integer'} for i in range(MAX_REPORTED_ERRORS + 2)}
+    compiled = CompiledSchema('t', {'type': 'object', 'properties': properties})
+    with pytest.raises(ToolArgumentError) as info:
+        compiled.validate({name: 'x' for name in properties})
+    assert len(info.value.errors) == MAX_REPORTED_ERRORS + 2
+    assert f"等{MAX_REPORTED_ERRORS + 2}处" in str(info.value)
+
+
+def test_none_arguments_treated_as_empty():
+    assert CompiledSchema('t', {'type': 'object', 'properties': {}}).validate(None) == {}
+
+
+def test_registry_validates_before_execution(data_dir):
+    registry = ToolRegistry()
+    calls = []
+
+    async def handler(args):
+        calls.append(args)
+        return args['limit']
+
+    registry.register('search_items', 'search', SCHEMA, handler)
+    assert asyncio.run(registry.execute('search_items', {'query': 'q', 'limit': '3'})) == 3
+    assert calls == [{'query': 'q', 'limit': 3, 'method': 'GET'}]
+
+    with pytest.raises(ToolArgumentError):
+        asyncio.run(registry.execute('search_items', {'limit': 3}))
+    assert len(calls) == 1
+    assert registry.validation_errors == {'search_items': 1}
@@ -0,0 +1,132 @@
+"""
+本地全文检索测试：增量刷新、墓碑删除、段合并与mmap索引重新加载
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from agent.tools import search
+from agent.tools.search import LocalSearchBackend, LocalSearchEngine, MockSearchBackend, read_document
+from agent.utils.config import config
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    (corpus / 'phone.md').write_text('# 手机评测\n这款手机的续航表现很好', encoding='utf-8')
+    (corpus / 'coffee.txt').write_text('咖啡豆烘焙指南\n深度烘焙的咖啡更苦', encoding='utf-8')
+    (corpus / 'lipstick.json').write_text(
+        json.dumps({'title': '口红试色', 'content': '哑光口红显色度高'}, ensure_ascii=False), encoding='utf-8'
+    )
+    return corpus
+
+
+def _engine(corpus):
+    return LocalSearchEngine(str(corpus), str(corpus.parent / 'index'))
+
+
+def _titles(engine, query):
+    return [result['title'] for result in engine.search(query)]
+
+
+def test_read_document(corpus):
+    assert read_document(corpus / 'phone.md')[0] == '手机评测'
+    assert read_document(corpus / 'lipstick.json') == ('口红试色', '口红试色\n哑光口红显色度高')
+
+
+def test_refresh_and_search(corpus):
+    engine = _engine(corpus)
+    assert engine.refresh() == {'added': 3, 'updated': 0, 'removed': 0}
+    assert len(engine) == 3
+    assert engine.generation == 1
+
+    results = engine.search('手机续航')
+    assert [result['title'] for result in results] == ['手机评测']
+    assert results[0]['url'].startswith('file://')
+    assert '续航' in results[0]['snippet']
+    assert engine.search('不存在的词') == []
+    # 未变化时刷新不做任何事
+    assert engine.refresh() == {'added': 0, 'updated': 0, 'removed': 0}
+
+
+def test_incremental_changes_use_delta_and_tombstones(corpus):
+    engine = _engine(corpus)
+    engine.refresh()
+
+    (corpus / 'tea.md').write_text('# 绿茶\n明前龙井的冲泡方法', encoding='utf-8')
+    (corpus / 'phone.md').write_text('# 手机评测\n这款手机的拍照很出色，夜景清晰', encoding='utf-8')
+    (corpus / 'coffee.txt').unlink()
+    assert engine.refresh() == {'added': 1, 'updated': 1, 'removed': 1}
+    # 变更保存在增量段，未触发合并
+    assert engine.generation == 1
+    assert set(engine.delta_docs) == {'tea.md', 'phone.md'}
+    assert len(engine) == 3
+
+    assert _titles(engine, '龙井') == ['绿茶']
+    assert _titles(engine, '咖啡') == []
+    assert _titles(engine, '夜景') == ['手机评测']
+    assert _titles(engine, '续航') == []
+
+
+def test_compact_persists_index(corpus):
+    engine = _engine(corpus)
+    engine.refresh()
+    (corpus / 'tea.md').write_text('# 绿茶\n明前龙井的冲泡方法', encoding='utf-8')
+    (corpus / 'coffee.txt').unlink()
+    engine.refresh()
+    engine.compact()
+
+    index = corpus.parent / 'index'
+    assert engine.generation == 2 and not engine.delta_docs
+    assert sorted(path.name for path in index.glob('postings-*.bin')) == ['postings-2.bin']
+
+    # 新实例从mmap索引加载，无需重新读取语料
+    reloaded = _engine(corpus)
+    assert len(reloaded) == 3
+    assert _titles(reloaded, '龙井') == ['绿茶']
+    assert _titles(reloaded, '咖啡') == []
+    assert reloaded.refresh() == {'added': 0, 'updated': 0, 'removed': 0}
+
+
+def test_large_delta_triggers_compact(corpus, monkeypatch):
+    monkeypatch.setattr(search, 'COMPACT_MIN_DOCS', 1)
+    engine = _engine(corpus)
+    engine.refresh()
+    for i in range(3):
+        (corpus / f"note{i}.txt").write_text(f"笔记{i}\n关于露营装备的清单", encoding='utf-8')
+    engine.refresh()
+    assert engine.generation == 2 and not engine.delta_docs
+    assert len(_titles(engine, '露营')) == 3
+
+
+def test_local_backend_shares_refresh(corpus, monkeypatch):
+    engine = _engine(corpus)
+    calls = []
+    refresh = engine.refresh
+    monkeypatch.setattr(engine, 'refresh', lambda: calls.append(1) or refresh())
+    backend = LocalSearchBackend(engine, refresh_seconds=60)
+
+    async def main():
+        return await asyncio.gather(*(backend.search('口红', 5) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert all([result['title'] for result in batch] == ['口红试色'] for batch in results)
+
+    # 刷新间隔内新增的文档暂不可见
+    (corpus / 'tea.md').write_text('# 绿茶\n龙井', encoding='utf-8')
+    assert asyncio.run(backend.search('龙井')) == []
+    backend.refresh_seconds = 0
+    assert [result['title'] for result in asyncio.run(backend.search('龙井'))] == ['绿茶']
+    assert len(calls) == 2
+
+
+def test_get_search_backend(monkeypatch):
+    monkeypatch.setattr(search, '_search_backend_instance', None)
+    monkeypatch.setattr(config, 'SEARCH_BACKEND', 'mock')
+    backend = search.get_search_backend()
+    assert isinstance(backend, MockSearchBackend)
+    assert search.get_search_backend() is backend
@@ -0,0 +1,118 @@
+"""
+会话记忆测试：滚动摘要、摘要失败重试、提示词预算与长期记忆召回
+"""
+
+import asyncio
+
+import pytest
+
+from agent.core.memory import MemoryStore
+from agent.core.session import SessionMemory
+from agent.utils.config import config
+from agent.utils.tokens import estimate_tokens, truncate_to_tokens
+
+
+class _LLM:
+    """记录摘要请求的LLM替身"""
+
+    def __init__(self, fail=False):
+        self.requests = []
+        self.fail = fail
+
+    async def generate(self, messages, **kwargs):
+        self.requests.append(messages)
+        if self.fail:
+            raise RuntimeError('unavailable')
+        return f"摘要{len(self.requests)}"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def fold_batch(monkeypatch):
+    monkeypatch.setattr(config, 'SESSION_FOLD_BATCH', 2)
+
+
+def _session(llm=None, **kwargs):
+    return SessionMemory(recent_turns=2, store=MemoryStore(), llm=llm or _LLM(), **kwargs)
+
+
+async def _talk(session, count):
+    for i in range(count):
+        await session.add_turn('user' if i % 2 == 0 else 'assistant', f'第{i}轮对话')
+
+
+def test_truncate_keeps_tail():
+    text = '早先的内容' + 'x' * 40 + '最新的内容'
+    truncated = truncate_to_tokens(text, 10)
+    assert text.endswith(truncated) and estimate_tokens(truncated) <= 10
+    assert truncate_to_tokens(text, 0) == ''
+
+
+def test_turns_fold_into_summary(fold_batch):
+    llm = _LLM()
+    session = _session(llm)
+    run(_talk(session, 6))
+
+    # 6轮：窗口保留2轮，移出的4轮分两次增量并入摘要
+    assert len(llm.requests) == 2
+    assert '第2轮对话' in llm.requests[1][1]['content'] and '第0轮对话' not in llm.requests[1][1]['content']
+    assert '摘要1' in llm.requests[1][1]['content']
+    assert session.summary == '摘要2'
+    assert session.get_stats() == {
+        'session_id': session.session_id, 'turn_count': 6, 'recent_turns': 2,
+        'pending_turns': 0, 'summary_tokens': estimate_tokens('摘要2')
+    }
+
+
+def test_failed_fold_is_retried(fold_batch):
+    llm = _LLM(fail=True)
+    session = _session(llm)
+    run(_talk(session, 4))
+    assert session.summary == '' and len(session.pending) == 2
+
+    llm.fail = False
+    run(_talk(session, 1))
+    assert session.summary and session.pending == []
+    assert '第0轮对话' in llm.requests[-1][1]['content']
+
+
+def test_messages_include_summary_recent_and_recall(fold_batch):
+    session = _session()
+    run(session.store.add('用户的会员等级是黄金会员', {'type': 'profile'}))
+    run(_talk(session, 4))
+
+    messages = run(session.build_messages('会员等级是什么', system_prompt='你是客服'))
+    assert messages[0]['role'] == 'system'
+    assert '你是客服' in messages[0]['content'] and '对话摘要' in messages[0]['content']
+    assert '黄金会员' in messages[0]['content']
+    assert [message['content'] for message in messages[1:]] == ['第2轮对话', '第3轮对话', '会员等级是什么']
+
+
+def test_recent_turns_not_recalled_twice():
+    session = _session()
+    run(session.add_turn('user', '我的订单号是A100'))
+    messages = run(session.build_messages('订单号A100'))
+    assert '相关记忆' not in (messages[0]['content'] if messages[0]['role'] == 'system' else '')
+    assert [message['content'] for message in messages] == ['我的订单号是A100', '订单号A100']
+
+
+def test_budget_drops_oldest_turns(fold_batch):
+    session = SessionMemory(recent_turns=10, store=MemoryStore(), llm=_LLM(), persist=False)
+    run(_talk(session, 6))
+    budget = 40
+    messages = run(session.build_messages('问题', budget=budget))
+    contents = [message['content'] for message in messages]
+    assert contents[-1] == '问题'
+    assert contents[-2] == '第5轮对话'
+    assert '第0轮对话' not in contents
+    assert sum(estimate_tokens(content) + 4 for content in contents) <= budget + 8
+
+
+def test_persist_false_skips_store():
+    session = SessionMemory(store=MemoryStore(), llm=_LLM(), persist=False)
+    turn = run(session.add_turn('user', '你好'))
+    assert turn['memory_id'] is None
+    assert session.store.get_stats()['total'] == 0
@@ -0,0 +1,156 @@
+"""
+工具结果缓存测试：TTL与持久化、过期清理、并发合并、幂等判断与按结果决定是否缓存
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agent.tools.registry import ToolRegistry
+from agent.tools.tool_cache import ToolResultCache, cache_key
+from agent.utils.config import config
+
+
+def test_cache_key_is_canonical():
+    assert cache_key('t', {'a': 1, 'b': [1, 2]}) == cache_key('t', {'b': [1, 2], 'a': 1})
+    assert cache_key('t', {'a': 1}) != cache_key('u', {'a': 1})
+
+
+def test_ttl_and_copies(tmp_path):
+    cache = ToolResultCache(str(tmp_path / 'cache.db'))
+    cache.put('t', 'k', {'v': [1]}, ttl=60)
+    hit, value = cache.get('k')
+    assert hit and value == {'v': [1]}
+    # 返回副本，修改不影响缓存
+    value['v'].append(2)
+    assert cache.get('k')[1] == {'v': [1]}
+
+    cache.put('t', 'old', 1, ttl=-1)
+    assert cache.get('old') == (False, None)
+
+
+def test_persisted_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ToolResultCache(path).put('t', 'k', {'v': 1}, ttl=60)
+    assert ToolResultCache(path).get('k') == (True, {'v': 1})
+
+
+def test_memory_only(tmp_path):
+    cache = ToolResultCache('', max_entries=2)
+    for key in 'abc':
+        cache.put('t', key, key, ttl=60)
+    assert cache.get('a') == (False, None)
+    assert cache.get('c') == (True, 'c')
+
+
+def test_expired_rows_purged_on_put(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'TOOL_CACHE_PURGE_INTERVAL', 0)
+    cache = ToolResultCache(str(tmp_path / 'cache.db'))
+    cache.put('t', 'old', 1, ttl=-1)
+    cache.put('t', 'new', 2, ttl=60)
+    keys = [row[0] for row in cache.conn.execute('SELECT key FROM tool_cache')]
+    assert keys == ['new']
+
+
+def test_purge_is_throttled(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'TOOL_CACHE_PURGE_INTERVAL', 3600)
+    cache = ToolResultCache(str(tmp_path / 'cache.db'))
+    cache.put('t', 'old', 1, ttl=-1)
+    cache.put('t', 'new', 2, ttl=60)
+    assert cache.conn.execute('SELECT COUNT(*) FROM tool_cache').fetchone()[0] == 2
+    assert cache.purge() == 1
+
+
+def test_invalidate(tmp_path):
+    cache = ToolResultCache(str(tmp_path / 'cache.db'))
+    cache.put('a', 'k1', 1, ttl=60)
+    cache.put('b', 'k2', 2, ttl=60)
+    cache.invalidate('a')
+    assert cache.get('k1') == (False, None)
+    assert cache.get('k2') == (True, 2)
+
+
+@pytest.fixture
+def registry(data_dir):
+    return ToolRegistry()
+
+
+def _counting_tool(registry, name, result, delay=0.0, **options):
+    calls = []
+
+    async def handler(args):
+        calls.append(args)
+        await asyncio.sleep(delay)
+        return result(args) if callable(result) else result
+
+    registry.register(name, name, {'type': 'object', 'properties': {'q': {'type': 'string'}}}, handler, **options)
+    return calls
+
+
+def test_cached_calls_hit(registry):
+    calls = _counting_tool(registry, 'echo', lambda args: {'q': args['q']}, cache_ttl=60)
+
+    async def main():
+        first = await registry.execute('echo', {'q': 'a'})
+        second = await registry.execute('echo', {'q': 'a'})
+        return first, second
+
+    assert asyncio.run(main()) == ({'q': 'a'}, {'q': 'a'})
+    assert len(calls) == 1
+    assert registry.get_cache_stats()['echo']['hits'] == 1
+
+
+def test_concurrent_calls_coalesce(registry):
+    calls = _counting_tool(registry, 'slow', {'ok': True}, delay=0.05, idempotent=True)
+
+    async def main():
+        return await asyncio.gather(*(registry.execute('slow', {'q': 'a'}) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{'ok': True}] * 5
+    assert len(calls) == 1
+    stats = registry.get_cache_stats()['slow']
+    assert stats['misses'] == 1 and stats['coalesced'] == 4
+
+
+def test_non_idempotent_calls_run_each_time(registry):
+    calls = _counting_tool(registry, 'post', {'ok': True}, delay=0.01,
+                           cache_ttl=60, idempotent=lambda args: args['q'] == 'get')
+
+    async def main():
+        await asyncio.gather(registry.execute('post', {'q': 'put'}), registry.execute('post', {'q': 'put'}))
+        await registry.execute('post', {'q': 'get'})
+        await registry.execute('post', {'q': 'get'})
+
+    asyncio.run(main())
+    assert [args['q'] for args in calls] == ['put', 'put', 'get']
+
+
+def test_uncacheable_results_are_not_stored(registry):
+    statuses = iter([503, 200, 500])
+    calls = _counting_tool(registry, 'fetch', lambda args: {'status': next(statuses)}, cache_ttl=60,
+                           cacheable=lambda result: 200 <= result['status'] < 300)
+
+    async def main():
+        return [(await registry.execute('fetch', {'q': 'a'}))['status'] for _ in range(3)]
+
+    # 503不缓存，下次重新请求；200缓存后命中
+    assert asyncio.run(main()) == [503, 200, 200]
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize('status, cached', [(200, True), (304, True), (429, False), (500, False), (404, False)])
+def test_http_request_caches_only_success(registry, status, cached):
+    assert registry.get('http_request')['cacheable']({'status': status}) is cached
+
+
+def test_expired_entries_rerun(registry):
+    calls = _counting_tool(registry, 'short', {'ok': True}, cache_ttl=0.01)
+
+    async def main():
+        await registry.execute('short', {'q': 'a'})
+        time.sleep(0.02)
+        await registry.execute('short', {'q': 'a'})
+
+    asyncio.run(main())
+    assert len(calls) == 2
@@ -0,0 +1,122 @@
+"""
+工具调用循环测试：并发执行tool_calls、错误回填、步数上限与耗时记录
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agent.core.llm import CoreLLMEngine
+from agent.tools.registry import ToolRegistry
+
+
+def _call(call_id, name, arguments):
+    arguments = arguments if isinstance(arguments, str) else json.dumps(arguments)
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def _message(content=None, tool_calls=None):
+    return SimpleNamespace(content=content, tool_calls=tool_calls)
+
+
+class _Script:
+    """按顺序返回预设响应的补全接口替身，记录每次请求"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def __call__(self, messages, **kwargs):
+        self.requests.append({'messages': list(messages), **kwargs})
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def registry(data_dir):
+    registry = ToolRegistry()
+    running = {'now': 0, 'max': 0}
+
+    async def lookup(args):
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        await asyncio.sleep(0.05)
+        running['now'] -= 1
+        return {'sku': args['sku'], 'stock': len(args['sku'])}
+
+    async def broken(args):
+        raise RuntimeError('服务不可用')
+
+    schema = {'type': 'object', 'properties': {'sku': {'type': 'string'}}, 'required': ['sku']}
+    registry.register('lookup', '查询库存', schema, lookup)
+    registry.register('broken', '总是失败', {'type': 'object', 'properties': {}}, broken)
+    registry.running = running
+    return registry
+
+
+@pytest.fixture
+def engine():
+    return CoreLLMEngine()
+
+
+def _use(engine, monkeypatch, responses):
+    script = _Script(responses)
+    monkeypatch.setattr(engine, '_complete', script)
+    return script
+
+
+def test_parallel_tool_calls(engine, registry, monkeypatch):
+    script = _use(engine, monkeypatch, [
+        _message(tool_calls=[_call('c1', 'lookup', {'sku': 'A1'}), _call('c2', 'lookup', {'sku': 'B22'})]),
+        _message('A1有2件，B22有3件'),
+    ])
+    result = asyncio.run(engine.generate_with_tools([{'role': 'user', 'content': '查库存'}], registry))
+
+    assert result['content'] == 'A1有2件，B22有3件'
+    assert registry.running['max'] == 2
+    assert len(result['iterations']) == 2
+    assert [call['name'] for call in result['iterations'][0]['tool_calls']] == ['lookup', 'lookup']
+    assert result['iterations'][0]['tool_seconds'] < 0.1
+
+    # 第二次请求带上助手的tool_calls和按调用ID回填的结果
+    messages = script.requests[1]['messages']
+    assert messages[1]['role'] == 'assistant' and len(messages[1]['tool_calls']) == 2
+    assert [(m['tool_call_id'], json.loads(m['content'])) for m in messages[2:]] == [
+        ('c1', {'sku': 'A1', 'stock': 2}),
+        ('c2', {'sku': 'B22', 'stock': 3}),
+    ]
+    assert script.requests[0]['tools'] == registry.get_definitions()
+
+
+@pytest.mark.parametrize('call, error', [
+    (_call('c1', 'broken', {}), '服务不可用'),
+    (_call('c1', 'missing', {}), '不存在'),
+    (_call('c1', 'lookup', '{bad json'), 'JSON'),
+    (_call('c1', 'lookup', {}), 'sku'),
+])
+def test_tool_errors_are_fed_back(engine, registry, monkeypatch, call, error):
+    script = _use(engine, monkeypatch, [_message(tool_calls=[call]), _message('抱歉')])
+    result = asyncio.run(engine.generate_with_tools([{'role': 'user', 'content': 'q'}], registry))
+
+    assert result['content'] == '抱歉'
+    record = result['iterations'][0]['tool_calls'][0]
+    assert error in record['error']
+    assert error in json.loads(script.requests[1]['messages'][-1]['content'])['error']
+
+
+def test_step_limit_forces_answer(engine, registry, monkeypatch):
+    looping = _message(tool_calls=[_call('c', 'lookup', {'sku': 'A1'})])
+    script = _use(engine, monkeypatch, [looping, looping, _message('最终回答')])
+    result = asyncio.run(engine.generate_with_tools([{'role': 'user', 'content': 'q'}], registry, max_steps=2))
+
+    assert result['content'] == '最终回答'
+    assert [request['tool_choice'] for request in script.requests] == ['auto', 'auto', 'none']
+
+
+def test_caller_messages_not_mutated(engine, registry, monkeypatch):
+    _use(engine, monkeypatch, [_message(tool_calls=[_call('c', 'lookup', {'sku': 'A1'})]), _message('ok')])
+    messages = [{'role': 'user', 'content': 'q'}]
+    result = asyncio.run(engine.generate_with_tools(messages, registry))
+    assert messages == [{'role': 'user', 'content': 'q'}]
+    assert len(result['messages']) == 3
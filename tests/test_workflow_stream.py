@@ -0,0 +1,100 @@
+"""
+工作流流式事件测试：事件顺序与字段、实时产出、超时处理与汇总一致性
+"""
+
+import asyncio
+
+from agent.core.orchestrator import CoordinatorAgent
+
+
+def _step(step_id, *dependencies, **fields):
+    return {'id': step_id, 'name': step_id, 'agent': 'a', 'description': step_id,
+            'dependencies': list(dependencies), **fields}
+
+
+class _Agent:
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.finished = []
+
+    async def execute(self, description, context=None):
+        await asyncio.sleep(self.delays.get(description, 0.01))
+        self.finished.append(description)
+        return {'step': description, 'context': context}
+
+
+def _coordinator(agent):
+    coordinator = CoordinatorAgent()
+    coordinator.register_agent('a', agent)
+    return coordinator
+
+
+def _collect(coordinator, steps, **kwargs):
+    async def main():
+        return [event async for event in coordinator.execute_workflow_stream(steps, {'k': 1}, **kwargs)]
+    return asyncio.run(main())
+
+
+def test_event_sequence(data_dir):
+    events = _collect(_coordinator(_Agent()), [_step('s1'), _step('s2', 's1')], workflow_id='wf')
+    assert [(event['type'], event.get('step_id')) for event in events] == [
+        ('workflow_started', None),
+        ('step_started', 's1'),
+        ('step_completed', 's1'),
+        ('step_started', 's2'),
+        ('step_completed', 's2'),
+        ('workflow_completed', None),
+    ]
+    assert all(event['workflow_id'] == 'wf' for event in events)
+    assert events[0]['total_steps'] == 2 and events[0]['restored'] == []
+
+    completed = events[2]
+    assert completed['result'] == {'step': 's1', 'context': {'k': 1}}
+    assert completed['agent'] == 'a' and completed['name'] == 's1'
+    assert completed['elapsed'] >= 0 and completed['timestamp'] > 0
+
+
+def test_events_arrive_before_workflow_finishes(data_dir):
+    agent = _Agent({'slow': 0.3})
+    coordinator = _coordinator(agent)
+
+    async def main():
+        async for event in coordinator.execute_workflow_stream([_step('fast'), _step('slow')], {}):
+            if event['type'] == 'step_completed':
+                return event['step_id'], list(agent.finished)
+
+    # 快步骤完成时立即产出事件，此时慢步骤仍在执行
+    assert asyncio.run(main()) == ('fast', ['fast'])
+
+
+def test_summary_matches_execute_workflow(data_dir):
+    coordinator = _coordinator(_Agent())
+    steps = [_step('s1'), _step('s2', 's1')]
+    streamed = _collect(coordinator, steps)[-1]['summary']
+    summary = asyncio.run(coordinator.execute_workflow(steps, {'k': 1}))
+    assert summary['results'] == streamed['results']
+    assert summary['completed'] == streamed['completed'] == {'s1', 's2'}
+
+
+def test_non_critical_timeout_does_not_block_downstream(data_dir):
+    agent = _Agent({'s1': 1})
+    events = _collect(_coordinator(agent), [_step('s1', critical=False, timeout=0.05), _step('s2', 's1')])
+    completed = {event['step_id']: event for event in events if event['type'] == 'step_completed'}
+    assert completed['s1']['result']['status'] == 'timeout'
+    assert 's2' in completed
+    assert events[-1]['summary']['failed'] == set()
+
+
+def test_critical_timeout_fails_step(data_dir):
+    agent = _Agent({'s1': 1})
+    events = _collect(_coordinator(agent), [_step('s1', timeout=0.05), _step('s2', 's1')])
+    types = [(event['type'], event.get('step_id')) for event in events]
+    assert ('step_failed', 's1') in types and ('step_skipped', 's2') in types
+
+
+def test_workflow_timeout_applies_to_all_steps(data_dir):
+    agent = _Agent({'s1': 1, 's2': 1})
+    events = _collect(_coordinator(agent), [_step('s1'), _step('s2')], timeout=0.05)
+    summary = events[-1]['summary']
+    assert summary['failed'] == {'s1', 's2'}
+    assert summary['timing']['actual_makespan'] < 0.5
@@ -0,0 +1,31 @@
+"""
+token估算工具模块
+"""
+
+import re
+
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文字符约1个token，其余约4个字符1个token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截取文本末尾不超过max_tokens的部分"""
+    if max_tokens <= 0:
+        return ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 后缀越长估算值越大，二分查找最长的合规后缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[-middle:]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[len(text) - low:]
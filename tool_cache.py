@@ -0,0 +1,144 @@
+"""
+工具结果缓存 - 按规范化参数缓存可缓存工具的结果（内存LRU + SQLite持久化）
+"""
+
+import copy
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+_MISSING = object()
+
+
+def cache_key(name: str, arguments: Dict[str, Any]) -> str:
+    """工具名 + 规范化参数（键排序、紧凑JSON）的哈希"""
+    canonical = json.dumps(arguments, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f"{name}\x00{canonical}".encode('utf-8')).hexdigest()
+
+
+class ToolResultCache:
+    """工具结果缓存
+
+    SQLite中的过期条目在写入时按TOOL_CACHE_PURGE_INTERVAL定期删除。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        """初始化缓存（path为空字符串时只使用内存）"""
+        self.max_entries = max_entries or config.TOOL_CACHE_MAX_ENTRIES
+        self._entries: OrderedDict = OrderedDict()  # key -> (过期时间, 工具名, 结果)
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {'hits': 0, 'misses': 0, 'coalesced': 0})
+
+        path = config.TOOL_CACHE_PATH if path is None else path
+        self.conn = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(path)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS tool_cache (
+                    key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )"""
+            )
+        self.purge()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """查询缓存，返回（是否命中, 结果副本）"""
+        value = self._lookup(key)
+        if value is _MISSING:
+            return False, None
+        return True, copy.deepcopy(value)
+
+    def _lookup(self, key: str) -> Any:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] >= now:
+                self._entries.move_to_end(key)
+                return entry[2]
+            del self._entries[key]
+
+        if self.conn is None:
+            return _MISSING
+
+        row = self.conn.execute(
+            'SELECT tool, value, expires_at FROM tool_cache WHERE key = ? AND expires_at >= ?', (key, now)
+        ).fetchone()
+        if row is None:
+            return _MISSING
+
+        value = json.loads(row[1])
+        self._remember(key, row[0], row[2], value)
+        return value
+
+    def put(self, name: str, key: str, value: Any, ttl: float):
+        """写入缓存"""
+        expires_at = time.time() + ttl
+        self._remember(key, name, expires_at, copy.deepcopy(value))
+
+        if self.conn is None:
+            return
+        try:
+            data = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # 不可序列化的结果只缓存在内存中
+            return
+        self.conn.execute(
+            'INSERT OR REPLACE INTO tool_cache VALUES (?, ?, ?, ?)', (key, name, data, expires_at)
+        )
+        self.conn.commit()
+        if time.time() - self._last_purge >= config.TOOL_CACHE_PURGE_INTERVAL:
+            self.purge()
+
+    def purge(self) -> int:
+        """删除SQLite中的过期条目，返回删除数"""
+        self._last_purge = time.time()
+        if self.conn is None:
+            return 0
+        cursor = self.conn.execute('DELETE FROM tool_cache WHERE expires_at < ?', (self._last_purge,))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def _remember(self, key: str, name: str, expires_at: float, value: Any):
+        self._entries[key] = (expires_at, name, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def record(self, name: str, outcome: str):
+        """记录一次调用结果：hits（缓存命中）、coalesced（合并到进行中的相同调用）、misses（实际执行）"""
+        self.stats[name][outcome] += 1
+
+    def invalidate(self, name: Optional[str] = None):
+        """清空缓存（指定工具名时只清空该工具）"""
+        for key in [key for key, entry in self._entries.items() if name is None or entry[1] == name]:
+            del self._entries[key]
+
+        if self.conn is not None:
+            if name is None:
+                self.conn.execute('DELETE FROM tool_cache')
+            else:
+                self.conn.execute('DELETE FROM tool_cache WHERE tool = ?', (name,))
+            self.conn.commit()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按工具统计命中率"""
+        result = {}
+        for name, stats in self.stats.items():
+            calls = sum(stats.values())
+            result[name] = {
+                **stats,
+                'hit_rate': (stats['hits'] + stats['coalesced']) / calls if calls else 0.0
+            }
+        return result
@@ -0,0 +1,181 @@
+"""
+工作流worker进程 - 从任务队列领取步骤并执行
+
+用法: python -m agent.core.worker --processes 4 --concurrency 2
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from agent.core.artifacts import get_artifact_store
+from agent.core.deadline import DeadlineExceeded, deadline_scope, run_with_deadline
+from agent.core.job_queue import JobQueue, SQLiteJobQueue
+from agent.utils.config import config
+from agent.utils.logger import Logger
+
+
+logger = Logger(__name__)
+
+
+def default_agents() -> Dict[str, Any]:
+    """worker进程内创建的默认专业Agent"""
+    from agent.agents.monitor import CustomerMonitorAgent
+    from agent.agents.rednote import RedNoteAgent
+    from agent.agents.product import ProductManagerAgent
+
+    return {
+        'monitor': CustomerMonitorAgent(),
+        'rednote': RedNoteAgent(),
+        'product': ProductManagerAgent(),
+    }
+
+
+class WorkflowWorker:
+    """工作流worker"""
+
+    def __init__(
+        self,
+        queue: Optional[JobQueue] = None,
+        agents: Optional[Dict[str, Any]] = None,
+        concurrency: int = 1,
+        worker_id: Optional[str] = None,
+        poll_interval: float = 0.2
+    ):
+        """初始化worker"""
+        self.queue = queue or SQLiteJobQueue()
+        self.agents = agents if agents is not None else default_agents()
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self._stopping = False
+
+    def stop(self):
+        """处理完当前任务后退出"""
+        self._stopping = True
+
+    async def run(self, max_jobs: Optional[int] = None):
+        """启动并发槽位循环领取任务"""
+        logger.info(f"worker启动: {self.worker_id}, 并发 {self.concurrency}")
+        await asyncio.gather(*(self._slot(max_jobs) for _ in range(self.concurrency)))
+        logger.info(f"worker退出: {self.worker_id}, 共处理 {self.processed} 个任务")
+
+    async def _slot(self, max_jobs: Optional[int]):
+        while not self._stopping and (max_jobs is None or self.processed < max_jobs):
+            # 队列操作是阻塞的数据库调用，放到线程中执行，不阻塞同进程其他槽位
+            job = await asyncio.to_thread(self.queue.lease, self.worker_id)
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            await self._process(job)
+            self.processed += 1
+
+    async def _process(self, job: Dict[str, Any]):
+        """执行单个任务，执行期间定期续约"""
+        payload = job['payload']
+        agent = self.agents.get(payload['agent'])
+
+        if agent is None:
+            await asyncio.to_thread(
+                self.queue.fail, job['id'], self.worker_id, f"Agent {payload['agent']} 不存在", retryable=False
+            )
+            return
+
+        execute = agent['execute'] if isinstance(agent, dict) else agent.execute
+        task = asyncio.create_task(self._execute(execute, payload))
+        heartbeat = asyncio.create_task(self._heartbeat(job['id'], task))
+
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            logger.warning(f"任务已被取消或租约丢失: {job['id']}")
+            return
+        except DeadlineExceeded as e:
+            await asyncio.to_thread(
+                self.queue.fail, job['id'], self.worker_id, str(e),
+                retryable=False, error_type=DeadlineExceeded.__name__
+            )
+            return
+        except Exception as e:
+            logger.error(f"任务执行失败: {job['id']} (第{job['attempt']}次), 错误: {e}")
+            await asyncio.to_thread(
+                self.queue.fail, job['id'], self.worker_id, str(e), error_type=type(e).__name__
+            )
+            return
+        finally:
+            heartbeat.cancel()
+
+        # 大结果写入共享的中间结果存储，队列中只保存句柄；部分结果保持原样供调度端识别
+        if not (isinstance(result, dict) and result.get('partial') is True):
+            result = get_artifact_store().maybe_put(result)
+
+        if not await asyncio.to_thread(self.queue.complete, job['id'], self.worker_id, result):
+            logger.warning(f"任务结果提交失败（租约已失效）: {job['id']}")
+
+    @staticmethod
+    async def _execute(execute, payload: Dict[str, Any]) -> Any:
+        # 截止时间是调度端的绝对时间戳，按当前剩余时间执行（排队和重试退避都已计入）
+        deadline = payload.get('deadline')
+        with deadline_scope(None if deadline is None else deadline - time.time()):
+            return await run_with_deadline(execute(payload['description'], payload.get('context')))
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task):
+        """按租约的1/3周期续约，租约丢失（任务被取消或被重新分配）时停止执行"""
+        while True:
+            await asyncio.sleep(config.JOB_LEASE_SECONDS / 3)
+            if not await asyncio.to_thread(self.queue.heartbeat, job_id, self.worker_id):
+                task.cancel()
+                return
+
+
+def _worker_main(queue_path: str, concurrency: int):
+    worker = WorkflowWorker(SQLiteJobQueue(queue_path), concurrency=concurrency)
+    asyncio.run(worker.run())
+
+
+def start_worker_pool(
+    processes: int,
+    queue_path: Optional[str] = None,
+    concurrency: int = 1
+) -> List[multiprocessing.Process]:
+    """启动worker进程池"""
+    context = multiprocessing.get_context('spawn')
+    pool = []
+
+    for _ in range(processes):
+        process = context.Process(
+            target=_worker_main,
+            args=(queue_path or config.JOB_QUEUE_PATH, concurrency),
+            daemon=True
+        )
+        process.start()
+        pool.append(process)
+
+    logger.info(f"worker进程池启动: {processes} 个进程")
+    return pool
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="燧石Agent工作流worker")
+    parser.add_argument('--queue', default=config.JOB_QUEUE_PATH, help="任务队列数据库路径")
+    parser.add_argument('--processes', type=int, default=1, help="worker进程数")
+    parser.add_argument('--concurrency', type=int, default=2, help="每个进程的并发任务数")
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        _worker_main(args.queue, args.concurrency)
+        return
+
+    for process in start_worker_pool(args.processes, args.queue, args.concurrency):
+        process.join()
+
+
+if __name__ == '__main__':
+    main()